@@ -0,0 +1,64 @@
+"""
+Compare canonical serializers and digest algorithms on user-record payloads.
+
+    python benchmarks/bench_hashing.py --records 20000
+"""
+
+from __future__ import annotations
+
+import argparse
+import json
+import time
+from typing import Any, Callable, Dict, List
+
+from redsnano import hashing
+
+
+def make_records(count: int) -> List[Dict[str, Any]]:
+    return [
+        {
+            "username": f"user{i}",
+            "email": f"user{i}@example.com",
+            "profile": {"age": 20 + i % 50, "tags": ["a", "b", str(i % 7)]},
+            "active": i % 3 != 0,
+        }
+        for i in range(count)
+    ]
+
+
+def stdlib_bytes(value: Any) -> bytes:
+    return json.dumps(
+        value, sort_keys=True, separators=(",", ":"), ensure_ascii=False
+    ).encode("utf-8")
+
+
+def timed(fn: Callable[[Any], Any], records: List[Dict[str, Any]]) -> float:
+    start = time.perf_counter()
+    for record in records:
+        fn(record)
+    return time.perf_counter() - start
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--records", type=int, default=20000)
+    args = parser.parse_args()
+
+    records = make_records(args.records)
+    serializers = {"json": stdlib_bytes}
+    if hashing.orjson is not None:
+        serializers["orjson"] = hashing.canonical_bytes
+
+    print(f"{'serializer':<10} {'algorithm':<10} {'us/op':>8}")  # noqa: T201
+    for serializer_name, serialize in serializers.items():
+        for algorithm in hashing.available_algorithms():
+            digest = hashing._ALGORITHMS[algorithm].digest
+            elapsed = timed(lambda value: digest(serialize(value)), records)
+            per_op = elapsed / len(records) * 1e6
+            print(  # noqa: T201
+                f"{serializer_name:<10} {algorithm:<10} {per_op:>8.2f}"
+            )
+
+
+if __name__ == "__main__":
+    main()
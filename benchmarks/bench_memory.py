@@ -0,0 +1,161 @@
+"""
+Report the memory cost per cached entry for several entry layouts.
+
+    python benchmarks/bench_memory.py --entries 100000 --compress-threshold 256
+
+Sizes are measured with ``tracemalloc`` while building the entries and
+include the value itself: ``small`` are user records of ~80 bytes of JSON,
+``large`` ~2 KB profiles.  Rows:
+
+``dataclass+hex``
+    The previous layout: a ``@dataclass`` with a ``__dict__`` and the
+    64-character hex digest.
+``slots+raw``
+    :class:`~redsnano.cache_types.CacheEntry`: ``__slots__`` and raw digest
+    bytes.
+``slots+raw+packed``
+    The same, holding values of at least ``--compress-threshold`` bytes as
+    their JSON bytes, zlib-compressed when smaller.
+``MiniRedis`` / ``MiniRedis+packed``
+    Whole caches (store, shards, expiry heaps) filled with ``mset``.
+"""
+
+from __future__ import annotations
+
+import argparse
+import gc
+import time
+import tracemalloc
+from dataclasses import dataclass
+from typing import Any, Callable, Dict, Optional
+
+from redsnano.cache import MiniRedis
+from redsnano.cache_types import CacheEntry
+from redsnano.hashing import canonical_bytes, hash_bytes
+from redsnano.origin import DictionaryOriginStore
+
+
+@dataclass
+class DataclassEntry:
+    value: Any
+    hash: str
+    expire_at: float | None = None
+    validated_at: float | None = None
+    revalidate_after: float | None = None
+    fetch_cost: float | None = None
+    size: int = 0
+
+
+class NoPersistence:
+    def load(self) -> Dict[str, Any]:
+        return {}
+
+    def save(self, data: Dict[str, Any]) -> None:
+        pass
+
+
+_WORDS = "lorem ipsum dolor sit amet consectetur adipiscing elit sed do".split()
+
+
+def make_value(i: int, kind: str) -> Dict[str, Any]:
+    value: Dict[str, Any] = {
+        "username": f"user{i}",
+        "email": f"user{i}@example.com",
+        "age": 20 + i % 50,
+        "active": i % 3 != 0,
+    }
+    if kind == "large":
+        value["bio"] = " ".join(_WORDS[(i + n) % len(_WORDS)] for n in range(300))
+        value["tags"] = [f"tag{(i + n) % 40}" for n in range(20)]
+    return value
+
+
+def entry_builder(entry_class: type, threshold: Optional[int]) -> Callable:
+    def build(i: int, kind: str, now: float) -> Any:
+        value = make_value(i, kind)
+        encoded = canonical_bytes(value)
+        entry = entry_class(
+            value=value,
+            hash=hash_bytes(encoded),
+            expire_at=now + 3600,
+            validated_at=now,
+        )
+        if threshold is not None and len(encoded) >= threshold:
+            entry.pack(encoded)
+        return entry
+
+    return build
+
+
+def measure(fill: Callable[[], Any], entries: int) -> float:
+    gc.collect()
+    tracemalloc.start()
+    before = tracemalloc.get_traced_memory()[0]
+    kept = fill()
+    gc.collect()
+    used = tracemalloc.get_traced_memory()[0] - before
+    tracemalloc.stop()
+    del kept
+    return used / entries
+
+
+def layouts(args: argparse.Namespace) -> Dict[str, Callable[[], Any]]:
+    now = time.time()
+
+    def entries_of(build: Callable) -> Callable[[], Any]:
+        return lambda: {
+            f"user:{i}": build(i, args.value, now) for i in range(args.entries)
+        }
+
+    def cache_of(threshold: Optional[int]) -> Callable[[], Any]:
+        def fill() -> MiniRedis:
+            cache = MiniRedis(
+                DictionaryOriginStore(),
+                persistence=NoPersistence(),
+                active_expiry=False,
+                compress_threshold=threshold,
+            )
+            for start in range(0, args.entries, 10_000):
+                batch = range(start, min(start + 10_000, args.entries))
+                cache.mset(
+                    {f"user:{i}": make_value(i, args.value) for i in batch}, ttl=3600
+                )
+            return cache
+
+        return fill
+
+    return {
+        "dataclass+hex": entries_of(entry_builder(DataclassEntry, None)),
+        "slots+raw": entries_of(entry_builder(CacheEntry, None)),
+        "slots+raw+packed": entries_of(
+            entry_builder(CacheEntry, args.compress_threshold)
+        ),
+        "MiniRedis": cache_of(None),
+        "MiniRedis+packed": cache_of(args.compress_threshold),
+    }
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--entries", type=int, default=100_000)
+    parser.add_argument(
+        "--value", choices=("small", "large"), nargs="+", default=["small", "large"]
+    )
+    parser.add_argument(
+        "--compress-threshold",
+        type=int,
+        default=64,
+        help="Pack values whose JSON is at least this many bytes.",
+    )
+    args = parser.parse_args()
+
+    print(f"{'value':<6} {'layout':<16} {'bytes/entry':>12}")  # noqa: T201
+    for kind in args.value:
+        options = argparse.Namespace(**{**vars(args), "value": kind})
+        for name, fill in layouts(options).items():
+            per_entry = measure(fill, args.entries)
+            print(f"{kind:<6} {name:<16} {per_entry:>12,.0f}")  # noqa: T201
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,79 @@
+"""
+Measure get/set throughput as threads are added, for several shard counts.
+
+    python benchmarks/bench_sharding.py --threads 1 2 4 8 --shards 1 16
+
+Every thread runs a 90/10 get/set mix over its own slice of the keys against
+one shared cache (in-memory origin, append-only persistence with fsync
+disabled).  Under CPython's GIL the gain from sharding is reduced lock
+contention rather than parallel execution; free-threaded builds can scale
+further.
+"""
+
+from __future__ import annotations
+
+import argparse
+import tempfile
+import threading
+import time
+from pathlib import Path
+
+from redsnano.cache import MiniRedis
+from redsnano.origin import DictionaryOriginStore
+from redsnano.persistence import FSYNC_NO, AppendOnlyPersistence
+
+
+def run(shards: int, threads: int, ops: int, keys: int, workdir: Path) -> float:
+    origin = DictionaryOriginStore({f"user:{i}": {"id": i} for i in range(keys)})
+    persistence = AppendOnlyPersistence(
+        workdir / f"bench-{shards}-{threads}.aof", fsync=FSYNC_NO
+    )
+    cache = MiniRedis(
+        origin,
+        persistence=persistence,
+        revalidate_after=3600,
+        active_expiry=False,
+        shards=shards,
+    )
+    cache.mget(f"user:{i}" for i in range(keys))
+    barrier = threading.Barrier(threads + 1)
+
+    def worker(offset: int) -> None:
+        barrier.wait()
+        for n in range(ops):
+            key = f"user:{(offset + n * threads) % keys}"
+            if n % 10:
+                cache.get(key)
+            else:
+                cache.set(key, {"id": n})
+
+    pool = [threading.Thread(target=worker, args=(t,)) for t in range(threads)]
+    for thread in pool:
+        thread.start()
+    barrier.wait()
+    started = time.perf_counter()
+    for thread in pool:
+        thread.join()
+    elapsed = time.perf_counter() - started
+    cache.close()
+    return threads * ops / elapsed
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--threads", type=int, nargs="+", default=[1, 2, 4, 8])
+    parser.add_argument("--shards", type=int, nargs="+", default=[1, 16])
+    parser.add_argument("--ops", type=int, default=50_000, help="Per thread.")
+    parser.add_argument("--keys", type=int, default=10_000)
+    args = parser.parse_args()
+
+    print(f"{'shards':>6} {'threads':>7} {'ops/s':>10}")  # noqa: T201
+    with tempfile.TemporaryDirectory() as workdir:
+        for shards in args.shards:
+            for threads in args.threads:
+                rate = run(shards, threads, args.ops, args.keys, Path(workdir))
+                print(f"{shards:>6} {threads:>7} {rate:>10,.0f}")  # noqa: T201
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,424 @@
+"""
+Run reproducible cache workloads and report throughput, latency and cost.
+
+    python benchmarks/bench_workloads.py --output results.json
+    python benchmarks/bench_workloads.py --origins sqlite --frontends inproc http \\
+        --workloads read-heavy ttl-churn --compare baseline.json
+
+Every scenario is one origin (``dict``, ``sqlite`` or ``json``) behind one
+front end, running one workload from a cold (empty) or warm (preloaded)
+cache:
+
+``inproc``
+    ``MiniRedis`` called directly.
+``http``
+    ``MiniRedisHTTPServer`` on a loopback port, driven by ``HTTPClient``.
+``fastapi``
+    The users app from ``redsnano.fastapi_app`` (SQLite origin only), driven
+    in-process through Starlette's ``TestClient``, so it measures the app
+    stack without a socket.
+
+Key sequences are drawn up front from a seeded generator (Zipfian or
+uniform), so two runs with the same arguments issue the same requests.
+Each scenario runs in a fresh process, which makes ``peak_rss_kb`` that
+scenario's own high-water mark.  Results are written as JSON; pass an
+earlier file to ``--compare`` to print throughput and p99 changes per
+scenario, and ``--max-regression`` to fail when throughput drops further.
+"""
+
+from __future__ import annotations
+
+import argparse
+import itertools
+import json
+import multiprocessing
+import os
+import platform
+import random
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+from concurrent.futures import ProcessPoolExecutor
+from pathlib import Path
+from typing import Any, Callable, Dict, List, NamedTuple, Optional, Tuple
+
+from redsnano.cache import MiniRedis
+from redsnano.client import HTTPClient
+from redsnano.metrics import Metrics
+from redsnano.origin import DictionaryOriginStore, JSONFileOriginStore
+from redsnano.origin_sqlite import SQLiteUserOriginStore, SQLiteUserRepository
+from redsnano.persistence import (
+    FSYNC_NO,
+    AppendOnlyPersistence,
+    JSONPersistence,
+    SnapshotPersistence,
+)
+from redsnano.server import MiniRedisHTTPServer
+
+try:
+    import resource
+except ImportError:  # pragma: no cover - Windows
+    resource = None  # type: ignore[assignment]
+
+
+class Workload(NamedTuple):
+    distribution: str  # "zipf" or "uniform"
+    write_ratio: float
+    ttl: Optional[float]  # TTL of loaded and written keys; short means churn
+
+
+WORKLOADS = {
+    "read-heavy": Workload("zipf", 0.05, None),
+    "balanced": Workload("zipf", 0.5, None),
+    "uniform-read": Workload("uniform", 0.05, None),
+    "ttl-churn": Workload("zipf", 0.1, 0.05),
+}
+ORIGINS = ("dict", "sqlite", "json")
+FRONTENDS = ("inproc", "http", "fastapi")
+STARTS = ("cold", "warm")
+
+# Cache counters that each mean one origin round trip.
+ORIGIN_CALL_COUNTERS = ("origin_fetches", "origin_hash_fetches")
+
+
+class Scenario(NamedTuple):
+    origin: str
+    frontend: str
+    workload: str
+    start: str
+
+    @property
+    def name(self) -> str:
+        return "/".join(self)
+
+
+def record(i: int) -> Dict[str, str]:
+    return {"username": f"user{i}", "email": f"user{i}@example.com"}
+
+
+def key_sequence(
+    workload: Workload, keys: int, ops: int, zipf_s: float, seed: int
+) -> List[Tuple[bool, int]]:
+    """``ops`` (is_write, key index) pairs drawn from the workload's mix."""
+    rng = random.Random(seed)
+    if workload.distribution == "zipf":
+        total = 0.0
+        cum_weights = []
+        for rank in range(1, keys + 1):
+            total += 1 / rank**zipf_s
+            cum_weights.append(total)
+        # Spread the hot ranks over the keyspace rather than the first keys.
+        placement = list(range(keys))
+        rng.shuffle(placement)
+        drawn = rng.choices(placement, cum_weights=cum_weights, k=ops)
+    else:
+        drawn = [rng.randrange(keys) for _ in range(ops)]
+    return [(rng.random() < workload.write_ratio, index) for index in drawn]
+
+
+def build_origin(kind: str, keys: int, workdir: Path):
+    records = {f"user{i}": record(i) for i in range(keys)}
+    if kind == "dict":
+        return DictionaryOriginStore(records)
+    if kind == "json":
+        path = workdir / "origin.json"
+        path.write_text(json.dumps(records), encoding="utf-8")
+        return JSONFileOriginStore(path)
+    if kind == "sqlite":
+        store = SQLiteUserOriginStore(workdir / "users.db")
+        SQLiteUserRepository(store.db_path, store=store).upsert_users(records.values())
+        return store
+    raise ValueError(f"Unknown origin {kind!r}; expected one of {', '.join(ORIGINS)}")
+
+
+def build_persistence(kind: str, workdir: Path):
+    if kind == "aof":
+        return AppendOnlyPersistence(workdir / "cache.aof", fsync=FSYNC_NO)
+    if kind == "snapshot":
+        return SnapshotPersistence(workdir / "cache.snapshot")
+    return JSONPersistence(workdir / "cache.json")
+
+
+class Target(NamedTuple):
+    cache: MiniRedis
+    # Per-thread (read, write) callables; writes take (key, value, ttl).
+    connect: Callable[[], Tuple[Callable[[str], Any], Callable[..., Any]]]
+    close: Callable[[], None]
+
+
+def inproc_target(cache: MiniRedis) -> Target:
+    def connect():
+        return cache.get, lambda key, value, ttl: cache.set(key, value, ttl)
+
+    return Target(cache, connect, cache.close)
+
+
+def http_target(cache: MiniRedis, threads: int) -> Target:
+    server = MiniRedisHTTPServer(("127.0.0.1", 0), cache, workers=threads + 2)
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    client = HTTPClient(*server.server_address, pool_size=threads)
+
+    def connect():
+        return client.get, client.set
+
+    def close():
+        client.close()
+        server.shutdown()
+        server.server_close()
+        thread.join()
+        cache.close()
+
+    return Target(cache, connect, close)
+
+
+def fastapi_target(workdir: Path, args: argparse.Namespace) -> Target:
+    from fastapi.testclient import TestClient
+
+    from redsnano.fastapi_app import create_app
+
+    app = create_app(
+        workdir / "users.db",
+        workdir / "cache_fastapi.json",
+        default_ttl=args.ttl,
+        revalidate_after=args.revalidate_after,
+        persistence=build_persistence(args.persistence, workdir),
+    )
+    client = TestClient(app)
+    cache = app.state.cache
+
+    def read(key: str):
+        return client.get(f"/users/{key}")
+
+    def write(key: str, value: Dict[str, str], ttl: Optional[float]):
+        # The app's write path: upsert the row, then cache it.
+        return client.post("/users", json=value)
+
+    def close():
+        client.close()
+        cache.close()
+
+    return Target(cache, lambda: (read, write), close)
+
+
+def build_target(scenario: Scenario, workdir: Path, args: argparse.Namespace):
+    workload = WORKLOADS[scenario.workload]
+    ttl = workload.ttl if workload.ttl is not None else args.ttl
+    if scenario.frontend == "fastapi":
+        if scenario.origin != "sqlite":
+            raise ValueError("The FastAPI app only serves the SQLite origin")
+        build_origin("sqlite", args.keys, workdir).close()
+        args = argparse.Namespace(**{**vars(args), "ttl": ttl})
+        return fastapi_target(workdir, args)
+    cache = MiniRedis(
+        build_origin(scenario.origin, args.keys, workdir),
+        persistence=build_persistence(args.persistence, workdir),
+        default_ttl=ttl,
+        validate_async=False,
+        revalidate_after=args.revalidate_after,
+        shards=args.shards,
+    )
+    if scenario.frontend == "http":
+        return http_target(cache, args.threads)
+    return inproc_target(cache)
+
+
+def peak_rss_kb() -> Optional[int]:
+    if resource is None:
+        return None
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return peak // 1024 if sys.platform == "darwin" else peak  # bytes on macOS
+
+
+def run_scenario(scenario: Scenario, args: argparse.Namespace) -> Dict[str, Any]:
+    workload = WORKLOADS[scenario.workload]
+    per_thread = args.ops // args.threads
+    sequences = [
+        key_sequence(workload, args.keys, per_thread, args.zipf_s, args.seed + t)
+        for t in range(args.threads)
+    ]
+    with tempfile.TemporaryDirectory() as tmp:
+        workdir = Path(tmp)
+        target = build_target(scenario, workdir, args)
+        cache = target.cache
+        warmup_seconds = 0.0
+        if scenario.start == "warm":
+            started = time.perf_counter()
+            cache.mget(f"user{i}" for i in range(args.keys))
+            warmup_seconds = time.perf_counter() - started
+        cache.metrics.reset()
+
+        latency = Metrics()
+        barrier = threading.Barrier(args.threads + 1)
+
+        def worker(sequence: List[Tuple[bool, int]]) -> None:
+            read, write = target.connect()
+            barrier.wait()
+            for n, (is_write, index) in enumerate(sequence):
+                key = f"user{index}"
+                begin = time.perf_counter()
+                if is_write:
+                    value = {"username": key, "email": f"{key}+{n}@example.com"}
+                    write(key, value, workload.ttl)
+                else:
+                    read(key)
+                latency.observe("op", time.perf_counter() - begin)
+
+        pool = [threading.Thread(target=worker, args=(s,)) for s in sequences]
+        for thread in pool:
+            thread.start()
+        barrier.wait()
+        started = time.perf_counter()
+        for thread in pool:
+            thread.join()
+        elapsed = time.perf_counter() - started
+
+        counters = cache.metrics.counters()
+        target.close()
+
+    ops = per_thread * args.threads
+    summary = latency.histograms()["op"].summary()
+    origin_calls = sum(counters.get(name, 0) for name in ORIGIN_CALL_COUNTERS)
+    return {
+        "scenario": scenario.name,
+        **scenario._asdict(),
+        "ops": ops,
+        "seconds": elapsed,
+        "ops_per_sec": ops / elapsed,
+        "p50_us": summary["p50_us"],
+        "p99_us": summary["p99_us"],
+        "p999_us": summary["p999_us"],
+        "max_us": summary["max_us"],
+        "origin_calls_per_op": origin_calls / ops,
+        "warmup_seconds": warmup_seconds,
+        "peak_rss_kb": peak_rss_kb(),
+        "counters": counters,
+    }
+
+
+def scenarios(args: argparse.Namespace) -> List[Scenario]:
+    selected = []
+    for combo in itertools.product(
+        args.origins, args.frontends, args.workloads, args.starts
+    ):
+        scenario = Scenario(*combo)
+        if scenario.frontend == "fastapi" and scenario.origin != "sqlite":
+            continue
+        selected.append(scenario)
+    return selected
+
+
+def git_commit() -> Optional[str]:
+    try:
+        result = subprocess.run(
+            ["git", "rev-parse", "HEAD"],
+            capture_output=True,
+            text=True,
+            check=True,
+            cwd=Path(__file__).resolve().parent,
+        )
+    except (OSError, subprocess.CalledProcessError):
+        return None
+    return result.stdout.strip()
+
+
+def compare(results: List[Dict[str, Any]], baseline_path: Path) -> float:
+    """Print changes against ``baseline_path``; return the worst throughput drop."""
+    baseline = {
+        result["scenario"]: result
+        for result in json.loads(baseline_path.read_text(encoding="utf-8"))["results"]
+    }
+    worst = 0.0
+    print(f"{'scenario':<40} {'ops/s':>8} {'p99':>8}", file=sys.stderr)  # noqa: T201
+    for result in results:
+        before = baseline.get(result["scenario"])
+        if before is None:
+            continue
+        throughput = result["ops_per_sec"] / before["ops_per_sec"] - 1
+        p99 = result["p99_us"] / max(before["p99_us"], 1) - 1
+        worst = max(worst, -throughput)
+        print(  # noqa: T201
+            f"{result['scenario']:<40} {throughput:>+8.1%} {p99:>+8.1%}",
+            file=sys.stderr,
+        )
+    return worst
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--origins", nargs="+", choices=ORIGINS, default=ORIGINS)
+    parser.add_argument("--frontends", nargs="+", choices=FRONTENDS, default=FRONTENDS)
+    parser.add_argument(
+        "--workloads", nargs="+", choices=sorted(WORKLOADS), default=list(WORKLOADS)
+    )
+    parser.add_argument("--starts", nargs="+", choices=STARTS, default=STARTS)
+    parser.add_argument("--ops", type=int, default=20_000, help="Per scenario.")
+    parser.add_argument("--keys", type=int, default=10_000)
+    parser.add_argument("--threads", type=int, default=1)
+    parser.add_argument("--zipf-s", type=float, default=0.99)
+    parser.add_argument("--seed", type=int, default=1)
+    parser.add_argument("--ttl", type=float, default=None, help="Default cache TTL.")
+    parser.add_argument("--revalidate-after", type=float, default=None)
+    parser.add_argument("--shards", type=int, default=16)
+    parser.add_argument(
+        "--persistence", choices=("aof", "snapshot", "json"), default="aof"
+    )
+    parser.add_argument("--output", type=Path, help="Write JSON here, not stdout.")
+    parser.add_argument("--compare", type=Path, help="Earlier results to diff.")
+    parser.add_argument(
+        "--max-regression",
+        type=float,
+        help="Exit non-zero if any scenario's ops/s fell by more than this "
+        "fraction of the --compare baseline.",
+    )
+    args = parser.parse_args()
+
+    results = []
+    context = multiprocessing.get_context("spawn")
+    print(  # noqa: T201
+        f"{'scenario':<40} {'ops/s':>10} {'p50':>7} {'p99':>7} {'p999':>7} "
+        f"{'origin/op':>9} {'rss MB':>7}",
+        file=sys.stderr,
+    )
+    for scenario in scenarios(args):
+        with ProcessPoolExecutor(1, mp_context=context) as executor:
+            result = executor.submit(run_scenario, scenario, args).result()
+        results.append(result)
+        rss = (result["peak_rss_kb"] or 0) / 1024
+        print(  # noqa: T201
+            f"{result['scenario']:<40} {result['ops_per_sec']:>10,.0f} "
+            f"{result['p50_us']:>7} {result['p99_us']:>7} {result['p999_us']:>7} "
+            f"{result['origin_calls_per_op']:>9.3f} {rss:>7.1f}",
+            file=sys.stderr,
+        )
+
+    report = {
+        "meta": {
+            "commit": git_commit(),
+            "python": platform.python_version(),
+            "platform": platform.platform(),
+            "cpus": os.cpu_count(),
+            "timestamp": time.time(),
+            "args": {
+                name: str(value) if isinstance(value, Path) else value
+                for name, value in vars(args).items()
+            },
+        },
+        "results": results,
+    }
+    text = json.dumps(report, indent=2)
+    if args.output:
+        args.output.write_text(text + "\n", encoding="utf-8")
+    else:
+        print(text)  # noqa: T201
+
+    if args.compare:
+        worst = compare(results, args.compare)
+        if args.max_regression is not None and worst > args.max_regression:
+            sys.exit(f"Throughput regressed by {worst:.1%}")
+
+
+if __name__ == "__main__":
+    main()
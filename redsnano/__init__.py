@@ -4,26 +4,82 @@ redsnano
 
 Mini Redis-inspired cache with hash-based validation against a canonical
 data source.  The package exposes a Python API, a lightweight HTTP server
-for multi-language clients, and helper origin store implementations.
+and a Redis-protocol server for multi-language clients, and helper origin
+store implementations.
 """
 
+from .aio import (
+    AsyncDictionaryOriginStore,
+    AsyncMiniRedis,
+    AsyncOriginStore,
+    AsyncSQLiteUserOriginStore,
+)
 from .cache import MiniRedis, CacheEntry
-from .origin import OriginStore, DictionaryOriginStore, JSONFileOriginStore
-from .origin_sqlite import SQLiteUserOriginStore, SQLiteUserRepository
-from .persistence import JSONPersistence
-from .hashing import compute_hash
+from .changefeed import ChangeFeed, InMemoryChangeFeed
+from .client import HashRing, HTTPClient, RESPClient, ShardedClient
+from .eviction import EvictionPolicy, make_eviction_policy
+from .metrics import Metrics, prometheus_text
+from .origin import (
+    BatchOriginStore,
+    DictionaryOriginStore,
+    JSONFileOriginStore,
+    OriginStore,
+)
+from .origin_sqlite import (
+    SQLiteChangeFeed,
+    SQLiteConnectionPool,
+    SQLiteUserOriginStore,
+    SQLiteUserRepository,
+)
+from .persistence import (
+    AppendOnlyPersistence,
+    JSONPersistence,
+    SnapshotPersistence,
+)
+from .replication import Follower, ReplicationLog
+from .resp_server import RESPServer
+from .tracing import SlowLog, Tracer
+from .warm_tier import SQLiteWarmTier, WarmTier
+from .hashing import compute_hash, set_hash_algorithm
 from .fastapi_app import create_app
 
 __all__ = [
     "MiniRedis",
+    "AsyncMiniRedis",
     "CacheEntry",
+    "ChangeFeed",
+    "InMemoryChangeFeed",
+    "EvictionPolicy",
+    "make_eviction_policy",
     "OriginStore",
+    "BatchOriginStore",
     "DictionaryOriginStore",
     "JSONFileOriginStore",
+    "AsyncOriginStore",
+    "AsyncDictionaryOriginStore",
+    "AsyncSQLiteUserOriginStore",
     "JSONPersistence",
+    "AppendOnlyPersistence",
+    "SnapshotPersistence",
     "compute_hash",
+    "set_hash_algorithm",
     "SQLiteUserOriginStore",
     "SQLiteUserRepository",
+    "SQLiteConnectionPool",
+    "SQLiteChangeFeed",
+    "RESPServer",
+    "ReplicationLog",
+    "Follower",
+    "HTTPClient",
+    "RESPClient",
+    "ShardedClient",
+    "HashRing",
+    "Metrics",
+    "prometheus_text",
+    "SlowLog",
+    "Tracer",
+    "WarmTier",
+    "SQLiteWarmTier",
     "create_app",
 ]
 
@@ -0,0 +1,433 @@
+from __future__ import annotations
+
+import asyncio
+import time
+from concurrent.futures import ThreadPoolExecutor
+from functools import partial
+from pathlib import Path
+from typing import (
+    Any,
+    Callable,
+    Dict,
+    Iterable,
+    List,
+    Mapping,
+    Optional,
+    Protocol,
+    Tuple,
+)
+
+from .cache import _FRESH, _STALE, MiniRedis
+from .cache_types import CacheEntry
+from .metrics import Metrics
+from .origin import DictionaryOriginStore
+from .origin_sqlite import SQLiteUserOriginStore
+from .tracing import SlowLog
+
+
+class AsyncOriginStore(Protocol):
+    """Interface for canonical data sources that are read with ``await``."""
+
+    async def fetch_value(self, key: str) -> Any | None:  # pragma: no cover - protocol
+        ...
+
+    async def fetch_hash(self, key: str) -> str | None:  # pragma: no cover - protocol
+        ...
+
+
+class AsyncBatchOriginStore(AsyncOriginStore, Protocol):
+    """
+    Async origin stores that can answer many keys in one round trip.  Keys
+    that do not exist are left out of the returned mappings.
+    """
+
+    async def fetch_values(
+        self, keys: Iterable[str]
+    ) -> Dict[str, Any]:  # pragma: no cover - protocol
+        ...
+
+    async def fetch_hashes(
+        self, keys: Iterable[str]
+    ) -> Dict[str, str]:  # pragma: no cover - protocol
+        ...
+
+
+async def fetch_values(store: AsyncOriginStore, keys: Iterable[str]) -> Dict[str, Any]:
+    """Fetch several values, using ``store.fetch_values`` when available."""
+    batch = getattr(store, "fetch_values", None)
+    if callable(batch):
+        return await batch(keys)
+    keys = list(keys)
+    values = await asyncio.gather(*(store.fetch_value(key) for key in keys))
+    return {key: value for key, value in zip(keys, values) if value is not None}
+
+
+async def fetch_hashes(store: AsyncOriginStore, keys: Iterable[str]) -> Dict[str, str]:
+    """Fetch several hashes, using ``store.fetch_hashes`` when available."""
+    batch = getattr(store, "fetch_hashes", None)
+    if callable(batch):
+        return await batch(keys)
+    keys = list(keys)
+    hashes = await asyncio.gather(*(store.fetch_hash(key) for key in keys))
+    return {key: digest for key, digest in zip(keys, hashes) if digest is not None}
+
+
+class AsyncDictionaryOriginStore:
+    """
+    In-memory async origin store for demos and tests.  Reads never block, so
+    they run directly on the event loop.
+    """
+
+    def __init__(self, seed: Optional[Dict[str, Any]] = None):
+        self.store = DictionaryOriginStore(seed)
+        self.change_feed = self.store.change_feed
+
+    def update(self, key: str, value: Any) -> None:
+        self.store.update(key, value)
+
+    async def fetch_value(self, key: str) -> Any | None:
+        return self.store.fetch_value(key)
+
+    async def fetch_hash(self, key: str) -> str | None:
+        return self.store.fetch_hash(key)
+
+    async def fetch_values(self, keys: Iterable[str]) -> Dict[str, Any]:
+        return self.store.fetch_values(keys)
+
+    async def fetch_hashes(self, keys: Iterable[str]) -> Dict[str, str]:
+        return self.store.fetch_hashes(keys)
+
+
+class AsyncSQLiteUserOriginStore:
+    """
+    Async origin over a :class:`SQLiteUserOriginStore` (given as ``store`` or
+    opened from ``db_path``).  Queries run on a private pool of ``workers``
+    threads, each holding its own pooled WAL connection, so the event loop
+    never waits on SQLite.
+    """
+
+    def __init__(
+        self,
+        db_path: str | Path | None = None,
+        *,
+        store: Optional[SQLiteUserOriginStore] = None,
+        workers: int = 4,
+    ):
+        if store is None:
+            if db_path is None:
+                raise ValueError("Pass either db_path or store")
+            store = SQLiteUserOriginStore(db_path)
+        self.store = store
+        self.change_feed = store.change_feed
+        self._executor = ThreadPoolExecutor(
+            max_workers=workers, thread_name_prefix="redsnano-sqlite"
+        )
+
+    async def call(self, fn: Callable[..., Any], *args: Any) -> Any:
+        """Run a blocking call (e.g. a repository write) on the store's threads."""
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(self._executor, fn, *args)
+
+    async def fetch_value(self, key: str) -> Any | None:
+        return await self.call(self.store.fetch_value, key)
+
+    async def fetch_hash(self, key: str) -> str | None:
+        return await self.call(self.store.fetch_hash, key)
+
+    async def fetch_version(self, key: str) -> int | None:
+        return await self.call(self.store.fetch_version, key)
+
+    async def fetch_values(self, keys: Iterable[str]) -> Dict[str, Any]:
+        return await self.call(self.store.fetch_values, list(keys))
+
+    async def fetch_hashes(self, keys: Iterable[str]) -> Dict[str, str]:
+        return await self.call(self.store.fetch_hashes, list(keys))
+
+    def attach_metrics(self, metrics: Metrics) -> None:
+        self.store.attach_metrics(metrics)
+
+    def close(self) -> None:
+        self._executor.shutdown(wait=True)
+        self.store.close()
+
+
+class _DetachedOrigin:
+    # The core cache behind an AsyncMiniRedis never reads the origin itself;
+    # reaching this means a blocking read path was used by mistake.
+    def fetch_value(self, key: str) -> Any | None:
+        raise RuntimeError("Use the AsyncMiniRedis methods to read through the origin")
+
+    def fetch_hash(self, key: str) -> str | None:
+        raise RuntimeError("Use the AsyncMiniRedis methods to read through the origin")
+
+
+class AsyncMiniRedis:
+    """
+    asyncio API over the :class:`MiniRedis` storage.
+
+    Entries, eviction, expiry, revalidation windows and the change feed are
+    those of the core cache, passed as ``cache`` (to share it with blocking
+    callers) or built from ``cache_options``.  Origin reads are awaited:
+    concurrent misses for a key share one fetch, and background validations
+    run as tasks, one per key and at most ``validation_queue_size`` at once
+    (further ones are dropped; the cached value is still served).
+
+    Hits are answered on the event loop.  Anything that may touch the disk,
+    i.e. writes, stores after a miss, expiry and warm-tier reads, which
+    write to the persistence backend or the warm tier, runs on a private
+    pool of ``io_workers`` threads, so the loop never waits on a save.
+    """
+
+    def __init__(
+        self,
+        origin_store: AsyncOriginStore,
+        *,
+        cache: Optional[MiniRedis] = None,
+        io_workers: int = 4,
+        **cache_options: Any,
+    ):
+        if cache is not None and cache_options:
+            raise TypeError("Pass either cache or cache options, not both")
+        self._owns_cache = cache is None
+        if cache is None:
+            cache = MiniRedis(_DetachedOrigin(), **cache_options)
+        self.origin_store = origin_store
+        self.cache = cache
+        attach_metrics = getattr(origin_store, "attach_metrics", None)
+        if callable(attach_metrics):
+            attach_metrics(cache.metrics)
+        self.max_validations = cache._validator.max_queue
+        self._loads: Dict[str, asyncio.Future] = {}
+        self._loads_coalesced = 0
+        self._validations: Dict[str, asyncio.Task] = {}
+        self._validations_coalesced = 0
+        self._validations_dropped = 0
+        self._executor = ThreadPoolExecutor(
+            max_workers=io_workers, thread_name_prefix="redsnano-aio"
+        )
+
+    async def get(self, key: str, *, ttl: Optional[float] = None) -> Any | None:
+        started = time.perf_counter()
+        trace = self.cache._begin("get", key)
+        try:
+            entry = await self._get(key, ttl)
+        finally:
+            self.cache._finish("get", started, trace)
+        return None if entry is None else entry.value
+
+    async def get_encoded(
+        self, key: str, *, ttl: Optional[float] = None
+    ) -> bytes | None:
+        """:meth:`get` returning canonical JSON bytes; see ``MiniRedis.get_encoded``."""
+        started = time.perf_counter()
+        trace = self.cache._begin("get", key)
+        try:
+            entry = await self._get(key, ttl)
+        finally:
+            self.cache._finish("get", started, trace)
+        return None if entry is None else entry.json_bytes()
+
+    async def _get(self, key: str, ttl: Optional[float]) -> CacheEntry | None:
+        cache = self.cache
+        entry = cache._lookup(key)
+        now = time.time()
+        if entry is not None and entry.is_expired(now):
+            await self._run(cache._expire_key, key, entry)
+            entry = None
+        if entry is None and cache.warm_tier is not None:
+            entry = (await self._run(cache._promote, [key])).get(key)
+
+        if entry is None:
+            cache.metrics.incr("keyspace_misses")
+            return await self._load(key, ttl)
+        cache.metrics.incr("keyspace_hits")
+
+        if cache._should_refresh_early(entry, now):
+            cache.metrics.incr("early_refreshes")
+            return await self._load(key, ttl)
+
+        freshness = cache._freshness(entry)
+        if freshness == _FRESH:
+            return entry
+        if freshness == _STALE or cache.validate_async:
+            self._spawn_validation(key, entry)
+            return entry
+
+        await self._validate_hash(key, entry)
+        entry = cache._peek(key)
+        if entry is None:
+            return await self._load(key, ttl)
+        return entry
+
+    async def mget(
+        self, keys: Iterable[str], *, ttl: Optional[float] = None
+    ) -> List[Any | None]:
+        """Like :meth:`MiniRedis.mget`, awaiting the origin batches."""
+        cache = self.cache
+        started = time.perf_counter()
+        keys = list(keys)
+        trace = cache._begin("mget", keys)
+        try:
+            # Planning may expire keys or read the warm tier, so it runs off
+            # the loop; validations it asks for are spawned back on it.
+            background: List[Tuple[str, CacheEntry]] = []
+            plan = await self._run(
+                cache._plan_mget, keys, lambda *item: background.append(item)
+            )
+            for key, entry in background:
+                self._spawn_validation(key, entry)
+            if plan.to_validate:
+                fetch_started = cache._start_phase("origin_fetch_hash")
+                origin_hashes = await fetch_hashes(self.origin_store, plan.to_validate)
+                cache._record_origin_call("origin_fetch_hash", fetch_started)
+                cache._apply_mget_hashes(plan, origin_hashes)
+            if plan.missing:
+                generation = cache._feed_generation
+                fetch_started = cache._start_phase("origin_fetch")
+                loaded = await fetch_values(self.origin_store, plan.missing)
+                fetch_cost = cache._record_origin_call("origin_fetch", fetch_started)
+                await self._run(
+                    cache._apply_mget_loaded, plan, loaded, ttl, generation, fetch_cost
+                )
+        finally:
+            cache._finish("mget", started, trace)
+        return [plan.results.get(key) for key in keys]
+
+    async def set(
+        self,
+        key: str,
+        value: Any,
+        ttl: Optional[float] = None,
+        *,
+        revalidate_after: Optional[float] = None,
+    ) -> None:
+        await self._run(
+            partial(self.cache.set, revalidate_after=revalidate_after), key, value, ttl
+        )
+
+    async def mset(self, items: Mapping[str, Any], ttl: Optional[float] = None) -> None:
+        await self._run(self.cache.mset, items, ttl)
+
+    async def delete(self, key: str) -> None:
+        await self._run(self.cache.delete, key)
+
+    async def mdelete(self, keys: Iterable[str]) -> int:
+        return await self._run(self.cache.mdelete, list(keys))
+
+    def keys(self) -> list[str]:
+        return self.cache.keys()
+
+    def info(self) -> Dict[str, Any]:
+        info = self.cache.info()
+        info["loads_in_flight"] += len(self._loads)
+        info["loads_coalesced"] += self._loads_coalesced
+        info["validation_queue_depth"] += len(self._validations)
+        info["validations_coalesced"] += self._validations_coalesced
+        info["validations_dropped"] += self._validations_dropped
+        return info
+
+    @property
+    def metrics(self) -> Metrics:
+        return self.cache.metrics
+
+    @property
+    def slowlog(self) -> SlowLog:
+        return self.cache.slowlog
+
+    def stats(self) -> Dict[str, Any]:
+        return {"info": self.info(), **self.metrics.snapshot()}
+
+    async def close(self) -> None:
+        """Wait for running validations, then close a cache this instance built."""
+        if self._validations:
+            await asyncio.gather(*self._validations.values(), return_exceptions=True)
+        self._executor.shutdown(wait=True)
+        if self._owns_cache:
+            self.cache.close()
+
+    async def _run(self, fn: Callable[..., Any], *args: Any) -> Any:
+        # Blocking cache work that may write to disk, off the event loop.
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(self._executor, fn, *args)
+
+    async def _load(self, key: str, ttl: Optional[float]) -> CacheEntry | None:
+        future = self._loads.get(key)
+        if future is not None:
+            self._loads_coalesced += 1
+            try:
+                return await asyncio.wait_for(
+                    asyncio.shield(future), self.cache.load_timeout
+                )
+            except asyncio.TimeoutError:
+                raise TimeoutError(
+                    f"Timed out waiting for in-flight load of {key!r}"
+                ) from None
+
+        future = asyncio.get_running_loop().create_future()
+        self._loads[key] = future
+        try:
+            entry = await self._fetch_and_store(key, ttl)
+        except asyncio.CancelledError:
+            future.cancel()
+            raise
+        except BaseException as exc:
+            future.set_exception(exc)
+            future.exception()  # retrieved here so an unawaited one is not logged
+            raise
+        else:
+            future.set_result(entry)
+            return entry
+        finally:
+            del self._loads[key]
+
+    async def _fetch_and_store(
+        self, key: str, ttl: Optional[float]
+    ) -> CacheEntry | None:
+        cache = self.cache
+        generation = cache._feed_generation
+        started = cache._start_phase("origin_fetch")
+        value = await self.origin_store.fetch_value(key)
+        fetch_cost = cache._record_origin_call("origin_fetch", started)
+        if value is None:
+            return None
+        store = partial(
+            cache._store_value, fetch_cost=fetch_cost, generation=generation
+        )
+        return await self._run(store, key, value, ttl or cache.default_ttl)
+
+    def _spawn_validation(self, key: str, entry: CacheEntry) -> None:
+        if key in self._validations:
+            self._validations_coalesced += 1
+            return
+        if len(self._validations) >= self.max_validations:
+            self._validations_dropped += 1
+            return
+        task = asyncio.get_running_loop().create_task(
+            self._validate_quietly(key, entry)
+        )
+        self._validations[key] = task
+        task.add_done_callback(lambda _: self._validations.pop(key, None))
+
+    async def _validate_quietly(self, key: str, entry: CacheEntry) -> None:
+        try:
+            await self._validate_hash(key, entry)
+        except Exception:  # noqa: BLE001 - a failed validation keeps the cached value
+            pass
+
+    async def _validate_hash(self, key: str, entry: CacheEntry) -> None:
+        cache = self.cache
+        generation = cache._feed_generation
+        cache.metrics.incr("validations")
+        started = cache._start_phase("origin_fetch_hash")
+        origin_hash = await self.origin_store.fetch_hash(key)
+        cache._record_origin_call("origin_fetch_hash", started)
+        if origin_hash is None:
+            return
+        if origin_hash == entry.hash:
+            entry.validated_at = time.time()
+            return
+        cache.metrics.incr("hash_mismatches")
+        started = cache._start_phase("origin_fetch")
+        value = await self.origin_store.fetch_value(key)
+        cache._record_origin_call("origin_fetch", started)
+        await self._run(cache._replace_stale, key, entry, value, generation)
@@ -1,111 +1,1227 @@
 from __future__ import annotations
 
+import copy
+import math
+import random
 import threading
 import time
-from typing import Any, Dict, Optional
+from collections import deque
+from dataclasses import dataclass, field
+from functools import partial
+from typing import (
+    TYPE_CHECKING,
+    Any,
+    Callable,
+    Deque,
+    Dict,
+    Iterable,
+    List,
+    Mapping,
+    Optional,
+    Tuple,
+)
 
-from .cache_types import CacheEntry
-from .hashing import compute_hash
-from .origin import OriginStore
-from .persistence import JSONPersistence
+from .cache_types import CacheEntry, CacheEntrySerialized
+from .changefeed import ChangeFeed
+from .eviction import EvictionPolicy, make_eviction_policy
+from .hashing import canonical_bytes, canonical_json, packed_hash_bytes
+from .metrics import Metrics
+from .origin import OriginStore, fetch_hashes, fetch_values
+from .persistence import JSONPersistence, Persistence
+from .sharding import Shard
+from .singleflight import SingleFlight
+from .tracing import (
+    DEFAULT_SLOWLOG_MAX_LEN,
+    OperationTrace,
+    SlowLog,
+    Tracer,
+    current_trace,
+)
+from .validation import OVERFLOW_DROP, ValidationScheduler
+from .warm_tier import WarmTier
+
+if TYPE_CHECKING:  # pragma: no cover - import cycle at runtime
+    from .replication import ReplicationLog
+
+# Rough per-key bookkeeping cost (dict slot, entry object, digest) added to
+# the encoded key and value sizes when enforcing ``max_memory_bytes``.
+ENTRY_OVERHEAD_BYTES = 200
+
+# Share of each active expiry period the sweeper may spend reclaiming keys,
+# and how many due keys it handles per lock acquisition (as in Redis'
+# ``ACTIVE_EXPIRE_CYCLE_SLOW_TIME_PERC`` / ``..._KEYS_PER_LOOP``).
+ACTIVE_EXPIRE_CYCLE_BUDGET = 0.25
+ACTIVE_EXPIRE_BATCH_SIZE = 20
+
+# Changes read from the origin's change feed per lock acquisition.
+CHANGE_FEED_BATCH = 1000
+
+# Default number of independently locked shards the keyspace is split into.
+DEFAULT_SHARDS = 16
+
+# Counter bumped for each kind of origin round trip, by histogram name.
+_ORIGIN_CALL_COUNTERS = {
+    "origin_fetch": "origin_fetches",
+    "origin_fetch_hash": "origin_hash_fetches",
+}
+
+# How a cache hit relates to its revalidation window.
+_FRESH = "fresh"
+_STALE = "stale"
+_MUST_VALIDATE = "must-validate"
+
+
+@dataclass
+class _MGetPlan:
+    now: float
+    results: Dict[str, Any] = field(default_factory=dict)
+    missing: List[str] = field(default_factory=list)
+    to_validate: Dict[str, CacheEntry] = field(default_factory=dict)
+    stale: Dict[str, CacheEntry] = field(default_factory=dict)
 
 
 class MiniRedis:
     """
     Core cache that mirrors Redis-like GET/SET semantics and keeps data
     fresh by comparing hashes with the origin store.
+
+    ``max_entries`` and ``max_memory_bytes`` bound the cache; once either
+    limit is exceeded keys are evicted according to ``eviction_policy``
+    (``"lru"``, ``"lfu"``, ``"volatile-ttl"``, ``"random"`` or a custom
+    :class:`~redsnano.eviction.EvictionPolicy`).
+
+    With ``active_expiry`` enabled a background sweeper runs ``expiry_hz``
+    times per second and reclaims keys whose TTL elapsed, even if they are
+    never read again.
+
+    Asynchronous validations run on a pool of ``validation_workers`` threads
+    with at most ``validation_queue_size`` keys waiting; repeated hits on a
+    key that is already queued are coalesced, and ``validation_overflow``
+    (``"drop"`` or ``"inline"``) decides what happens when the queue is full.
+
+    ``revalidate_after`` (cache-wide, or per key via :meth:`set`) serves hits
+    without contacting the origin until that many seconds have passed since
+    the entry was last validated or written.  For ``stale_while_revalidate``
+    seconds past that window hits are still served immediately while a
+    background validation refreshes the entry.
+
+    Misses are loaded through a single flight per key, so concurrent callers
+    share one origin fetch (waiting at most ``load_timeout`` seconds).  A
+    positive ``early_refresh_beta`` enables probabilistic early refresh
+    (XFetch): hits on a key close to expiry occasionally reload it, with a
+    probability that grows as expiry nears and with the cost of the last
+    fetch.
+
+    Given a ``change_feed`` (usually ``origin_store.change_feed``), a
+    background thread reads it every ``change_feed_interval`` seconds and
+    drops the keys that changed at the origin.  Hits are then served without
+    any origin call, as long as the feed was read within the last
+    ``max_feed_lag`` seconds; past that, hits are validated as usual until
+    the feed catches up.  ``info()["change_feed_lag"]`` reports how stale
+    the cache may be.
+
+    The keyspace is split by key hash into ``shards`` slices, each with its
+    own lock, eviction policy, expiry heap and an equal share of
+    ``max_entries`` / ``max_memory_bytes``, so threads working on different
+    keys rarely wait on each other.  By default a cache without size limits
+    gets ``DEFAULT_SHARDS`` of them and one with limits a single shard, so
+    the limits and eviction order are exact; an explicit ``shards`` count
+    enforces them per shard instead.
+
+    A ``replication`` log (see :mod:`redsnano.replication`) receives every
+    set and delete, in the order they were applied, for followers to replay.
+
+    Hits, misses, validations, origin round trips and the latency of gets,
+    sets, hashing, origin fetches and persistence are recorded in
+    ``metrics`` (shared with origin stores that offer ``attach_metrics``);
+    :meth:`stats` reports them.
+
+    Operations taking at least ``slowlog_threshold`` seconds are kept, with
+    the time spent per phase (lock waits, hashing, origin calls,
+    persistence), in the :attr:`slowlog` ring buffer of
+    ``slowlog_max_len`` entries.  A ``tracer`` (see
+    :class:`~redsnano.tracing.Tracer`) is called at the start and end of
+    every operation and phase.  With neither set, phases are not tracked.
+
+    Values whose canonical JSON is at least ``compress_threshold`` bytes are
+    held as those bytes, zlib-compressed when that saves space, instead of
+    as Python objects, and decoded on every read: CPU traded for memory.
+    Values that do not survive the JSON round trip (tuples, sets, dates...)
+    stay objects.  With ``max_memory_bytes`` entries are accounted at their
+    stored size.
+
+    With ``keep_encoded`` the other values also keep the canonical JSON bytes
+    their digest was computed over, so :meth:`get_encoded` (and the HTTP
+    front ends) serve hits without encoding them again: memory traded for
+    CPU.
+
+    A ``warm_tier`` (see :class:`~redsnano.warm_tier.SQLiteWarmTier`) turns
+    the size limits into a hot tier: evicted entries are written to it
+    instead of being dropped, and keys missing from memory are looked up
+    there before the origin.  Entries found there move back into memory and
+    are validated like entries never checked against the origin (inline,
+    or in the background with ``validate_async``).  Deleted, expired and
+    invalidated keys lose their warm copies too.  :meth:`keys` and
+    :meth:`info` describe the in-memory tier.
     """
 
     def __init__(
         self,
         origin_store: OriginStore,
         *,
-        persistence: Optional[JSONPersistence] = None,
+        persistence: Optional[Persistence] = None,
         default_ttl: Optional[float] = None,
         validate_async: bool = True,
+        max_entries: Optional[int] = None,
+        max_memory_bytes: Optional[int] = None,
+        eviction_policy: str | EvictionPolicy = "lru",
+        active_expiry: bool = True,
+        expiry_hz: float = 10,
+        validation_workers: int = 4,
+        validation_queue_size: int = 1024,
+        validation_overflow: str = OVERFLOW_DROP,
+        revalidate_after: Optional[float] = None,
+        stale_while_revalidate: float = 0,
+        load_timeout: Optional[float] = None,
+        early_refresh_beta: float = 0,
+        change_feed: Optional[ChangeFeed] = None,
+        change_feed_interval: float = 0.1,
+        max_feed_lag: float = 5.0,
+        shards: Optional[int] = None,
+        replication: Optional[ReplicationLog] = None,
+        metrics: Optional[Metrics] = None,
+        slowlog_threshold: Optional[float] = None,
+        slowlog_max_len: int = DEFAULT_SLOWLOG_MAX_LEN,
+        tracer: Optional[Tracer] = None,
+        compress_threshold: Optional[int] = None,
+        keep_encoded: bool = False,
+        warm_tier: Optional[WarmTier] = None,
     ):
+        if shards is None:
+            # Split limits would no longer be exact, so limited caches
+            # default to one shard.
+            limited = max_entries is not None or max_memory_bytes is not None
+            shards = 1 if limited else DEFAULT_SHARDS
+        if shards < 1:
+            raise ValueError("shards must be at least 1")
         self.origin_store = origin_store
         self.persistence = persistence or JSONPersistence("cache.json")
+        self.metrics = metrics or Metrics()
+        attach_metrics = getattr(origin_store, "attach_metrics", None)
+        if callable(attach_metrics):
+            attach_metrics(self.metrics)
+        self.slowlog = SlowLog(slowlog_threshold, slowlog_max_len)
+        self.tracer = tracer
         self.default_ttl = default_ttl
         self.validate_async = validate_async
-        self._lock = threading.RLock()
-        self._store: Dict[str, CacheEntry] = {
-            key: CacheEntry.from_serialized(value)
-            for key, value in self.persistence.load().items()
-        }
+        self.revalidate_after = revalidate_after
+        self.stale_while_revalidate = stale_while_revalidate
+        self.load_timeout = load_timeout
+        self.early_refresh_beta = early_refresh_beta
+        self._flights = SingleFlight()
+        self._validator = ValidationScheduler(
+            workers=validation_workers,
+            max_queue=validation_queue_size,
+            overflow=validation_overflow,
+        )
+        self.max_entries = max_entries
+        self.max_memory_bytes = max_memory_bytes
+        self.compress_threshold = compress_threshold
+        self.keep_encoded = keep_encoded
+        self.warm_tier = warm_tier
+        # Pending warm-tier writes in the order they happened under the
+        # shard locks: (key, entry) for evictions, (key, None) for removals.
+        self._warm_ops: Deque[Tuple[str, Optional[CacheEntry]]] = deque()
+        self._warm_lock = threading.Lock()
+        eviction: EvictionPolicy | None = None
+        if max_entries is not None or max_memory_bytes is not None:
+            eviction = (
+                make_eviction_policy(eviction_policy)
+                if isinstance(eviction_policy, str)
+                else eviction_policy
+            )
+        self._eviction_name = eviction.name if eviction is not None else None
+        self._shards = [
+            Shard(
+                eviction if index == 0 else copy.deepcopy(eviction),
+                max_entries=_share(max_entries, shards),
+                max_memory_bytes=_share(max_memory_bytes, shards),
+            )
+            for index in range(shards)
+        ]
+        if warm_tier is not None:
+            for shard in self._shards:
+                shard.demote = self._queue_demotion
+        self.active_expiry = active_expiry
+        self.expiry_hz = expiry_hz
+        self._expirer: threading.Thread | None = None
+        self._expirer_lock = threading.Lock()
+        self._closing = threading.Event()
+        self._persist_lock = threading.Lock()
+        self.replication = replication
+        self._incremental = callable(getattr(self.persistence, "record_set", None))
+        iter_load = getattr(self.persistence, "iter_load", None)
+        loaded = iter_load() if callable(iter_load) else self.persistence.load().items()
+        for key, value in loaded:
+            entry = self._compact(key, CacheEntry.from_serialized(value))
+            shard = self._shard(key)
+            with shard.lock:
+                self._insert(shard, key, entry)
+        evicted = False
+        for shard in self._shards:
+            with shard.lock:
+                victims = shard.evict()
+                self._log_deletes(victims)
+            evicted = evicted or bool(victims)
+        self._flush(evicted)
+        attach = getattr(self.persistence, "attach", None)
+        if callable(attach):
+            attach(self._snapshot)
+        self.change_feed = change_feed
+        self.change_feed_interval = change_feed_interval
+        self.max_feed_lag = max_feed_lag
+        self._feed_lock = threading.Lock()
+        self._feed_seq = 0
+        self._feed_synced_at: float | None = None
+        self._feed_generation = 0
+        self._feed_invalidations = 0
+        self._feed_resets = 0
+        self._feed_follower: threading.Thread | None = None
+        if change_feed is not None:
+            self._subscribe(change_feed)
 
-    def set(self, key: str, value: Any, ttl: Optional[float] = None) -> None:
-        expire_at = time.time() + ttl if ttl else None
-        entry = CacheEntry(value=value, hash=compute_hash(value), expire_at=expire_at)
-        with self._lock:
-            self._store[key] = entry
-            self._persist()
+    def set(
+        self,
+        key: str,
+        value: Any,
+        ttl: Optional[float] = None,
+        *,
+        revalidate_after: Optional[float] = None,
+    ) -> None:
+        started = time.perf_counter()
+        trace = self._begin("set", key)
+        try:
+            self._store_value(key, value, ttl, revalidate_after=revalidate_after)
+        finally:
+            self._finish("set", started, trace)
 
     def get(self, key: str, *, ttl: Optional[float] = None) -> Any | None:
-        with self._lock:
-            entry = self._store.get(key)
+        started = time.perf_counter()
+        trace = self._begin("get", key)
+        try:
+            entry = self._get(key, ttl)
+        finally:
+            self._finish("get", started, trace)
+        return None if entry is None else entry.value
 
-        if entry and entry.is_expired(time.time()):
-            self.delete(key)
+    def get_encoded(self, key: str, *, ttl: Optional[float] = None) -> bytes | None:
+        """
+        :meth:`get`, returning the value's canonical JSON bytes instead of
+        the value (see ``keep_encoded``).  Raises TypeError for values that
+        have no JSON form.
+        """
+        started = time.perf_counter()
+        trace = self._begin("get", key)
+        try:
+            entry = self._get(key, ttl)
+        finally:
+            self._finish("get", started, trace)
+        return None if entry is None else entry.json_bytes()
+
+    def _get(self, key: str, ttl: Optional[float]) -> CacheEntry | None:
+        entry = self._lookup(key)
+        now = time.time()
+        if entry and entry.is_expired(now):
+            self._expire_key(key, entry)
             entry = None
+        if entry is None and self.warm_tier is not None:
+            entry = self._promote([key]).get(key)
 
         if entry is None:
-            value = self._fetch_from_origin(key)
-            if value is None:
-                return None
-            self.set(key, value, ttl=ttl or self.default_ttl)
-            return value
+            self.metrics.incr("keyspace_misses")
+            return self._load_from_origin(key, ttl)
+        self.metrics.incr("keyspace_hits")
+
+        if self._should_refresh_early(entry, now):
+            self.metrics.incr("early_refreshes")
+            return self._load_from_origin(key, ttl)
+
+        freshness = self._freshness(entry)
+        if freshness == _FRESH:
+            return entry
+        if freshness == _STALE:
+            self._submit_validation(key, entry)
+            return entry
 
         entry = self._schedule_validation(key, entry)
         if entry is None:
-            value = self._fetch_from_origin(key)
-            if value is None:
-                return None
-            self.set(key, value, ttl=ttl or self.default_ttl)
-            return value
-        return entry.value
+            return self._load_from_origin(key, ttl)
+        return entry
 
     def delete(self, key: str) -> None:
-        with self._lock:
-            if key in self._store:
-                del self._store[key]
-                self._persist()
+        started = time.perf_counter()
+        trace = self._begin("delete", key)
+        shard = self._shard(key)
+        try:
+            if not shard.lock.acquire(False):
+                self._wait_for_lock(shard)
+            try:
+                removed = shard.remove(key) is not None
+                if removed:
+                    self._log_deletes([key])
+                self._forget_warm([key])
+            finally:
+                shard.lock.release()
+            self._flush(removed)
+        finally:
+            self._finish("delete", started, trace)
+
+    def mget(
+        self, keys: Iterable[str], *, ttl: Optional[float] = None
+    ) -> List[Any | None]:
+        """
+        Return the values of ``keys`` in order (``None`` when unknown).  Cache
+        lookups share one lock acquisition per shard; misses and synchronous
+        validations go to the origin as one batch each.
+        """
+        started = time.perf_counter()
+        keys = list(keys)
+        trace = self._begin("mget", keys)
+        try:
+            plan = self._plan_mget(keys, self._submit_validation)
+            if plan.to_validate:
+                fetch_started = self._start_phase("origin_fetch_hash")
+                origin_hashes = fetch_hashes(self.origin_store, plan.to_validate)
+                self._record_origin_call("origin_fetch_hash", fetch_started)
+                self._apply_mget_hashes(plan, origin_hashes)
+            if plan.missing:
+                generation = self._feed_generation
+                fetch_started = self._start_phase("origin_fetch")
+                loaded = fetch_values(self.origin_store, plan.missing)
+                fetch_cost = self._record_origin_call("origin_fetch", fetch_started)
+                self._apply_mget_loaded(plan, loaded, ttl, generation, fetch_cost)
+        finally:
+            self._finish("mget", started, trace)
+        return [plan.results.get(key) for key in keys]
+
+    def mset(self, items: Mapping[str, Any], ttl: Optional[float] = None) -> None:
+        """Store several values with one lock acquisition per shard and one persist."""
+        started = time.perf_counter()
+        trace = self._begin("mset", items)
+        try:
+            entries = [
+                (key, self._make_entry(key, value, ttl)) for key, value in items.items()
+            ]
+            self._store_entries(entries)
+        finally:
+            self._finish("mset", started, trace)
+
+    def mdelete(self, keys: Iterable[str]) -> int:
+        """Delete several keys; returns how many were present."""
+        started = time.perf_counter()
+        keys = list(keys)
+        trace = self._begin("mdelete", keys)
+        try:
+            removed = self._remove_keys(keys)
+            self._flush(bool(removed))
+        finally:
+            self._finish("mdelete", started, trace)
+        return len(removed)
 
     def keys(self) -> list[str]:
-        with self._lock:
-            return list(self._store.keys())
+        now = time.time()
+        live: list[str] = []
+        for shard in self._shards:
+            with shard.lock:
+                live.extend(
+                    key
+                    for key, entry in shard.store.items()
+                    if not entry.is_expired(now)
+                )
+        return live
+
+    def expire(self, key: str, ttl: float) -> bool:
+        """
+        Give a cached key a new TTL in seconds (deleting it when ``ttl`` is
+        not positive).  Returns False if the key is not cached; the origin
+        is not consulted.
+        """
+        now = time.time()
+        shard = self._shard(key)
+        with shard.lock:
+            entry = shard.get(key)
+            if entry is None or entry.is_expired(now):
+                return False
+            if ttl <= 0:
+                shard.remove(key)
+                self._log_deletes([key])
+                self._forget_warm([key])
+            else:
+                entry = copy.copy(entry)
+                entry.expire_at = now + ttl
+                self._log_sets([(key, entry)])
+                self._insert(shard, key, entry)
+        self._flush()
+        return True
+
+    def ttl(self, key: str) -> float:
+        """
+        Seconds until a cached key expires, ``-1`` if it has no expiry and
+        ``-2`` if it is not cached, as Redis' ``TTL`` reports it.
+        """
+        now = time.time()
+        shard = self._shard(key)
+        with shard.lock:
+            entry = shard.get(key)
+        if entry is None or entry.is_expired(now):
+            return -2
+        if entry.expire_at is None:
+            return -1
+        return entry.expire_at - now
+
+    def expire_cycle(self, time_budget: Optional[float] = None) -> int:
+        """
+        Reclaim expired keys, in batches, until none are due or ``time_budget``
+        seconds have been spent.  Shards are visited in turn, one batch per
+        lock acquisition.  Returns the number of keys removed.
+        """
+        deadline = time.perf_counter() + time_budget if time_budget else None
+        removed_total = 0
+        pending = self._shards
+        while pending:
+            backlog = []
+            for shard in pending:
+                with shard.lock:
+                    now = time.time()
+                    removed = shard.expire_due(now, ACTIVE_EXPIRE_BATCH_SIZE)
+                    self._log_deletes(removed)
+                    self._forget_warm(removed)
+                    next_expiry = shard.expiry.next_expiry()
+                removed_total += len(removed)
+                if next_expiry is not None and next_expiry <= now:
+                    backlog.append(shard)
+            pending = backlog
+            if deadline is not None and time.perf_counter() >= deadline:
+                break
+        self._flush(bool(removed_total))
+        return removed_total
+
+    def sync_changes(self) -> int:
+        """
+        Read the change feed up to its end and drop the keys it announces.
+        Returns the number of cached keys removed.
+        """
+        feed = self.change_feed
+        if feed is None:
+            return 0
+        with self._feed_lock:
+            started = time.time()
+            invalidated = 0
+            while True:
+                changes = feed.changes_since(self._feed_seq, CHANGE_FEED_BATCH)
+                if not changes:
+                    break
+                # Bumped before any key is dropped, so a load that read the
+                # origin before this change cannot be stored as trusted.
+                self._feed_generation += 1
+                if changes[0].seq != self._feed_seq + 1:
+                    # Changes were trimmed before we read them; any
+                    # cached key may be stale.
+                    keys: Iterable[str] = self._all_keys()
+                    self._feed_resets += 1
+                else:
+                    keys = {change.key for change in changes}
+                removed = self._remove_keys(keys)
+                self._flush(bool(removed))
+                self._feed_seq = changes[-1].seq
+                self._feed_invalidations += len(removed)
+                invalidated += len(removed)
+                if len(changes) < CHANGE_FEED_BATCH:
+                    break
+            self._feed_synced_at = started
+        return invalidated
+
+    def info(self) -> Dict[str, Any]:
+        """Return Redis ``INFO``-style figures about the cache contents."""
+        keys = used_memory = evicted_keys = expired_keys = expires_pending = 0
+        for shard in self._shards:
+            with shard.lock:
+                keys += len(shard.store)
+                used_memory += shard.used_memory
+                evicted_keys += shard.evicted_keys
+                expired_keys += shard.expired_keys
+                expires_pending += len(shard.expiry)
+        info: Dict[str, Any] = {
+            "keys": keys,
+            "used_memory": used_memory,
+            "max_entries": self.max_entries,
+            "max_memory_bytes": self.max_memory_bytes,
+            "eviction_policy": self._eviction_name,
+            "evicted_keys": evicted_keys,
+            "expired_keys": expired_keys,
+            "expires_pending": expires_pending,
+            "shards": len(self._shards),
+            "loads_in_flight": self._flights.in_flight(),
+            "loads_coalesced": self._flights.shared,
+            "early_refreshes": self.metrics.counters().get("early_refreshes", 0),
+        }
+        if self.change_feed is not None:
+            info.update(
+                change_feed_seq=self._feed_seq,
+                change_feed_lag=self._feed_lag(),
+                change_feed_invalidations=self._feed_invalidations,
+                change_feed_resets=self._feed_resets,
+            )
+        validation = self._validator.stats()
+        info.update(
+            validation_queue_depth=validation["queue_depth"],
+            validations_coalesced=validation["coalesced"],
+            validations_dropped=validation["dropped"],
+            validations_inline=validation["inline"],
+        )
+        return info
+
+    def stats(self) -> Dict[str, Any]:
+        """
+        ``info()`` plus the recorded counters and latency summaries (count,
+        mean, max and p50/p90/p99/p99.9 in microseconds per operation).
+        """
+        return {"info": self.info(), **self.metrics.snapshot()}
+
+    def close(self) -> None:
+        """Stop background work, then flush and release the persistence backend."""
+        self._closing.set()
+        if self._expirer is not None:
+            self._expirer.join()
+        if self._feed_follower is not None:
+            self._feed_follower.join()
+        self._validator.close()
+        close = getattr(self.persistence, "close", None)
+        if callable(close):
+            close()
+        if self.warm_tier is not None:
+            self._flush(False)
+            close = getattr(self.warm_tier, "close", None)
+            if callable(close):
+                close()
+
+    def _begin(self, operation: str, args: Any) -> OperationTrace | None:
+        # Start tracking the phases of a public operation, unless neither the
+        # slow log nor a tracer wants them.
+        if self.slowlog.threshold is None and self.tracer is None:
+            return None
+        trace = OperationTrace(operation, args, self.tracer)
+        trace.token = current_trace.set(trace)
+        return trace
+
+    def _finish(
+        self, operation: str, started: float, trace: OperationTrace | None
+    ) -> None:
+        elapsed = time.perf_counter() - started
+        self.metrics.observe(operation, elapsed)
+        if trace is not None:
+            current_trace.reset(trace.token)
+            trace.finish(elapsed, self.slowlog)
+
+    def _start_phase(self, phase: str) -> float:
+        trace = current_trace.get()
+        if trace is not None:
+            trace.start(phase)
+        return time.perf_counter()
+
+    def _end_phase(self, phase: str, started: float) -> float:
+        elapsed = time.perf_counter() - started
+        self.metrics.observe(phase, elapsed)
+        trace = current_trace.get()
+        if trace is not None:
+            trace.end(phase, elapsed)
+        return elapsed
+
+    def _wait_for_lock(self, shard: Shard) -> None:
+        # Callers try the shard lock without blocking first, so only
+        # contended acquisitions are timed.
+        started = self._start_phase("lock")
+        shard.lock.acquire()
+        self._end_phase("lock", started)
+
+    def _shard(self, key: str) -> Shard:
+        return self._shards[hash(key) % len(self._shards)]
+
+    def _group(self, keys: Iterable[str]) -> List[Tuple[Shard, List[str]]]:
+        # Keys bucketed by shard, so each shard lock is taken once per batch.
+        groups: Dict[int, List[str]] = {}
+        count = len(self._shards)
+        for key in keys:
+            groups.setdefault(hash(key) % count, []).append(key)
+        return [(self._shards[index], group) for index, group in groups.items()]
+
+    def _apply_replicated(
+        self, mutations: Iterable[Tuple[str, Optional[CacheEntrySerialized]]]
+    ) -> None:
+        # Replays a leader's sets and deletes (``None``), in order, as local
+        # writes.
+        changed = False
+        for key, data in mutations:
+            shard = self._shard(key)
+            with shard.lock:
+                if data is None:
+                    if shard.remove(key) is not None:
+                        self._log_deletes([key])
+                        changed = True
+                    self._forget_warm([key])
+                    continue
+                entry = self._replica_entry(key, data)
+                self._log_sets([(key, entry)])
+                self._insert(shard, key, entry)
+                self._log_deletes(shard.evict())
+                changed = True
+        self._flush(changed)
+
+    def _load_replica(self, entries: Mapping[str, CacheEntrySerialized]) -> None:
+        # Full resync: the leader's snapshot replaces everything held locally.
+        stale = [key for key in self._all_keys() if key not in entries]
+        self._remove_keys(stale)
+        self._apply_replicated(entries.items())
+        self._flush(bool(stale) and not entries)
+
+    def _replica_entry(self, key: str, data: CacheEntrySerialized) -> CacheEntry:
+        return self._compact(key, CacheEntry.from_serialized(dict(data)))
+
+    def _lookup(self, key: str) -> CacheEntry | None:
+        shard = self._shard(key)
+        if not shard.lock.acquire(False):
+            self._wait_for_lock(shard)
+        try:
+            return shard.get(key, touch=True)
+        finally:
+            shard.lock.release()
+
+    def _peek(self, key: str) -> CacheEntry | None:
+        shard = self._shard(key)
+        with shard.lock:
+            return shard.get(key)
+
+    def _all_keys(self) -> List[str]:
+        keys: List[str] = []
+        for shard in self._shards:
+            with shard.lock:
+                keys.extend(shard.store)
+        return keys
+
+    def _remove_keys(self, keys: Iterable[str]) -> List[str]:
+        removed: List[str] = []
+        for shard, group in self._group(keys):
+            with shard.lock:
+                gone = [key for key in group if shard.remove(key) is not None]
+                self._log_deletes(gone)
+                self._forget_warm(group)
+            removed.extend(gone)
+        return removed
+
+    def _submit_validation(self, key: str, entry: CacheEntry) -> None:
+        self._validator.submit(key, partial(self._validate_hash, key, entry))
+
+    def _plan_mget(
+        self, keys: List[str], background: Callable[[str, CacheEntry], None]
+    ) -> _MGetPlan:
+        # Sort the keys into hits, misses and hits needing a synchronous
+        # validation; ``background`` receives hits validated asynchronously.
+        found: Dict[str, CacheEntry | None] = {}
+        for shard, group in self._group(keys):
+            if not shard.lock.acquire(False):
+                self._wait_for_lock(shard)
+            try:
+                for key in group:
+                    found[key] = shard.get(key, touch=True)
+            finally:
+                shard.lock.release()
+        if self.warm_tier is not None:
+            missed = [key for key, entry in found.items() if entry is None]
+            if missed:
+                found.update(self._promote(missed))
+        entries = {key: found[key] for key in keys}
+
+        plan = _MGetPlan(now=time.time())
+        for key, entry in entries.items():
+            if entry is not None and entry.is_expired(plan.now):
+                self._expire_key(key, entry)
+                entry = None
+            if entry is None:
+                plan.missing.append(key)
+                continue
+            plan.results[key] = entry.value
+            freshness = self._freshness(entry)
+            if freshness == _FRESH:
+                continue
+            if freshness == _STALE or self.validate_async:
+                background(key, entry)
+            else:
+                plan.to_validate[key] = entry
+        self.metrics.incr("keyspace_hits", len(plan.results))
+        self.metrics.incr("keyspace_misses", len(plan.missing))
+        return plan
+
+    def _apply_mget_hashes(
+        self, plan: _MGetPlan, origin_hashes: Dict[str, str]
+    ) -> None:
+        self.metrics.incr("validations", len(plan.to_validate))
+        for key, entry in plan.to_validate.items():
+            origin_hash = origin_hashes.get(key)
+            if origin_hash is None:
+                continue
+            if origin_hash == entry.hash:
+                entry.validated_at = plan.now
+            else:
+                self.metrics.incr("hash_mismatches")
+                del plan.results[key]
+                plan.stale[key] = entry
+                plan.missing.append(key)
+
+    def _apply_mget_loaded(
+        self,
+        plan: _MGetPlan,
+        loaded: Dict[str, Any],
+        ttl: Optional[float],
+        generation: int,
+        fetch_cost: float,
+    ) -> None:
+        fresh_entries = []
+        for key, value in loaded.items():
+            previous = plan.stale.get(key)
+            if previous is not None:
+                entry_ttl = self._remaining_ttl(previous)
+                revalidate_after = previous.revalidate_after
+            else:
+                entry_ttl = ttl or self.default_ttl
+                revalidate_after = None
+            entry = self._make_entry(
+                key,
+                value,
+                entry_ttl,
+                revalidate_after=revalidate_after,
+                fetch_cost=fetch_cost,
+            )
+            fresh_entries.append((key, entry))
+        self._store_entries(fresh_entries, generation)
+        plan.results.update(loaded)
+        gone = [key for key in plan.stale if key not in loaded]
+        if gone:
+            self.mdelete(gone)
+
+    def _store_value(
+        self,
+        key: str,
+        value: Any,
+        ttl: Optional[float],
+        *,
+        revalidate_after: Optional[float] = None,
+        fetch_cost: Optional[float] = None,
+        generation: Optional[int] = None,
+    ) -> CacheEntry:
+        entry = self._make_entry(
+            key, value, ttl, revalidate_after=revalidate_after, fetch_cost=fetch_cost
+        )
+        shard = self._shard(key)
+        if not shard.lock.acquire(False):
+            self._wait_for_lock(shard)
+        try:
+            self._check_generation(entry, generation)
+            # Logged first: a value the log cannot take is not cached either.
+            self._log_sets([(key, entry)])
+            self._insert(shard, key, entry)
+            self._log_deletes(shard.evict())
+        finally:
+            shard.lock.release()
+        self._flush()
+        return entry
+
+    def _store_entries(
+        self,
+        entries: List[Tuple[str, CacheEntry]],
+        generation: Optional[int] = None,
+    ) -> None:
+        by_key = dict(entries)
+        for shard, group in self._group(by_key):
+            if not shard.lock.acquire(False):
+                self._wait_for_lock(shard)
+            try:
+                shard_entries = [(key, by_key[key]) for key in group]
+                for key, entry in shard_entries:
+                    self._check_generation(entry, generation)
+                self._log_sets(shard_entries)
+                for key, entry in shard_entries:
+                    self._insert(shard, key, entry)
+                self._log_deletes(shard.evict())
+            finally:
+                shard.lock.release()
+        self._flush(bool(entries))
+
+    def _make_entry(
+        self,
+        key: str,
+        value: Any,
+        ttl: Optional[float],
+        *,
+        revalidate_after: Optional[float] = None,
+        fetch_cost: Optional[float] = None,
+    ) -> CacheEntry:
+        now = time.time()
+        started = self._start_phase("hash")
+        encoded = canonical_json(value) if self.keep_encoded else None
+        json_form = encoded is not None
+        if encoded is None:
+            encoded = canonical_bytes(value)
+        digest = packed_hash_bytes(encoded)
+        self._end_phase("hash", started)
+        entry = CacheEntry(
+            value=value,
+            hash=digest,
+            expire_at=now + ttl if ttl else None,
+            validated_at=now,
+            revalidate_after=revalidate_after,
+            fetch_cost=fetch_cost,
+        )
+        return self._compact(key, entry, encoded, json_form=json_form)
+
+    def _compact(
+        self,
+        key: str,
+        entry: CacheEntry,
+        encoded: Optional[bytes] = None,
+        *,
+        json_form: bool = True,
+    ) -> CacheEntry:
+        # Pack large values, keep the encoding of the others when asked to
+        # and size the entry, encoding it only if needed.  ``json_form`` is
+        # False when ``encoded`` is the repr fallback of canonical_bytes().
+        threshold = self.compress_threshold
+        keep = self.keep_encoded and json_form
+        if threshold is None and self.max_memory_bytes is None and not keep:
+            return entry
+        if encoded is None:
+            encoded = canonical_json(entry.value) if keep else None
+            if encoded is None:
+                encoded, keep = canonical_bytes(entry.value), False
+        size = len(encoded)
+        if threshold is not None and size >= threshold:
+            packed = entry.pack(encoded)
+            if packed is not None:
+                size, keep = len(packed), False
+        if keep:
+            entry.keep_encoded(encoded)
+            size += len(encoded)  # held next to the value itself
+        if self.max_memory_bytes is not None:
+            entry.size = self._entry_size(key, size)
+        return entry
 
     def _fetch_from_origin(self, key: str) -> Any | None:
-        return self.origin_store.fetch_value(key)
+        started = self._start_phase("origin_fetch")
+        value = self.origin_store.fetch_value(key)
+        self._record_origin_call("origin_fetch", started)
+        return value
+
+    def _fetch_origin_hash(self, key: str) -> str | None:
+        started = self._start_phase("origin_fetch_hash")
+        origin_hash = self.origin_store.fetch_hash(key)
+        self._record_origin_call("origin_fetch_hash", started)
+        return origin_hash
+
+    def _record_origin_call(self, name: str, started: float) -> float:
+        # One origin round trip (single key or batch); returns its duration.
+        self.metrics.incr(_ORIGIN_CALL_COUNTERS[name])
+        return self._end_phase(name, started)
+
+    def _load_from_origin(self, key: str, ttl: Optional[float]) -> CacheEntry | None:
+        def load() -> CacheEntry | None:
+            generation = self._feed_generation
+            started = time.perf_counter()
+            value = self._fetch_from_origin(key)
+            if value is None:
+                return None
+            return self._store_value(
+                key,
+                value,
+                ttl or self.default_ttl,
+                fetch_cost=time.perf_counter() - started,
+                generation=generation,
+            )
+
+        return self._flights.do(key, load, timeout=self.load_timeout)
+
+    def _should_refresh_early(self, entry: CacheEntry, now: float) -> bool:
+        # XFetch: refresh when now - cost * beta * ln(U) crosses expire_at,
+        # with U uniform in (0, 1].
+        if self.early_refresh_beta <= 0 or entry.expire_at is None:
+            return False
+        if not entry.fetch_cost:
+            return False
+        jitter = -math.log(1.0 - random.random())
+        head_start = entry.fetch_cost * self.early_refresh_beta * jitter
+        return now + head_start >= entry.expire_at
 
     def _schedule_validation(self, key: str, entry: CacheEntry) -> CacheEntry | None:
         if self.validate_async:
-            thread = threading.Thread(
-                target=self._validate_hash, args=(key, entry), daemon=True
-            )
-            thread.start()
+            self._submit_validation(key, entry)
             return entry
 
         self._validate_hash(key, entry)
-        with self._lock:
-            return self._store.get(key)
+        return self._peek(key)
+
+    def _freshness(self, entry: CacheEntry) -> str:
+        if entry.validated_at is not None and self._feed_is_current():
+            return _FRESH
+        window = (
+            entry.revalidate_after
+            if entry.revalidate_after is not None
+            else self.revalidate_after
+        )
+        if window is None or entry.validated_at is None:
+            return _MUST_VALIDATE
+        age = time.time() - entry.validated_at
+        if age < window:
+            return _FRESH
+        if age < window + self.stale_while_revalidate:
+            return _STALE
+        return _MUST_VALIDATE
 
     def _validate_hash(self, key: str, entry: CacheEntry) -> None:
-        origin_hash = self.origin_store.fetch_hash(key)
+        generation = self._feed_generation
+        self.metrics.incr("validations")
+        origin_hash = self._fetch_origin_hash(key)
         if origin_hash is None:
             return
-        if origin_hash != entry.hash:
-            value = self._fetch_from_origin(key)
-            if value is None:
-                self.delete(key)
+        if origin_hash == entry.hash:
+            entry.validated_at = time.time()
+            return
+        self.metrics.incr("hash_mismatches")
+        self._replace_stale(key, entry, self._fetch_from_origin(key), generation)
+
+    def _replace_stale(
+        self, key: str, entry: CacheEntry, value: Any | None, generation: int
+    ) -> None:
+        # Swap in the origin's current value, keeping the entry's expiry.
+        if value is None:
+            self.delete(key)
+            return
+        self._store_value(
+            key,
+            value,
+            self._remaining_ttl(entry),
+            revalidate_after=entry.revalidate_after,
+            generation=generation,
+        )
+
+    def _subscribe(self, feed: ChangeFeed) -> None:
+        # Entries loaded from persistence may predate changes the feed no
+        # longer holds, so they are validated once before being trusted.
+        started = time.time()
+        self._feed_seq = feed.latest_seq()
+        self._feed_synced_at = started
+        for shard in self._shards:
+            with shard.lock:
+                for entry in shard.store.values():
+                    entry.validated_at = None
+        self._feed_follower = threading.Thread(
+            target=self._follow_changes, name="redsnano-changefeed", daemon=True
+        )
+        self._feed_follower.start()
+
+    def _follow_changes(self) -> None:
+        wait_for_changes = getattr(self.change_feed, "wait_for_changes", None)
+        while not self._closing.is_set():
+            try:
+                self.sync_changes()
+            except Exception:  # noqa: BLE001 - keep following; the lag shows it
+                pass
+            if callable(wait_for_changes):
+                # Woken by new changes; the timeout only bounds how long a
+                # close() waits for this thread.
+                wait_for_changes(self._feed_seq, min(self.change_feed_interval, 0.25))
+            else:
+                self._closing.wait(self.change_feed_interval)
+
+    def _feed_lag(self) -> float | None:
+        if self._feed_synced_at is None:
+            return None
+        return max(0.0, time.time() - self._feed_synced_at)
+
+    def _feed_is_current(self) -> bool:
+        lag = self._feed_lag()
+        return lag is not None and lag <= self.max_feed_lag
+
+    def _check_generation(self, entry: CacheEntry, generation: Optional[int]) -> None:
+        # The feed moved on while this value was being fetched, so it may
+        # predate a change that has already been applied: validate it once.
+        if generation is not None and generation != self._feed_generation:
+            entry.validated_at = None
+
+    def _remaining_ttl(self, entry: CacheEntry) -> Optional[float]:
+        ttl_remaining = (
+            entry.expire_at - time.time() if entry.expire_at else self.default_ttl
+        )
+        return max(ttl_remaining, 0) if ttl_remaining else None
+
+    def _insert(self, shard: Shard, key: str, entry: CacheEntry) -> None:
+        shard.insert(key, entry)
+        if entry.expire_at is not None and self.active_expiry and self._expirer is None:
+            self._start_expirer()
+
+    def _start_expirer(self) -> None:
+        with self._expirer_lock:
+            if self._expirer is not None or self._closing.is_set():
+                return
+            self._expirer = threading.Thread(
+                target=self._expire_loop, name="redsnano-expire", daemon=True
+            )
+            self._expirer.start()
+
+    def _expire_key(self, key: str, entry: CacheEntry) -> None:
+        shard = self._shard(key)
+        with shard.lock:
+            expired = shard.get(key) is entry
+            if expired:
+                shard.remove(key)
+                shard.expired_keys += 1
+                self._log_deletes([key])
+                self._forget_warm([key])
+        self._flush(expired)
+
+    def _next_expiry(self) -> float | None:
+        due = []
+        for shard in self._shards:
+            with shard.lock:
+                next_expiry = shard.expiry.next_expiry()
+            if next_expiry is not None:
+                due.append(next_expiry)
+        return min(due, default=None)
+
+    def _expire_loop(self) -> None:
+        period = 1.0 / self.expiry_hz
+        budget = period * ACTIVE_EXPIRE_CYCLE_BUDGET
+        wait = period
+        while not self._closing.wait(wait):
+            self.expire_cycle(budget)
+            next_expiry = self._next_expiry()
+            # Keys still due after spending the budget: come back sooner.
+            backlog = next_expiry is not None and next_expiry <= time.time()
+            wait = period / 4 if backlog else period
+
+    @staticmethod
+    def _entry_size(key: str, value_size: int) -> int:
+        return ENTRY_OVERHEAD_BYTES + len(key) + value_size
+
+    def _log_sets(self, entries: List[Tuple[str, CacheEntry]]) -> None:
+        # Called under the shard lock, so the log order matches the store's.
+        if not self._incremental and self.replication is None:
+            return
+        serialized = [(key, entry.to_serialized()) for key, entry in entries]
+        if self._incremental:
+            started = self._start_phase("persist")
+            for key, data in serialized:
+                self.persistence.record_set(key, data)  # type: ignore[attr-defined]
+            self._end_phase("persist", started)
+        if self.replication is not None:
+            self.replication.record_sets(serialized)
+
+    def _log_deletes(self, keys: List[str]) -> None:
+        if not keys:
+            return
+        if self._incremental:
+            started = self._start_phase("persist")
+            for key in keys:
+                self.persistence.record_delete(key)  # type: ignore[attr-defined]
+            self._end_phase("persist", started)
+        if self.replication is not None:
+            self.replication.record_deletes(keys)
+
+    def _flush(self, changed: bool = True) -> None:
+        # Backends without a log rewrite the whole snapshot, which takes every
+        # shard lock in turn, so callers release their own before flushing.
+        # Warm-tier writes wait for the same point, to do no I/O under them.
+        if self._warm_ops:
+            self._write_warm_tier()
+        if changed and not self._incremental:
+            self._persist()
+
+    def _queue_demotion(self, key: str, entry: CacheEntry) -> None:
+        self._warm_ops.append((key, entry))
+
+    def _forget_warm(self, keys: Iterable[str]) -> None:
+        # Keys leaving memory other than by eviction lose their warm copy,
+        # which is older than what was just removed.  Under the shard lock.
+        if self.warm_tier is not None:
+            self._warm_ops.extend((key, None) for key in keys)
+
+    def _write_warm_tier(self) -> None:
+        # Applied under a lock in queue order, so the last operation on a
+        # key decides what the warm tier holds.
+        assert self.warm_tier is not None
+        with self._warm_lock:
+            latest: Dict[str, Optional[CacheEntry]] = {}
+            while self._warm_ops:
+                key, entry = self._warm_ops.popleft()
+                latest[key] = entry
+            if not latest:
                 return
-            ttl_remaining = (
-                entry.expire_at - time.time() if entry.expire_at else self.default_ttl
+            started = self._start_phase("warm_store")
+            demoted = self.warm_tier.put_many(
+                (key, entry) for key, entry in latest.items() if entry is not None
             )
-            ttl_remaining = max(ttl_remaining, 0) if ttl_remaining else None
-            self.set(key, value, ttl=ttl_remaining)
+            forgotten = [key for key, entry in latest.items() if entry is None]
+            if forgotten:
+                self.warm_tier.delete_many(forgotten)
+            self._end_phase("warm_store", started)
+        self.metrics.incr("warm_tier_demotions", demoted)
+
+    def _promote(self, keys: List[str]) -> Dict[str, CacheEntry]:
+        # Bring the warm-tier copies of keys missing from memory back into
+        # it.  They have never been validated by this process (validated_at
+        # is None), so the usual freshness rules validate them before use.
+        assert self.warm_tier is not None
+        started = self._start_phase("warm_fetch")
+        found = self.warm_tier.get_many(keys)
+        self._end_phase("warm_fetch", started)
+        self.metrics.incr("warm_tier_hits", len(found))
+        self.metrics.incr("warm_tier_misses", len(keys) - len(found))
+        if not found:
+            return {}
+        compacted = {key: self._compact(key, entry) for key, entry in found.items()}
+        promoted: Dict[str, CacheEntry] = {}
+        for shard, group in self._group(compacted):
+            with shard.lock:
+                inserted = []
+                for key in group:
+                    current = shard.get(key, touch=True)
+                    if current is None:  # not stored meanwhile by another caller
+                        current = compacted[key]
+                        self._insert(shard, key, current)
+                        inserted.append((key, current))
+                    promoted[key] = current
+                self._log_sets(inserted)
+                self._log_deletes(shard.evict())
+        self._flush()
+        return promoted
 
     def _persist(self) -> None:
-        serializable = {key: entry.to_serialized() for key, entry in self._store.items()}
-        self.persistence.save(serializable)
+        # Serialized so a save that began before the latest write cannot
+        # overwrite one that includes it.
+        with self._persist_lock:
+            started = self._start_phase("persist")
+            self.persistence.save(self._snapshot())
+            self._end_phase("persist", started)
+
+    def _snapshot(self) -> Dict[str, CacheEntrySerialized]:
+        # Values, hashes and expiry times are replaced rather than mutated, so
+        # copying the references under each shard lock is enough for a
+        # consistent view of every key; serialization runs without blocking
+        # readers and writers.
+        items: List[Tuple[str, CacheEntry]] = []
+        for shard in self._shards:
+            with shard.lock:
+                items.extend(shard.store.items())
+        return {key: entry.to_serialized() for key, entry in items}
+
 
+def _share(limit: Optional[int], shards: int) -> Optional[int]:
+    # Each shard's part of a cache-wide limit, rounded up.
+    return None if limit is None else -(-limit // shards)
@@ -1,23 +1,162 @@
 from __future__ import annotations
 
-from dataclasses import dataclass, asdict
-from typing import Any, MutableMapping, TypedDict
+import zlib
+from typing import Any, MutableMapping, Optional, TypedDict
 
+from .hashing import canonical_json, decode_canonical, pack_digest, unpack_digest
 
-class CacheEntrySerialized(TypedDict):
+# zlib level for values compressed in memory: writes pay for compression,
+# so favour speed over ratio.
+COMPRESSION_LEVEL = 1
+
+# How CacheEntry holds its value: as the object itself, as its canonical JSON
+# bytes, or as those bytes zlib-compressed.
+_AS_OBJECT = 0
+_AS_JSON = 1
+_AS_ZLIB_JSON = 2
+
+
+class _CacheEntryRequired(TypedDict):
     value: Any
     hash: str
     expire_at: float | None
 
 
-@dataclass
+class CacheEntrySerialized(_CacheEntryRequired, total=False):
+    validated_at: float
+    revalidate_after: float
+    fetch_cost: float
+
+
 class CacheEntry:
-    value: Any
-    hash: str
-    expire_at: float | None = None
+    """
+    One cached value and its metadata, laid out compactly: no per-instance
+    ``__dict__`` and the digest kept as raw bytes (see
+    :func:`~redsnano.hashing.pack_digest`).  After :meth:`pack` the value is
+    held as its canonical JSON bytes, zlib-compressed when that is smaller,
+    instead of a graph of Python objects; :attr:`value` decodes a fresh copy
+    on every read.  :meth:`keep_encoded` instead keeps the JSON bytes next to
+    the object, for front ends that serve them without re-encoding.
+    """
+
+    __slots__ = (
+        "_value",
+        "_digest",
+        "_packing",
+        "_encoded",
+        "expire_at",
+        "validated_at",
+        "revalidate_after",
+        "fetch_cost",
+        "size",
+    )
+
+    def __init__(
+        self,
+        value: Any,
+        # Digest text, or bytes already in the form of pack_digest().
+        hash: str | bytes,
+        expire_at: float | None = None,
+        # When the value was last known to match the origin, and an optional
+        # per-key override of the cache-wide revalidation window.
+        validated_at: float | None = None,
+        revalidate_after: float | None = None,
+        # Seconds the last origin fetch took; drives probabilistic early refresh.
+        fetch_cost: float | None = None,
+        # Estimated memory footprint in bytes; only tracked when the cache has
+        # a memory limit and never persisted.
+        size: int = 0,
+    ):
+        self._value = value
+        self._digest = hash if isinstance(hash, bytes) else pack_digest(hash)
+        self._packing = _AS_OBJECT
+        self._encoded: Optional[bytes] = None
+        self.expire_at = expire_at
+        self.validated_at = validated_at
+        self.revalidate_after = revalidate_after
+        self.fetch_cost = fetch_cost
+        self.size = size
+
+    @property
+    def value(self) -> Any:
+        packing = self._packing
+        if packing == _AS_OBJECT:
+            return self._value
+        if packing == _AS_JSON:
+            return decode_canonical(self._value)
+        return decode_canonical(zlib.decompress(self._value))
+
+    @property
+    def hash(self) -> str:
+        return unpack_digest(self._digest)
+
+    @property
+    def packed(self) -> bool:
+        return self._packing != _AS_OBJECT
+
+    @property
+    def compressed(self) -> bool:
+        return self._packing == _AS_ZLIB_JSON
+
+    def pack(self, encoded: bytes) -> Optional[bytes]:
+        """
+        Hold the value as ``encoded`` (its canonical bytes), compressed when
+        that saves space, provided it decodes back to an equal value.
+        Returns the bytes now held, or None when the value stays an object.
+        """
+        if self._packing != _AS_OBJECT:
+            return None
+        try:
+            # Tuples, sets, dates and other non-JSON values would come back
+            # as something else; keep those as objects.
+            if decode_canonical(encoded) != self._value:
+                return None
+        except ValueError:
+            return None
+        compressed = zlib.compress(encoded, COMPRESSION_LEVEL)
+        if len(compressed) < len(encoded):
+            self._value, self._packing = compressed, _AS_ZLIB_JSON
+        else:
+            self._value, self._packing = encoded, _AS_JSON
+        self._encoded = None  # the packed value is the encoding
+        return self._value
+
+    def keep_encoded(self, encoded: bytes) -> None:
+        """Keep ``encoded``, the value's canonical JSON, for :meth:`json_bytes`."""
+        if self._packing == _AS_OBJECT:
+            self._encoded = encoded
+
+    def json_bytes(self) -> bytes:
+        """
+        The value's canonical JSON bytes: the ones the entry holds when it
+        has them, else encoded now.  Raises TypeError for values without a
+        JSON form.
+        """
+        if self._encoded is not None:
+            return self._encoded
+        packing = self._packing
+        if packing == _AS_JSON:
+            return self._value
+        if packing == _AS_ZLIB_JSON:
+            return zlib.decompress(self._value)
+        encoded = canonical_json(self._value)
+        if encoded is None:
+            raise TypeError(f"{type(self._value).__name__} is not JSON serializable")
+        return encoded
 
     def to_serialized(self) -> CacheEntrySerialized:
-        return asdict(self)  # type: ignore[return-value]
+        data: CacheEntrySerialized = {
+            "value": self.value,
+            "hash": self.hash,
+            "expire_at": self.expire_at,
+        }
+        if self.validated_at is not None:
+            data["validated_at"] = self.validated_at
+        if self.revalidate_after is not None:
+            data["revalidate_after"] = self.revalidate_after
+        if self.fetch_cost is not None:
+            data["fetch_cost"] = self.fetch_cost
+        return data
 
     @classmethod
     def from_serialized(cls, data: MutableMapping[str, Any]) -> "CacheEntry":
@@ -25,8 +164,35 @@ class CacheEntry:
             value=data["value"],
             hash=data["hash"],
             expire_at=data.get("expire_at"),
+            validated_at=data.get("validated_at"),
+            revalidate_after=data.get("revalidate_after"),
+            fetch_cost=data.get("fetch_cost"),
         )
 
     def is_expired(self, now: float) -> bool:
         return self.expire_at is not None and now >= self.expire_at
 
+    def _fields(self) -> tuple:
+        return (
+            self.value,
+            self.hash,
+            self.expire_at,
+            self.validated_at,
+            self.revalidate_after,
+            self.fetch_cost,
+        )
+
+    def __eq__(self, other: object) -> bool:
+        if not isinstance(other, CacheEntry):
+            return NotImplemented
+        return self._fields() == other._fields()
+
+    __hash__ = None  # type: ignore[assignment]  # mutable, like the dataclass was
+
+    def __repr__(self) -> str:
+        return (
+            f"CacheEntry(value={self.value!r}, hash={self.hash!r}, "
+            f"expire_at={self.expire_at!r}, validated_at={self.validated_at!r}, "
+            f"revalidate_after={self.revalidate_after!r}, "
+            f"fetch_cost={self.fetch_cost!r})"
+        )
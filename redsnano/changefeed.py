@@ -0,0 +1,75 @@
+from __future__ import annotations
+
+import threading
+import time
+from collections import deque
+from typing import Deque, Iterable, List, NamedTuple, Optional, Protocol
+
+DEFAULT_BATCH_LIMIT = 1000
+
+
+class Change(NamedTuple):
+    seq: int
+    key: str
+    changed_at: float
+
+
+class ChangeFeed(Protocol):
+    """
+    Ordered log of origin keys that changed.  Sequence numbers increase by
+    one per change; a gap after ``seq`` in :meth:`changes_since` means older
+    changes were trimmed before the reader saw them.
+    """
+
+    def latest_seq(self) -> int:  # pragma: no cover - protocol
+        ...
+
+    def changes_since(
+        self, seq: int, limit: int = DEFAULT_BATCH_LIMIT
+    ) -> List[Change]:  # pragma: no cover - protocol
+        ...
+
+
+def change_feed_of(store: object) -> ChangeFeed | None:
+    """Return the change feed an origin store publishes, if any."""
+    return getattr(store, "change_feed", None)
+
+
+class InMemoryChangeFeed:
+    """
+    In-process change feed keeping the last ``max_changes`` entries.
+    Readers can block in :meth:`wait_for_changes` instead of polling.
+    """
+
+    def __init__(self, *, max_changes: int = 100_000):
+        self._cond = threading.Condition()
+        self._changes: Deque[Change] = deque(maxlen=max_changes)
+        self._seq = 0
+
+    def publish(self, keys: Iterable[str]) -> int:
+        """Record that ``keys`` changed; returns the latest sequence number."""
+        now = time.time()
+        with self._cond:
+            for key in keys:
+                self._seq += 1
+                self._changes.append(Change(self._seq, key, now))
+            self._cond.notify_all()
+            return self._seq
+
+    def latest_seq(self) -> int:
+        with self._cond:
+            return self._seq
+
+    def changes_since(self, seq: int, limit: int = DEFAULT_BATCH_LIMIT) -> List[Change]:
+        with self._cond:
+            if seq >= self._seq:
+                return []
+            changes = self._changes
+            # Sequence numbers are contiguous, so the start is an offset.
+            start = max(0, len(changes) - (self._seq - seq))
+            return [changes[i] for i in range(start, min(len(changes), start + limit))]
+
+    def wait_for_changes(self, seq: int, timeout: Optional[float] = None) -> bool:
+        """Block until a change after ``seq`` exists or ``timeout`` elapses."""
+        with self._cond:
+            return self._cond.wait_for(lambda: self._seq > seq, timeout)
@@ -1,17 +1,44 @@
 from __future__ import annotations
 
 import argparse
+import asyncio
 
-from .cache import MiniRedis
+from .cache import DEFAULT_SHARDS, MiniRedis
+from .eviction import EVICTION_POLICIES
+from .hashing import available_algorithms, set_hash_algorithm
 from .origin import JSONFileOriginStore
-from .persistence import JSONPersistence
+from .persistence import (
+    FSYNC_EVERYSEC,
+    FSYNC_POLICIES,
+    AppendOnlyPersistence,
+    JSONPersistence,
+    SnapshotPersistence,
+)
+from .replication import DEFAULT_BACKLOG, Follower, ReplicationLog
+from .resp_server import RESPServer
 from .server import MiniRedisHTTPServer
+from .tracing import DEFAULT_SLOWLOG_MAX_LEN
+from .validation import OVERFLOW_DROP, OVERFLOW_POLICIES
+from .warm_tier import SQLiteWarmTier
 
 
 def build_parser() -> argparse.ArgumentParser:
     parser = argparse.ArgumentParser(description="Run the redsnano HTTP server.")
     parser.add_argument("--host", default="0.0.0.0")
     parser.add_argument("--port", type=int, default=8777)
+    parser.add_argument(
+        "--workers",
+        type=int,
+        default=32,
+        help="Threads serving connections (HTTP) or executing commands (RESP).",
+    )
+    parser.add_argument(
+        "--max-pending",
+        type=int,
+        default=128,
+        help="HTTP connections that may wait for a free worker before new "
+        "ones are refused with 503.",
+    )
     parser.add_argument(
         "--origin-json",
         default="origin.json",
@@ -22,31 +49,264 @@ def build_parser() -> argparse.ArgumentParser:
         default="cache.json",
         help="Path to persist cache entries.",
     )
+    parser.add_argument(
+        "--persistence",
+        choices=("json", "aof", "snapshot"),
+        default="json",
+        help=(
+            "Persistence backend: full JSON rewrites, an append-only log or "
+            "periodic binary snapshots."
+        ),
+    )
+    parser.add_argument(
+        "--appendfsync",
+        choices=FSYNC_POLICIES,
+        default=FSYNC_EVERYSEC,
+        help="fsync policy for the append-only log.",
+    )
+    parser.add_argument(
+        "--snapshot-interval",
+        type=float,
+        default=60,
+        help="Seconds between background snapshots when --persistence=snapshot.",
+    )
     parser.add_argument(
         "--default-ttl",
         type=float,
         default=60,
         help="Default TTL (seconds) for new keys when not provided explicitly.",
     )
+    parser.add_argument(
+        "--max-entries",
+        type=int,
+        default=None,
+        help="Evict keys once the cache holds more than this many entries.",
+    )
+    parser.add_argument(
+        "--max-memory",
+        type=int,
+        default=None,
+        help="Evict keys once the estimated cache size exceeds this many bytes.",
+    )
+    parser.add_argument(
+        "--eviction-policy",
+        choices=sorted(EVICTION_POLICIES),
+        default="lru",
+        help="Which keys to evict when a size limit is reached.",
+    )
+    parser.add_argument(
+        "--shards",
+        type=int,
+        default=None,
+        help=f"Independently locked slices of the keyspace (default "
+        f"{DEFAULT_SHARDS}, or 1 with a size limit); size limits are split "
+        "evenly between them.",
+    )
+    parser.add_argument(
+        "--compress-threshold",
+        type=int,
+        default=None,
+        help="Hold values whose JSON is at least this many bytes as (compressed) "
+        "bytes instead of Python objects.",
+    )
+    parser.add_argument(
+        "--keep-encoded",
+        action="store_true",
+        help="Keep each value's JSON bytes next to it so GETs are served "
+        "without encoding it again.",
+    )
+    parser.add_argument(
+        "--warm-tier",
+        default=None,
+        help="SQLite file that keys evicted by --max-entries/--max-memory move "
+        "to, and are read back from, instead of being dropped.",
+    )
+    parser.add_argument(
+        "--validation-workers",
+        type=int,
+        default=4,
+        help="Threads validating cache hits against the origin in the background.",
+    )
+    parser.add_argument(
+        "--validation-queue-size",
+        type=int,
+        default=1024,
+        help="Maximum number of keys waiting for background validation.",
+    )
+    parser.add_argument(
+        "--validation-overflow",
+        choices=OVERFLOW_POLICIES,
+        default=OVERFLOW_DROP,
+        help="What to do with validations once the queue is full.",
+    )
+    parser.add_argument(
+        "--revalidate-after",
+        type=float,
+        default=None,
+        help="Serve hits without contacting the origin for this many seconds "
+        "after a key was last validated.",
+    )
+    parser.add_argument(
+        "--stale-while-revalidate",
+        type=float,
+        default=0,
+        help="Seconds past --revalidate-after during which hits are served "
+        "while validating in the background.",
+    )
+    parser.add_argument(
+        "--early-refresh-beta",
+        type=float,
+        default=0,
+        help="Enable probabilistic early refresh of keys close to expiry "
+        "(XFetch beta; 0 disables it).",
+    )
+    parser.add_argument(
+        "--change-feed",
+        action="store_true",
+        help="Drop keys announced by the origin's change feed and serve hits "
+        "without validating them while the feed is current.",
+    )
+    parser.add_argument(
+        "--hash-algorithm",
+        choices=available_algorithms(),
+        default="sha256",
+        help="Digest used to compare cached values with the origin.",
+    )
+    parser.add_argument(
+        "--slowlog-threshold",
+        type=float,
+        default=None,
+        help="Keep operations taking at least this many seconds, with a "
+        "per-phase breakdown, in the slow log (served at /slowlog).",
+    )
+    parser.add_argument(
+        "--slowlog-max-len",
+        type=int,
+        default=DEFAULT_SLOWLOG_MAX_LEN,
+        help="Entries kept in the slow log.",
+    )
+    parser.add_argument(
+        "--replica-of",
+        metavar="HOST:PORT",
+        default=None,
+        help="Follow the redsnano HTTP server at HOST:PORT: replicate its keys "
+        "and serve reads only.",
+    )
+    parser.add_argument(
+        "--forward-writes",
+        action="store_true",
+        help="On a follower's HTTP server, pass writes on to the leader instead "
+        "of refusing them.",
+    )
+    parser.add_argument(
+        "--replication-backlog",
+        type=int,
+        default=DEFAULT_BACKLOG,
+        help="Mutations a leader keeps for followers catching up (0 disables "
+        "replication).",
+    )
     return parser
 
 
-def run_server() -> None:
-    parser = build_parser()
-    args = parser.parse_args()
+def build_persistence(args: argparse.Namespace):
+    if args.persistence == "aof":
+        return AppendOnlyPersistence(args.cache_file, fsync=args.appendfsync)
+    if args.persistence == "snapshot":
+        return SnapshotPersistence(args.cache_file, interval=args.snapshot_interval)
+    return JSONPersistence(args.cache_file)
+
 
+def build_cache(args: argparse.Namespace) -> MiniRedis:
+    set_hash_algorithm(args.hash_algorithm)
     origin_store = JSONFileOriginStore(args.origin_json)
-    cache = MiniRedis(
+    return MiniRedis(
         origin_store,
-        persistence=JSONPersistence(args.cache_file),
+        persistence=build_persistence(args),
         default_ttl=args.default_ttl,
+        max_entries=args.max_entries,
+        max_memory_bytes=args.max_memory,
+        eviction_policy=args.eviction_policy,
+        shards=args.shards,
+        compress_threshold=args.compress_threshold,
+        keep_encoded=args.keep_encoded,
+        warm_tier=SQLiteWarmTier(args.warm_tier) if args.warm_tier else None,
+        validation_workers=args.validation_workers,
+        validation_queue_size=args.validation_queue_size,
+        validation_overflow=args.validation_overflow,
+        revalidate_after=args.revalidate_after,
+        stale_while_revalidate=args.stale_while_revalidate,
+        early_refresh_beta=args.early_refresh_beta,
+        change_feed=origin_store.change_feed if args.change_feed else None,
+        slowlog_threshold=args.slowlog_threshold,
+        slowlog_max_len=args.slowlog_max_len,
+        replication=(
+            ReplicationLog(args.replication_backlog)
+            if args.replication_backlog > 0 and not args.replica_of
+            else None
+        ),
     )
 
-    server = MiniRedisHTTPServer((args.host, args.port), cache)
+
+def build_follower(args: argparse.Namespace, cache: MiniRedis) -> Follower | None:
+    if not args.replica_of:
+        return None
+    host, _, port = args.replica_of.rpartition(":")
+    return Follower(cache, host, int(port), forward_writes=args.forward_writes)
+
+
+def run_server() -> None:
+    parser = build_parser()
+    args = parser.parse_args()
+    cache = build_cache(args)
+    follower = build_follower(args, cache)
+
+    server = MiniRedisHTTPServer(
+        (args.host, args.port),
+        cache,
+        workers=args.workers,
+        max_pending=args.max_pending,
+        follower=follower,
+    )
+    if follower is not None:
+        follower.start()
     print(f"redsnano server listening on http://{args.host}:{args.port}")  # noqa: T201
     try:
         server.serve_forever()
     except KeyboardInterrupt:  # pragma: no cover - manual shutdown
         print("Shutting down redsnano server...")  # noqa: T201
         server.shutdown()
+    finally:
+        server.server_close()
+        if follower is not None:
+            follower.close()
+        cache.close()
+
 
+def run_resp_server() -> None:
+    parser = build_parser()
+    parser.description = "Run the redsnano Redis-protocol (RESP) server."
+    # Followers read the leader's log over HTTP, so a RESP server can follow
+    # but not lead.
+    parser.set_defaults(port=6379, replication_backlog=0)
+    args = parser.parse_args()
+    cache = build_cache(args)
+    follower = build_follower(args, cache)
+
+    server = RESPServer(
+        cache,
+        args.host,
+        args.port,
+        workers=args.workers,
+        read_only=follower is not None,
+    )
+    if follower is not None:
+        follower.start()
+    print(f"redsnano RESP server listening on {args.host}:{args.port}")  # noqa: T201
+    try:
+        asyncio.run(server.serve_forever())
+    except KeyboardInterrupt:  # pragma: no cover - manual shutdown
+        print("Shutting down redsnano RESP server...")  # noqa: T201
+    finally:
+        if follower is not None:
+            follower.close()
+        cache.close()
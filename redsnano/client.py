@@ -0,0 +1,634 @@
+from __future__ import annotations
+
+import bisect
+import hashlib
+import http.client
+import json
+import socket
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import (
+    Any,
+    Callable,
+    Dict,
+    Generic,
+    Iterable,
+    List,
+    Mapping,
+    Optional,
+    Protocol,
+    Tuple,
+    TypeVar,
+)
+from urllib.parse import quote, urlencode
+
+from .resp_server import decode_value, encode_value
+
+# Points each node gets on the hash ring; more points even out the key share.
+DEFAULT_VIRTUAL_NODES = 160
+
+# HTTP statuses worth retrying on a fresh connection (the server is overloaded).
+_RETRY_STATUSES = frozenset({503})
+
+_C = TypeVar("_C")
+
+
+class ClientError(Exception):
+    """The server rejected a request (HTTP 4xx/5xx or a RESP error reply)."""
+
+
+class CacheClient(Protocol):
+    """Operations every redsnano client offers, whatever the protocol."""
+
+    def get(self, key: str) -> Any | None:  # pragma: no cover - protocol
+        ...
+
+    def set(
+        self, key: str, value: Any, ttl: Optional[float] = None
+    ) -> None:  # pragma: no cover - protocol
+        ...
+
+    def delete(self, key: str) -> None:  # pragma: no cover - protocol
+        ...
+
+    def mget(
+        self, keys: Iterable[str]
+    ) -> List[Any | None]:  # pragma: no cover - protocol
+        ...
+
+    def mset(
+        self, items: Mapping[str, Any], ttl: Optional[float] = None
+    ) -> None:  # pragma: no cover - protocol
+        ...
+
+    def mdelete(self, keys: Iterable[str]) -> int:  # pragma: no cover - protocol
+        ...
+
+    def keys(self, pattern: str = "*") -> List[str]:  # pragma: no cover - protocol
+        ...
+
+    def close(self) -> None:  # pragma: no cover - protocol
+        ...
+
+
+class _ConnectionPool(Generic[_C]):
+    # Idle connections are reused most-recently-released first; when none is
+    # idle a new one is opened, and at most ``size`` are kept once released.
+    def __init__(
+        self, connect: Callable[[], _C], close: Callable[[_C], None], size: int
+    ):
+        self._connect = connect
+        self._close = close
+        self.size = size
+        self._idle: List[_C] = []
+        self._lock = threading.Lock()
+
+    def acquire(self) -> _C:
+        with self._lock:
+            if self._idle:
+                return self._idle.pop()
+        return self._connect()
+
+    def release(self, conn: _C) -> None:
+        with self._lock:
+            if len(self._idle) < self.size:
+                self._idle.append(conn)
+                return
+        self._close(conn)
+
+    def discard(self, conn: _C) -> None:
+        self._close(conn)
+
+    def close(self) -> None:
+        with self._lock:
+            idle, self._idle = self._idle, []
+        for conn in idle:
+            self._close(conn)
+
+
+class HTTPClient:
+    """
+    Client for ``redsnano-server``'s HTTP API over pooled keep-alive
+    connections (up to ``pool_size`` kept idle).  Every call is bounded by
+    ``timeout`` seconds per socket operation and retried up to ``retries``
+    times, with exponential backoff starting at ``retry_backoff`` seconds,
+    when the connection drops or the server answers 503.  All operations are
+    idempotent, so retrying is safe.
+
+    :meth:`batch` sends deletes, writes and reads in one round trip.
+    """
+
+    def __init__(
+        self,
+        host: str = "127.0.0.1",
+        port: int = 8777,
+        *,
+        timeout: float = 5.0,
+        retries: int = 2,
+        retry_backoff: float = 0.05,
+        pool_size: int = 8,
+    ):
+        self.host = host
+        self.port = port
+        self.timeout = timeout
+        self.retries = retries
+        self.retry_backoff = retry_backoff
+        self._pool: _ConnectionPool[http.client.HTTPConnection] = _ConnectionPool(
+            lambda: http.client.HTTPConnection(host, port, timeout=timeout),
+            lambda conn: conn.close(),
+            pool_size,
+        )
+
+    def get(self, key: str, *, ttl: Optional[float] = None) -> Any | None:
+        status, body = self._request("GET", self._key_path(key, ttl))
+        if status == 404:
+            return None
+        self._check(status, body)
+        return body["value"]
+
+    def set(self, key: str, value: Any, ttl: Optional[float] = None) -> None:
+        status, body = self._request(
+            "PUT", self._key_path(key), {"value": value, "ttl": ttl}
+        )
+        self._check(status, body)
+
+    def delete(self, key: str) -> None:
+        status, body = self._request("DELETE", self._key_path(key))
+        self._check(status, body)
+
+    def mget(
+        self, keys: Iterable[str], *, ttl: Optional[float] = None
+    ) -> List[Any | None]:
+        keys = list(keys)
+        path = "/mget" if ttl is None else f"/mget?{urlencode({'ttl': ttl})}"
+        values = self._post(path, {"keys": keys})["values"]
+        return [values.get(key) for key in keys]
+
+    def mset(self, items: Mapping[str, Any], ttl: Optional[float] = None) -> None:
+        self._post("/mset", {"items": dict(items), "ttl": ttl})
+
+    def mdelete(self, keys: Iterable[str]) -> int:
+        return self._post("/mdelete", {"keys": list(keys)})["deleted"]
+
+    def batch(
+        self,
+        *,
+        get: Iterable[str] = (),
+        set: Optional[Mapping[str, Any]] = None,
+        delete: Iterable[str] = (),
+        ttl: Optional[float] = None,
+    ) -> Dict[str, Any]:
+        """
+        Apply ``delete``, then ``set``, then ``get`` in one request.  Returns
+        ``{"deleted": n, "values": {...}, "missing": [...]}`` for the parts
+        that were sent.
+        """
+        payload: Dict[str, Any] = {"ttl": ttl}
+        delete = list(delete)
+        get = list(get)
+        if delete:
+            payload["delete"] = delete
+        if set:
+            payload["set"] = dict(set)
+        if get:
+            payload["get"] = get
+        result = self._post("/batch", payload)
+        result.pop("set", None)
+        return result
+
+    def keys(self, pattern: str = "*") -> List[str]:
+        path = "/keys" if pattern == "*" else f"/keys?{urlencode({'pattern': pattern})}"
+        status, body = self._request("GET", path)
+        self._check(status, body)
+        return body["keys"]
+
+    def close(self) -> None:
+        self._pool.close()
+
+    def __enter__(self) -> "HTTPClient":
+        return self
+
+    def __exit__(self, *exc_info: Any) -> None:
+        self.close()
+
+    @staticmethod
+    def _key_path(key: str, ttl: Optional[float] = None) -> str:
+        path = "/cache/" + quote(key, safe="")
+        return path if ttl is None else f"{path}?{urlencode({'ttl': ttl})}"
+
+    @staticmethod
+    def _check(status: int, body: Any) -> None:
+        if status >= 400:
+            message = body.get("error") if isinstance(body, dict) else None
+            raise ClientError(f"HTTP {status}: {message or 'request failed'}")
+
+    def _post(self, path: str, payload: Dict[str, Any]) -> Dict[str, Any]:
+        status, body = self._request("POST", path, payload)
+        self._check(status, body)
+        return body
+
+    def _request(
+        self, method: str, path: str, payload: Optional[Dict[str, Any]] = None
+    ) -> Tuple[int, Any]:
+        body = None if payload is None else json.dumps(payload).encode("utf-8")
+        headers = {"Content-Type": "application/json"} if body is not None else {}
+        attempt = 0
+        while True:
+            conn = self._pool.acquire()
+            try:
+                conn.request(method, path, body=body, headers=headers)
+                response = conn.getresponse()
+                data = response.read()
+            except (ConnectionError, http.client.HTTPException):
+                self._pool.discard(conn)
+                if attempt >= self.retries:
+                    raise
+            except BaseException:
+                self._pool.discard(conn)
+                raise
+            else:
+                if response.will_close:
+                    self._pool.discard(conn)
+                else:
+                    self._pool.release(conn)
+                if response.status not in _RETRY_STATUSES or attempt >= self.retries:
+                    return response.status, json.loads(data) if data else None
+            time.sleep(self.retry_backoff * 2**attempt)
+            attempt += 1
+
+
+class _RESPConnection:
+    def __init__(self, host: str, port: int, timeout: float):
+        self.sock = socket.create_connection((host, port), timeout=timeout)
+        self.sock.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+        self.reader = self.sock.makefile("rb")
+
+    def send(self, commands: List[Tuple[Any, ...]]) -> None:
+        self.sock.sendall(b"".join(encode_command(command) for command in commands))
+
+    def read_reply(self) -> Any:
+        line = self.reader.readline()
+        if not line.endswith(b"\r\n"):
+            raise ConnectionError("Connection closed by the server")
+        kind, rest = line[:1], line[1:-2]
+        if kind == b"+":
+            return rest.decode("utf-8")
+        if kind == b"-":
+            return ClientError(rest.decode("utf-8", "replace"))
+        if kind == b":":
+            return int(rest)
+        if kind == b"$":
+            length = int(rest)
+            if length < 0:
+                return None
+            data = self.reader.read(length + 2)
+            if len(data) != length + 2:
+                raise ConnectionError("Connection closed by the server")
+            return data[:-2]
+        if kind == b"*":
+            length = int(rest)
+            return None if length < 0 else [self.read_reply() for _ in range(length)]
+        if kind == b"_":
+            return None
+        raise ConnectionError(f"Unexpected RESP reply type {kind!r}")
+
+    def close(self) -> None:
+        self.reader.close()
+        self.sock.close()
+
+
+def encode_command(args: Tuple[Any, ...]) -> bytes:
+    """Encode one command as a RESP multibulk request."""
+    out = [b"*%d\r\n" % len(args)]
+    for arg in args:
+        if isinstance(arg, str):
+            data = arg.encode("utf-8", "surrogateescape")
+        elif isinstance(arg, (bytes, bytearray)):
+            data = bytes(arg)
+        else:
+            data = str(arg).encode("ascii")
+        out.append(b"$%d\r\n%s\r\n" % (len(data), data))
+    return b"".join(out)
+
+
+class RESPClient:
+    """
+    Client for ``redsnano-resp-server`` (or any Redis server) over pooled
+    connections.  Values are sent as :class:`RESPServer` stores them:
+    strings and bytes as they are, anything else as JSON; replies come back
+    as strings.  Timeouts and retries behave as in :class:`HTTPClient`.
+
+    :meth:`pipeline` queues commands and sends them in one write, reading
+    all replies afterwards.
+    """
+
+    def __init__(
+        self,
+        host: str = "127.0.0.1",
+        port: int = 6379,
+        *,
+        timeout: float = 5.0,
+        retries: int = 2,
+        retry_backoff: float = 0.05,
+        pool_size: int = 8,
+    ):
+        self.host = host
+        self.port = port
+        self.timeout = timeout
+        self.retries = retries
+        self.retry_backoff = retry_backoff
+        self._pool: _ConnectionPool[_RESPConnection] = _ConnectionPool(
+            lambda: _RESPConnection(host, port, timeout),
+            lambda conn: conn.close(),
+            pool_size,
+        )
+
+    def execute(self, *args: Any) -> Any:
+        """Run one command and return its decoded reply."""
+        return self._execute_many([args])[0]
+
+    def pipeline(self) -> "Pipeline":
+        return Pipeline(self)
+
+    def get(self, key: str) -> str | None:
+        return _text(self.execute("GET", key))
+
+    def set(self, key: str, value: Any, ttl: Optional[float] = None) -> None:
+        self.execute(*_set_command(key, value, ttl))
+
+    def delete(self, key: str) -> None:
+        self.execute("DEL", key)
+
+    def mget(self, keys: Iterable[str]) -> List[str | None]:
+        keys = list(keys)
+        if not keys:
+            return []
+        return [_text(value) for value in self.execute("MGET", *keys)]
+
+    def mset(self, items: Mapping[str, Any], ttl: Optional[float] = None) -> None:
+        with self.pipeline() as pipe:
+            for key, value in items.items():
+                pipe.set(key, value, ttl)
+
+    def mdelete(self, keys: Iterable[str]) -> int:
+        keys = list(keys)
+        return self.execute("DEL", *keys) if keys else 0
+
+    def expire(self, key: str, seconds: int) -> bool:
+        return bool(self.execute("EXPIRE", key, int(seconds)))
+
+    def ttl(self, key: str) -> int:
+        return self.execute("TTL", key)
+
+    def keys(self, pattern: str = "*") -> List[str]:
+        return [_text(key) for key in self.execute("KEYS", pattern)]
+
+    def ping(self) -> bool:
+        return self.execute("PING") == "PONG"
+
+    def close(self) -> None:
+        self._pool.close()
+
+    def __enter__(self) -> "RESPClient":
+        return self
+
+    def __exit__(self, *exc_info: Any) -> None:
+        self.close()
+
+    def _execute_many(self, commands: List[Tuple[Any, ...]]) -> List[Any]:
+        attempt = 0
+        while True:
+            conn = self._pool.acquire()
+            try:
+                conn.send(commands)
+                replies = [conn.read_reply() for _ in commands]
+            except ConnectionError:
+                self._pool.discard(conn)
+                if attempt >= self.retries:
+                    raise
+            except BaseException:
+                self._pool.discard(conn)
+                raise
+            else:
+                self._pool.release(conn)
+                for reply in replies:
+                    if isinstance(reply, ClientError):
+                        raise reply
+                return replies
+            time.sleep(self.retry_backoff * 2**attempt)
+            attempt += 1
+
+
+class Pipeline:
+    """
+    Commands queued on a :class:`RESPClient` and sent together by
+    :meth:`execute` (or on leaving a ``with`` block).  Replies are returned
+    in order; the first error reply is raised after all are read.
+    """
+
+    def __init__(self, client: RESPClient):
+        self.client = client
+        self._commands: List[Tuple[Any, ...]] = []
+
+    def execute_command(self, *args: Any) -> "Pipeline":
+        self._commands.append(args)
+        return self
+
+    def get(self, key: str) -> "Pipeline":
+        return self.execute_command("GET", key)
+
+    def set(self, key: str, value: Any, ttl: Optional[float] = None) -> "Pipeline":
+        return self.execute_command(*_set_command(key, value, ttl))
+
+    def delete(self, key: str) -> "Pipeline":
+        return self.execute_command("DEL", key)
+
+    def expire(self, key: str, seconds: int) -> "Pipeline":
+        return self.execute_command("EXPIRE", key, int(seconds))
+
+    def execute(self) -> List[Any]:
+        commands, self._commands = self._commands, []
+        if not commands:
+            return []
+        return self.client._execute_many(commands)
+
+    def __len__(self) -> int:
+        return len(self._commands)
+
+    def __enter__(self) -> "Pipeline":
+        return self
+
+    def __exit__(self, exc_type: Any, *exc_info: Any) -> None:
+        if exc_type is None:
+            self.execute()
+
+
+def _set_command(key: str, value: Any, ttl: Optional[float]) -> Tuple[Any, ...]:
+    if ttl is None:
+        return ("SET", key, encode_value(value))
+    return ("SET", key, encode_value(value), "PX", max(1, round(ttl * 1000)))
+
+
+def _text(value: Any) -> Any:
+    return decode_value(value) if isinstance(value, bytes) else value
+
+
+class HashRing:
+    """
+    Consistent-hash ring with ``replicas`` virtual nodes per node.  Adding
+    or removing a node only moves the keys that hash next to its points,
+    about ``1 / len(nodes)`` of them.  Placement uses MD5, so it is the same
+    in every process.
+    """
+
+    def __init__(
+        self, nodes: Iterable[str] = (), *, replicas: int = DEFAULT_VIRTUAL_NODES
+    ):
+        self.replicas = replicas
+        self._points: List[int] = []
+        self._owners: List[str] = []
+        self._nodes: List[str] = []
+        for node in nodes:
+            self.add(node)
+
+    @property
+    def nodes(self) -> List[str]:
+        return list(self._nodes)
+
+    def add(self, node: str) -> None:
+        if node in self._nodes:
+            return
+        self._nodes.append(node)
+        for replica in range(self.replicas):
+            point = _ring_hash(f"{node}#{replica}")
+            index = bisect.bisect(self._points, point)
+            self._points.insert(index, point)
+            self._owners.insert(index, node)
+
+    def remove(self, node: str) -> None:
+        if node not in self._nodes:
+            return
+        self._nodes.remove(node)
+        kept = [
+            (point, owner)
+            for point, owner in zip(self._points, self._owners)
+            if owner != node
+        ]
+        self._points = [point for point, _ in kept]
+        self._owners = [owner for _, owner in kept]
+
+    def node_for(self, key: str) -> str:
+        if not self._points:
+            raise LookupError("The hash ring has no nodes")
+        index = bisect.bisect(self._points, _ring_hash(key)) % len(self._points)
+        return self._owners[index]
+
+
+def _ring_hash(value: str) -> int:
+    digest = hashlib.md5(value.encode("utf-8", "surrogateescape")).digest()
+    return int.from_bytes(digest[:8], "big")
+
+
+class ShardedClient:
+    """
+    Spreads keys over several servers with a :class:`HashRing`.
+
+    ``nodes`` maps node names to clients, or lists ``"host:port"`` addresses
+    for which ``client_class`` (default :class:`HTTPClient`) is built with
+    ``client_options``.  Single-key calls go to the key's node; batch calls
+    are split per node and sent concurrently.
+    """
+
+    def __init__(
+        self,
+        nodes: Mapping[str, CacheClient] | Iterable[str],
+        *,
+        replicas: int = DEFAULT_VIRTUAL_NODES,
+        client_class: Callable[..., CacheClient] = HTTPClient,
+        **client_options: Any,
+    ):
+        if isinstance(nodes, Mapping):
+            self.clients: Dict[str, CacheClient] = dict(nodes)
+        else:
+            self.clients = {}
+            for address in nodes:
+                host, _, port = address.rpartition(":")
+                self.clients[address] = client_class(
+                    host, int(port), **client_options
+                )
+        if not self.clients:
+            raise ValueError("ShardedClient needs at least one node")
+        self.ring = HashRing(self.clients, replicas=replicas)
+        self._executor = ThreadPoolExecutor(
+            max_workers=len(self.clients), thread_name_prefix="redsnano-client"
+        )
+
+    def client_for(self, key: str) -> CacheClient:
+        return self.clients[self.ring.node_for(key)]
+
+    def get(self, key: str) -> Any | None:
+        return self.client_for(key).get(key)
+
+    def set(self, key: str, value: Any, ttl: Optional[float] = None) -> None:
+        self.client_for(key).set(key, value, ttl)
+
+    def delete(self, key: str) -> None:
+        self.client_for(key).delete(key)
+
+    def mget(self, keys: Iterable[str]) -> List[Any | None]:
+        keys = list(keys)
+        results = self._fan_out(
+            self._group(keys), lambda client, group: client.mget(group)
+        )
+        values: Dict[str, Any] = {}
+        for group, group_values in results:
+            values.update(zip(group, group_values))
+        return [values.get(key) for key in keys]
+
+    def mset(self, items: Mapping[str, Any], ttl: Optional[float] = None) -> None:
+        self._fan_out(
+            self._group(items),
+            lambda client, group: client.mset({key: items[key] for key in group}, ttl),
+        )
+
+    def mdelete(self, keys: Iterable[str]) -> int:
+        results = self._fan_out(
+            self._group(keys), lambda client, group: client.mdelete(group)
+        )
+        return sum(deleted for _, deleted in results)
+
+    def keys(self, pattern: str = "*") -> List[str]:
+        futures = [
+            self._executor.submit(client.keys, pattern)
+            for client in self.clients.values()
+        ]
+        return [key for future in futures for key in future.result()]
+
+    def close(self) -> None:
+        self._executor.shutdown(wait=True)
+        for client in self.clients.values():
+            client.close()
+
+    def __enter__(self) -> "ShardedClient":
+        return self
+
+    def __exit__(self, *exc_info: Any) -> None:
+        self.close()
+
+    def _group(self, keys: Iterable[str]) -> Dict[str, List[str]]:
+        groups: Dict[str, List[str]] = {}
+        for key in keys:
+            groups.setdefault(self.ring.node_for(key), []).append(key)
+        return groups
+
+    def _fan_out(
+        self,
+        groups: Dict[str, List[str]],
+        call: Callable[[CacheClient, List[str]], Any],
+    ) -> List[Tuple[List[str], Any]]:
+        futures = [
+            (group, self._executor.submit(call, self.clients[node], group))
+            for node, group in groups.items()
+        ]
+        return [(group, future.result()) for group, future in futures]
@@ -0,0 +1,236 @@
+from __future__ import annotations
+
+import math
+import random
+import time
+from collections import OrderedDict
+from typing import Dict, List, Optional, Protocol
+
+from .cache_types import CacheEntry
+
+
+class EvictionPolicy(Protocol):
+    """
+    Bookkeeping used by :class:`~redsnano.cache.MiniRedis` to pick keys to
+    drop once the cache exceeds its size limits.  Every hook runs under the
+    cache lock and must be O(1).
+    """
+
+    name: str
+
+    def record_insert(self, key: str, entry: CacheEntry) -> None:  # pragma: no cover - protocol
+        ...
+
+    def record_access(self, key: str) -> None:  # pragma: no cover - protocol
+        ...
+
+    def record_remove(self, key: str) -> None:  # pragma: no cover - protocol
+        ...
+
+    def choose_victim(self) -> str | None:  # pragma: no cover - protocol
+        ...
+
+
+class _KeySampler:
+    """Set of keys supporting O(1) insert, remove and uniform random choice."""
+
+    def __init__(self, rng: random.Random):
+        self._keys: List[str] = []
+        self._index: Dict[str, int] = {}
+        self._rng = rng
+
+    def __len__(self) -> int:
+        return len(self._keys)
+
+    def add(self, key: str) -> None:
+        if key not in self._index:
+            self._index[key] = len(self._keys)
+            self._keys.append(key)
+
+    def discard(self, key: str) -> None:
+        index = self._index.pop(key, None)
+        if index is None:
+            return
+        last = self._keys.pop()
+        if index < len(self._keys):
+            self._keys[index] = last
+            self._index[last] = index
+
+    def choice(self) -> str | None:
+        return self._rng.choice(self._keys) if self._keys else None
+
+    def sample(self, count: int) -> List[str]:
+        return self._rng.sample(self._keys, min(count, len(self._keys)))
+
+
+class LRUPolicy:
+    """Evict the least recently read or written key."""
+
+    name = "lru"
+
+    def __init__(self) -> None:
+        self._order: OrderedDict[str, None] = OrderedDict()
+
+    def record_insert(self, key: str, entry: CacheEntry) -> None:
+        self._order[key] = None
+        self._order.move_to_end(key)
+
+    def record_access(self, key: str) -> None:
+        if key in self._order:
+            self._order.move_to_end(key)
+
+    def record_remove(self, key: str) -> None:
+        self._order.pop(key, None)
+
+    def choose_victim(self) -> str | None:
+        return next(iter(self._order), None)
+
+
+class RandomPolicy:
+    """Evict a uniformly random key."""
+
+    name = "random"
+
+    def __init__(self, *, seed: Optional[int] = None) -> None:
+        self._keys = _KeySampler(random.Random(seed))
+
+    def record_insert(self, key: str, entry: CacheEntry) -> None:
+        self._keys.add(key)
+
+    def record_access(self, key: str) -> None:
+        return
+
+    def record_remove(self, key: str) -> None:
+        self._keys.discard(key)
+
+    def choose_victim(self) -> str | None:
+        return self._keys.choice()
+
+
+class LFUPolicy:
+    """
+    Approximate LFU in the style of Redis' ``allkeys-lfu``.
+
+    Each key keeps an 8-bit logarithmic access counter that is incremented
+    probabilistically (``log_factor`` controls how quickly it saturates) and
+    decremented by one for every ``decay_time`` seconds the key goes unread.
+    Victims are chosen among ``samples`` random keys.
+    """
+
+    name = "lfu"
+
+    INITIAL_COUNTER = 5
+    MAX_COUNTER = 255
+
+    def __init__(
+        self,
+        *,
+        log_factor: int = 10,
+        decay_time: float = 60.0,
+        samples: int = 5,
+        seed: Optional[int] = None,
+    ) -> None:
+        self.log_factor = log_factor
+        self.decay_time = decay_time
+        self.samples = samples
+        self._rng = random.Random(seed)
+        self._keys = _KeySampler(self._rng)
+        self._counters: Dict[str, List[float]] = {}
+
+    def record_insert(self, key: str, entry: CacheEntry) -> None:
+        if key in self._counters:
+            self.record_access(key)
+            return
+        self._keys.add(key)
+        self._counters[key] = [self.INITIAL_COUNTER, time.monotonic()]
+
+    def record_access(self, key: str) -> None:
+        slot = self._counters.get(key)
+        if slot is None:
+            return
+        now = time.monotonic()
+        counter = self._decayed(slot, now)
+        if counter < self.MAX_COUNTER:
+            baseline = max(counter - self.INITIAL_COUNTER, 0)
+            if self._rng.random() < 1.0 / (baseline * self.log_factor + 1):
+                counter += 1
+        slot[0] = counter
+        slot[1] = now
+
+    def record_remove(self, key: str) -> None:
+        if self._counters.pop(key, None) is not None:
+            self._keys.discard(key)
+
+    def choose_victim(self) -> str | None:
+        now = time.monotonic()
+        candidates = self._keys.sample(self.samples)
+        return min(
+            candidates,
+            key=lambda key: self._decayed(self._counters[key], now),
+            default=None,
+        )
+
+    def _decayed(self, slot: List[float], now: float) -> float:
+        if self.decay_time <= 0:
+            return slot[0]
+        periods = math.floor((now - slot[1]) / self.decay_time)
+        return max(slot[0] - periods, 0)
+
+
+class VolatileTTLPolicy:
+    """
+    Evict keys closest to expiry first, sampling ``samples`` keys that carry a
+    TTL.  Falls back to a random key once no key has a TTL.
+    """
+
+    name = "volatile-ttl"
+
+    def __init__(self, *, samples: int = 5, seed: Optional[int] = None) -> None:
+        self.samples = samples
+        rng = random.Random(seed)
+        self._volatile = _KeySampler(rng)
+        self._persistent = _KeySampler(rng)
+        self._expire_at: Dict[str, float] = {}
+
+    def record_insert(self, key: str, entry: CacheEntry) -> None:
+        if entry.expire_at is None:
+            self._expire_at.pop(key, None)
+            self._volatile.discard(key)
+            self._persistent.add(key)
+        else:
+            self._expire_at[key] = entry.expire_at
+            self._persistent.discard(key)
+            self._volatile.add(key)
+
+    def record_access(self, key: str) -> None:
+        return
+
+    def record_remove(self, key: str) -> None:
+        self._expire_at.pop(key, None)
+        self._volatile.discard(key)
+        self._persistent.discard(key)
+
+    def choose_victim(self) -> str | None:
+        candidates = self._volatile.sample(self.samples)
+        if not candidates:
+            return self._persistent.choice()
+        return min(candidates, key=self._expire_at.__getitem__)
+
+
+EVICTION_POLICIES = {
+    LRUPolicy.name: LRUPolicy,
+    LFUPolicy.name: LFUPolicy,
+    VolatileTTLPolicy.name: VolatileTTLPolicy,
+    RandomPolicy.name: RandomPolicy,
+}
+
+
+def make_eviction_policy(name: str) -> EvictionPolicy:
+    """Instantiate one of the built-in policies by its Redis-style name."""
+    try:
+        return EVICTION_POLICIES[name]()
+    except KeyError:
+        raise ValueError(
+            f"Unknown eviction policy {name!r}; "
+            f"expected one of {sorted(EVICTION_POLICIES)}"
+        ) from None
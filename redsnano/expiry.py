@@ -0,0 +1,40 @@
+from __future__ import annotations
+
+import heapq
+from typing import Iterable, List, Tuple
+
+
+class ExpiryIndex:
+    """
+    Min-heap of ``(expire_at, key)`` pairs used by the active expiry cycle.
+
+    Overwritten and deleted keys are not removed eagerly; callers compare a
+    popped pair with the live entry and ignore it when they no longer match.
+    :meth:`needs_rebuild` tells the owner when stale pairs dominate the heap.
+    """
+
+    def __init__(self) -> None:
+        self._heap: List[Tuple[float, str]] = []
+
+    def __len__(self) -> int:
+        return len(self._heap)
+
+    def add(self, key: str, expire_at: float) -> None:
+        heapq.heappush(self._heap, (expire_at, key))
+
+    def next_expiry(self) -> float | None:
+        return self._heap[0][0] if self._heap else None
+
+    def pop_due(self, now: float, limit: int) -> List[Tuple[float, str]]:
+        due: List[Tuple[float, str]] = []
+        heap = self._heap
+        while heap and heap[0][0] <= now and len(due) < limit:
+            due.append(heapq.heappop(heap))
+        return due
+
+    def needs_rebuild(self, live_keys: int) -> bool:
+        return len(self._heap) > 2 * live_keys + 1024
+
+    def rebuild(self, items: Iterable[Tuple[str, float]]) -> None:
+        self._heap = [(expire_at, key) for key, expire_at in items]
+        heapq.heapify(self._heap)
@@ -1,13 +1,17 @@
 from __future__ import annotations
 
 from pathlib import Path
+from typing import Any, Dict, List, Optional
 
 from fastapi import FastAPI, HTTPException
+from fastapi.responses import PlainTextResponse, Response
 from pydantic import BaseModel, EmailStr
 
+from .aio import AsyncMiniRedis, AsyncSQLiteUserOriginStore
 from .cache import MiniRedis
+from .metrics import PROMETHEUS_CONTENT_TYPE, prometheus_text
 from .origin_sqlite import SQLiteUserOriginStore, SQLiteUserRepository
-from .persistence import JSONPersistence
+from .persistence import JSONPersistence, Persistence
 
 
 class UserPayload(BaseModel):
@@ -15,43 +19,154 @@ class UserPayload(BaseModel):
     email: EmailStr
 
 
+class UserBatchPayload(BaseModel):
+    users: List[UserPayload]
+
+
+class UsernamesPayload(BaseModel):
+    usernames: List[str]
+
+
 def create_app(
     db_path: str | Path = "users.db",
     cache_path: str | Path = "cache_fastapi.json",
     *,
     default_ttl: float = 60,
+    revalidate_after: float | None = None,
+    use_change_feed: bool = False,
+    async_mode: bool = False,
+    keep_encoded: bool = False,
+    persistence: Optional[Persistence] = None,
 ) -> FastAPI:
+    """
+    Build the users API.  With ``async_mode`` the endpoints are coroutines
+    backed by :class:`AsyncMiniRedis`, so a request waiting on SQLite does not
+    hold one of the server's threadpool slots.  ``GET /users/{username}``
+    answers with the cached JSON bytes as they are, kept with each entry
+    when ``keep_encoded`` is set.  The cache is saved to ``cache_path`` as
+    JSON unless another ``persistence`` backend is given.
+    """
     db_path = Path(db_path)
     cache_path = Path(cache_path)
 
     origin = SQLiteUserOriginStore(db_path)
-    repo = SQLiteUserRepository(db_path)
-    cache = MiniRedis(
-        origin,
-        persistence=JSONPersistence(cache_path),
+    repo = SQLiteUserRepository(db_path, store=origin)
+    options = dict(
+        persistence=persistence or JSONPersistence(cache_path),
         default_ttl=default_ttl,
         validate_async=False,
+        revalidate_after=revalidate_after,
+        change_feed=origin.change_feed if use_change_feed else None,
+        keep_encoded=keep_encoded,
     )
 
     app = FastAPI(title="redsnano-fastapi", version="0.1.0")
-    app.state.cache = cache
     app.state.repo = repo
+    if async_mode:
+        async_origin = AsyncSQLiteUserOriginStore(store=origin)
+        app.state.cache = AsyncMiniRedis(async_origin, **options)
+        _add_async_routes(app, app.state.cache, repo, async_origin, default_ttl)
+    else:
+        app.state.cache = MiniRedis(origin, **options)
+        _add_routes(app, app.state.cache, repo, default_ttl)
+    _add_metrics_routes(app, app.state.cache)
+    return app
+
+
+def _mget_response(usernames: List[str], values: List[Any]) -> Dict[str, Any]:
+    return {
+        "users": [value for value in values if value is not None],
+        "missing": [
+            username for username, value in zip(usernames, values) if value is None
+        ],
+    }
 
+
+def _add_routes(
+    app: FastAPI, cache: MiniRedis, repo: SQLiteUserRepository, default_ttl: float
+) -> None:
     @app.post("/users", status_code=201)
     def register_user(payload: UserPayload):
         record = repo.upsert_user(payload.username, payload.email)
         cache.set(payload.username, record, ttl=default_ttl)
         return record
 
+    @app.post("/users/batch", status_code=201)
+    def register_users(payload: UserBatchPayload):
+        records = repo.upsert_users(
+            {"username": user.username, "email": user.email} for user in payload.users
+        )
+        cache.mset({record["username"]: record for record in records}, ttl=default_ttl)
+        return {"users": records}
+
+    @app.post("/users/mget")
+    def get_users(payload: UsernamesPayload):
+        values = cache.mget(payload.usernames, ttl=default_ttl)
+        return _mget_response(payload.usernames, values)
+
     @app.get("/users/{username}")
     def get_user(username: str):
-        value = cache.get(username, ttl=default_ttl)
+        value = cache.get_encoded(username, ttl=default_ttl)
         if value is None:
             raise HTTPException(status_code=404, detail="User not found")
-        return value
+        return Response(value, media_type="application/json")
 
-    return app
 
+def _add_async_routes(
+    app: FastAPI,
+    cache: AsyncMiniRedis,
+    repo: SQLiteUserRepository,
+    origin: AsyncSQLiteUserOriginStore,
+    default_ttl: float,
+) -> None:
+    @app.post("/users", status_code=201)
+    async def register_user(payload: UserPayload):
+        record = await origin.call(repo.upsert_user, payload.username, payload.email)
+        await cache.set(payload.username, record, ttl=default_ttl)
+        return record
+
+    @app.post("/users/batch", status_code=201)
+    async def register_users(payload: UserBatchPayload):
+        users = [
+            {"username": user.username, "email": user.email} for user in payload.users
+        ]
+        records = await origin.call(repo.upsert_users, users)
+        await cache.mset(
+            {record["username"]: record for record in records}, ttl=default_ttl
+        )
+        return {"users": records}
+
+    @app.post("/users/mget")
+    async def get_users(payload: UsernamesPayload):
+        values = await cache.mget(payload.usernames, ttl=default_ttl)
+        return _mget_response(payload.usernames, values)
+
+    @app.get("/users/{username}")
+    async def get_user(username: str):
+        value = await cache.get_encoded(username, ttl=default_ttl)
+        if value is None:
+            raise HTTPException(status_code=404, detail="User not found")
+        return Response(value, media_type="application/json")
 
-app = create_app()
 
+def _add_metrics_routes(app: FastAPI, cache: MiniRedis | AsyncMiniRedis) -> None:
+    @app.get("/stats")
+    def stats():
+        return cache.stats()
+
+    @app.get("/slowlog")
+    def slowlog(count: int = 10):
+        return cache.slowlog.to_dict(count)
+
+    @app.delete("/slowlog")
+    def reset_slowlog():
+        cache.slowlog.reset()
+        return {"reset": True}
+
+    @app.get("/metrics", response_class=PlainTextResponse)
+    def metrics():
+        text = prometheus_text(cache.metrics, cache.info())
+        return PlainTextResponse(text, media_type=PROMETHEUS_CONTENT_TYPE)
+
+
+app = create_app()
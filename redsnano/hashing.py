@@ -1,19 +1,271 @@
 from __future__ import annotations
 
+import base64
+import dataclasses
+import datetime
+import decimal
 import hashlib
 import json
-from typing import Any
+import math
+import re
+import uuid
+from typing import Any, Callable, Dict, NamedTuple
 
+try:  # pragma: no cover - optional dependency
+    import orjson
+except ImportError:  # pragma: no cover - optional dependency
+    orjson = None
 
-def _serialize(value: Any) -> str:
+try:  # pragma: no cover - optional dependency
+    import xxhash
+except ImportError:  # pragma: no cover - optional dependency
+    xxhash = None
+
+
+class HashAlgorithm(NamedTuple):
+    """A digest function plus the prefix that marks its output."""
+
+    name: str
+    prefix: str
+    digest: Callable[[bytes], str]
+    raw_digest: Callable[[bytes], bytes]
+
+
+def _sha256(data: bytes) -> str:
+    return hashlib.sha256(data).hexdigest()
+
+
+def _sha256_raw(data: bytes) -> bytes:
+    return hashlib.sha256(data).digest()
+
+
+def _blake2b(data: bytes) -> str:
+    return hashlib.blake2b(data, digest_size=16).hexdigest()
+
+
+def _blake2b_raw(data: bytes) -> bytes:
+    return hashlib.blake2b(data, digest_size=16).digest()
+
+
+_ALGORITHMS: Dict[str, HashAlgorithm] = {
+    "sha256": HashAlgorithm("sha256", "", _sha256, _sha256_raw),
+    "blake2b": HashAlgorithm("blake2b", "b2:", _blake2b, _blake2b_raw),
+}
+if xxhash is not None:  # pragma: no cover - optional dependency
+    _ALGORITHMS["xxh64"] = HashAlgorithm(
+        "xxh64", "x64:", xxhash.xxh3_64_hexdigest, xxhash.xxh3_64_digest
+    )
+    _ALGORITHMS["xxh128"] = HashAlgorithm(
+        "xxh128", "x128:", xxhash.xxh3_128_hexdigest, xxhash.xxh3_128_digest
+    )
+
+_OPTIONAL_ALGORITHMS = {"xxh64": "xxhash", "xxh128": "xxhash"}
+
+
+def _packed_prefix(prefix: str) -> bytes:
+    # Header of a packed digest (see pack_digest): prefix length, then prefix.
+    encoded = prefix.encode("utf-8")
+    return bytes((len(encoded),)) + encoded
+
+
+_current = _ALGORITHMS["sha256"]
+_current_packed_prefix = _packed_prefix(_current.prefix)
+
+
+def available_algorithms() -> list[str]:
+    """Names accepted by :func:`set_hash_algorithm` in this environment."""
+    return list(_ALGORITHMS)
+
+
+def get_hash_algorithm() -> str:
+    return _current.name
+
+
+def set_hash_algorithm(name: str) -> None:
+    """
+    Select the digest algorithm for this process: ``sha256`` (default),
+    ``blake2b`` (128-bit) or, with the optional ``xxhash`` package, the
+    non-cryptographic ``xxh64``/``xxh128``.  Origin stores and caches that
+    exchange digests must use the same one.  Digests other than SHA-256
+    carry a short prefix so stored digests from another algorithm are
+    recognised by :func:`is_current_digest` rather than never matching.
+    """
+    global _current, _current_packed_prefix
+    try:
+        _current = _ALGORITHMS[name]
+        _current_packed_prefix = _packed_prefix(_current.prefix)
+    except KeyError:
+        if name in _OPTIONAL_ALGORITHMS:
+            raise ValueError(
+                f"Hash algorithm {name!r} requires the "
+                f"{_OPTIONAL_ALGORITHMS[name]!r} package"
+            ) from None
+        raise ValueError(
+            f"Unknown hash algorithm {name!r}; expected one of {available_algorithms()}"
+        ) from None
+
+
+def is_current_digest(digest: str) -> bool:
+    """Whether ``digest`` was produced by the currently selected algorithm."""
+    prefix = _current.prefix
+    if prefix:
+        return digest.startswith(prefix)
+    return ":" not in digest
+
+
+def pack_digest(digest: str) -> bytes | str:
+    """
+    Compact form of a digest for in-memory storage: the algorithm prefix
+    (length-prefixed) followed by the raw digest bytes, about half the size
+    of the hex text.  Digests that are not lowercase hex are kept as given.
+    """
+    prefix, _, hex_part = digest.rpartition(":")
+    try:
+        raw = bytes.fromhex(hex_part)
+    except ValueError:
+        return digest
+    if not raw or raw.hex() != hex_part or len(prefix) > 254:
+        return digest
+    return _packed_prefix(prefix + ":" if prefix else "") + raw
+
+
+def unpack_digest(packed: bytes | str) -> str:
+    """The digest text stored by :func:`pack_digest`."""
+    if isinstance(packed, str):
+        return packed
+    end = packed[0] + 1
+    return packed[1:end].decode("utf-8") + packed[end:].hex()
+
+
+def json_default(value: Any) -> Any:
+    """
+    Stable JSON stand-ins for common non-JSON types, for the ``default`` hook
+    of ``json.dumps``; raises TypeError for other objects.
+    """
+    if isinstance(value, (set, frozenset)):
+        return sorted(value, key=canonical_bytes)
+    if isinstance(value, (bytes, bytearray, memoryview)):
+        return base64.b64encode(bytes(value)).decode("ascii")
+    if isinstance(value, (datetime.datetime, datetime.date, datetime.time)):
+        return value.isoformat()
+    if isinstance(value, (decimal.Decimal, uuid.UUID)):
+        return str(value)
+    if dataclasses.is_dataclass(value) and not isinstance(value, type):
+        return dataclasses.asdict(value)
+    raise TypeError(f"{type(value).__name__} is not JSON serializable")
+
+
+if orjson is not None:
+    _ORJSON_OPTIONS = (
+        orjson.OPT_SORT_KEYS
+        | orjson.OPT_NON_STR_KEYS
+        | orjson.OPT_PASSTHROUGH_DATACLASS
+        | orjson.OPT_PASSTHROUGH_DATETIME
+        | orjson.OPT_PASSTHROUGH_SUBCLASS
+    )
+
+
+# orjson and the stdlib write some floats differently (``1e16`` / ``1e+16``,
+# ``0.00001`` / ``1e-05``).  Canonical bytes use the stdlib's repr() form, so
+# a digest does not depend on which serializer produced it; output that may
+# hold such a float is rewritten token by token, skipping string contents.
+_EXPONENT = re.compile(rb"e[-0-9]")
+_JSON_TOKEN = re.compile(rb'"[^"\\]*(?:\\.[^"\\]*)*"|-?\d+(?:\.\d+)?(?:e[-+]?\d+)?')
+
+
+def _repr_float(match: re.Match) -> bytes:
+    token = match.group()
+    if token[:1] == b'"' or not (b"." in token or b"e" in token):
+        return token
+    return repr(float(token)).encode("ascii")
+
+
+def _finite(value: Any) -> Any:
+    # NaN and infinities as null, which is how orjson writes them.
+    if isinstance(value, float):
+        return value if math.isfinite(value) else None
+    if isinstance(value, dict):
+        return {key: _finite(item) for key, item in value.items()}
+    if isinstance(value, (list, tuple)):
+        return [_finite(item) for item in value]
+    return value
+
+
+def _stdlib_json_bytes(value: Any) -> bytes:
+    return json.dumps(
+        value,
+        sort_keys=True,
+        separators=(",", ":"),
+        ensure_ascii=False,
+        allow_nan=False,
+        default=json_default,
+    ).encode("utf-8")
+
+
+def _json_bytes(value: Any) -> bytes:
+    if orjson is not None:
+        try:
+            data = orjson.dumps(value, default=json_default, option=_ORJSON_OPTIONS)
+        except TypeError:
+            pass  # e.g. integers wider than 64 bits; the stdlib handles them
+        else:
+            if b"0.0000" in data or _EXPONENT.search(data):
+                data = _JSON_TOKEN.sub(_repr_float, data)
+            return data
+    try:
+        return _stdlib_json_bytes(value)
+    except ValueError:
+        return _stdlib_json_bytes(_finite(value))
+
+
+def canonical_bytes(value: Any) -> bytes:
+    """
+    Return the canonical encoding of ``value`` that hashes are computed over:
+    compact JSON with sorted keys, produced by ``orjson`` when installed and
+    identical without it.
+    """
     try:
-        return json.dumps(value, sort_keys=True, separators=(",", ":"))
+        return _json_bytes(value)
     except (TypeError, ValueError):
-        return repr(value)
+        # Last resort for objects without a JSON form; only stable within
+        # a process when their repr is.
+        return repr(value).encode("utf-8")
 
 
-def compute_hash(value: Any) -> str:
-    """Return a deterministic SHA-256 hash for the provided value."""
-    serialized = _serialize(value)
-    return hashlib.sha256(serialized.encode("utf-8")).hexdigest()
+def canonical_json(value: Any) -> bytes | None:
+    """
+    :func:`canonical_bytes` for values that have a JSON form, so the result
+    can be served as JSON as is; None for the rest.
+    """
+    try:
+        return _json_bytes(value)
+    except (TypeError, ValueError):
+        return None
+
 
+def decode_canonical(data: bytes) -> Any:
+    """Parse bytes produced by :func:`canonical_bytes` for a JSON value."""
+    if orjson is not None:
+        try:
+            return orjson.loads(data)
+        except ValueError:
+            pass  # e.g. integers wider than 64 bits; the stdlib handles them
+    return json.loads(data)
+
+
+def hash_bytes(data: bytes) -> str:
+    """Return the digest of already-encoded canonical bytes."""
+    return _current.prefix + _current.digest(data)
+
+
+def packed_hash_bytes(data: bytes) -> bytes:
+    """
+    :func:`hash_bytes` in the form produced by :func:`pack_digest`, computed
+    without going through the hex text.
+    """
+    return _current_packed_prefix + _current.raw_digest(data)
+
+
+def compute_hash(value: Any) -> str:
+    """Return a deterministic hash of ``value`` using the selected algorithm."""
+    return hash_bytes(canonical_bytes(value))
@@ -0,0 +1,220 @@
+from __future__ import annotations
+
+import threading
+from typing import Any, Dict, List, Mapping, Optional, Tuple
+
+# Histogram resolution: each power of two is split into 2**SUB_BUCKET_BITS
+# linear buckets, so recorded values are within ~6% of the true latency.
+SUB_BUCKET_BITS = 4
+_SUB_BUCKETS = 1 << SUB_BUCKET_BITS
+
+# Quantiles reported by :meth:`Metrics.snapshot` and the Prometheus output.
+QUANTILES = (0.5, 0.9, 0.99, 0.999)
+
+PROMETHEUS_CONTENT_TYPE = "text/plain; version=0.0.4; charset=utf-8"
+
+
+def bucket_index(value: int) -> int:
+    """Log-linear (HDR-style) bucket of a non-negative integer."""
+    if value < 2 * _SUB_BUCKETS:
+        return value
+    shift = value.bit_length() - SUB_BUCKET_BITS - 1
+    return (shift << SUB_BUCKET_BITS) + (value >> shift)
+
+
+def bucket_value(index: int) -> int:
+    """The midpoint of the values counted in bucket ``index``."""
+    if index < 2 * _SUB_BUCKETS:
+        return index
+    shift = (index >> SUB_BUCKET_BITS) - 1
+    low = (index - (shift << SUB_BUCKET_BITS)) << shift
+    return low + (1 << shift) // 2
+
+
+class Histogram:
+    """
+    Latency histogram in microseconds with log-linear buckets: constant
+    memory per order of magnitude and constant-time recording.
+    """
+
+    __slots__ = ("counts", "count", "total", "max")
+
+    def __init__(self) -> None:
+        self.counts: List[int] = []
+        self.count = 0
+        self.total = 0
+        self.max = 0
+
+    def record(self, micros: int) -> None:
+        index = bucket_index(micros)
+        counts = self.counts
+        if index >= len(counts):
+            counts.extend([0] * (index + 1 - len(counts)))
+        counts[index] += 1
+        self.count += 1
+        self.total += micros
+        if micros > self.max:
+            self.max = micros
+
+    def merge(self, other: "Histogram") -> None:
+        counts = list(other.counts)
+        if len(counts) > len(self.counts):
+            self.counts.extend([0] * (len(counts) - len(self.counts)))
+        for index, count in enumerate(counts):
+            self.counts[index] += count
+        self.count += other.count
+        self.total += other.total
+        self.max = max(self.max, other.max)
+
+    def quantile(self, q: float) -> int:
+        if not self.count:
+            return 0
+        rank = max(1, round(q * self.count))
+        seen = 0
+        for index, count in enumerate(self.counts):
+            seen += count
+            if seen >= rank:
+                return min(bucket_value(index), self.max)
+        return self.max
+
+    def summary(self) -> Dict[str, Any]:
+        summary: Dict[str, Any] = {
+            "count": self.count,
+            "mean_us": self.total / self.count if self.count else 0.0,
+            "max_us": self.max,
+        }
+        for q in QUANTILES:
+            summary[f"p{_quantile_label(q)}_us"] = self.quantile(q)
+        return summary
+
+
+class _ThreadStats:
+    __slots__ = ("thread", "counters", "histograms")
+
+    def __init__(self, thread: threading.Thread):
+        self.thread = thread
+        self.counters: Dict[str, int] = {}
+        self.histograms: Dict[str, Histogram] = {}
+
+
+class Metrics:
+    """
+    Counters and latency histograms that cost a dictionary update on the hot
+    path.  Each thread writes only to its own tables, so recording takes no
+    lock; readers merge all threads' tables (copying them in single C-level
+    calls, which the GIL keeps consistent).  Tables of finished threads are
+    folded into a shared total the next time metrics are read.
+    """
+
+    def __init__(self) -> None:
+        self._local = threading.local()
+        self._lock = threading.Lock()
+        self._threads: List[_ThreadStats] = []
+        self._retired = _ThreadStats(threading.current_thread())
+
+    def incr(self, name: str, amount: int = 1) -> None:
+        counters = self._stats().counters
+        counters[name] = counters.get(name, 0) + amount
+
+    def observe(self, name: str, seconds: float) -> None:
+        """Record a duration (in seconds) in the histogram ``name``."""
+        histograms = self._stats().histograms
+        histogram = histograms.get(name)
+        if histogram is None:
+            histogram = histograms[name] = Histogram()
+        histogram.record(int(seconds * 1_000_000))
+
+    def counters(self) -> Dict[str, int]:
+        return self._merged()[0]
+
+    def histograms(self) -> Dict[str, Histogram]:
+        return self._merged()[1]
+
+    def snapshot(self) -> Dict[str, Any]:
+        """Counters and per-histogram count, mean, max and quantiles (in µs)."""
+        counters, histograms = self._merged()
+        return {
+            "counters": dict(sorted(counters.items())),
+            "latency": {
+                name: histogram.summary()
+                for name, histogram in sorted(histograms.items())
+            },
+        }
+
+    def reset(self) -> None:
+        with self._lock:
+            self._threads = []
+            self._retired = _ThreadStats(threading.current_thread())
+        self._local = threading.local()
+
+    def _stats(self) -> _ThreadStats:
+        try:
+            return self._local.stats
+        except AttributeError:
+            stats = _ThreadStats(threading.current_thread())
+            self._local.stats = stats
+            with self._lock:
+                self._threads.append(stats)
+            return stats
+
+    def _merged(self) -> Tuple[Dict[str, int], Dict[str, Histogram]]:
+        with self._lock:
+            alive = []
+            for stats in self._threads:
+                if stats.thread.is_alive():
+                    alive.append(stats)
+                else:
+                    _fold(self._retired, stats)
+            self._threads = alive
+            sources = [self._retired, *self._threads]
+            counters: Dict[str, int] = {}
+            histograms: Dict[str, Histogram] = {}
+            for stats in sources:
+                for name, value in dict(stats.counters).items():
+                    counters[name] = counters.get(name, 0) + value
+                for name, histogram in dict(stats.histograms).items():
+                    histograms.setdefault(name, Histogram()).merge(histogram)
+        return counters, histograms
+
+
+def _fold(into: _ThreadStats, stats: _ThreadStats) -> None:
+    for name, value in stats.counters.items():
+        into.counters[name] = into.counters.get(name, 0) + value
+    for name, histogram in stats.histograms.items():
+        into.histograms.setdefault(name, Histogram()).merge(histogram)
+
+
+def _quantile_label(q: float) -> str:
+    # 0.5 -> "50", 0.99 -> "99", 0.999 -> "999"
+    return f"{q * 100:g}".replace(".", "")
+
+
+def prometheus_text(
+    metrics: Metrics,
+    gauges: Optional[Mapping[str, Any]] = None,
+    *,
+    prefix: str = "redsnano",
+) -> str:
+    """
+    Render ``metrics`` (counters as ``*_total``, histograms as summaries in
+    seconds) and numeric ``gauges`` in the Prometheus text format.
+    """
+    counters, histograms = metrics._merged()
+    lines: List[str] = []
+    for name, value in sorted(counters.items()):
+        metric = f"{prefix}_{name}_total"
+        lines += [f"# TYPE {metric} counter", f"{metric} {value}"]
+    for name, histogram in sorted(histograms.items()):
+        metric = f"{prefix}_{name}_seconds"
+        lines.append(f"# TYPE {metric} summary")
+        for q in QUANTILES:
+            seconds = histogram.quantile(q) / 1_000_000
+            lines.append(f'{metric}{{quantile="{q}"}} {seconds:.6f}')
+        lines.append(f"{metric}_sum {histogram.total / 1_000_000:.6f}")
+        lines.append(f"{metric}_count {histogram.count}")
+    for name, value in sorted((gauges or {}).items()):
+        if isinstance(value, bool) or not isinstance(value, (int, float)):
+            continue
+        metric = f"{prefix}_{name}"
+        lines += [f"# TYPE {metric} gauge", f"{metric} {value}"]
+    return "\n".join(lines) + "\n"
@@ -2,14 +2,21 @@ from __future__ import annotations
 
 import json
 import threading
+import time
 from pathlib import Path
-from typing import Any, Dict, Optional, Protocol
+from typing import Any, Dict, Iterable, List, NamedTuple, Optional, Protocol, Tuple
 
-from .hashing import compute_hash
+from .changefeed import DEFAULT_BATCH_LIMIT, Change, InMemoryChangeFeed
+from .hashing import compute_hash, get_hash_algorithm, is_current_digest
 
 
 class OriginStore(Protocol):
-    """Interface that canonical data sources must implement."""
+    """
+    Interface that canonical data sources must implement.  Stores may also
+    expose a ``change_feed`` (see :mod:`redsnano.changefeed`) announcing the
+    keys that change, which lets a cache invalidate them without validating
+    every hit.
+    """
 
     def fetch_value(self, key: str) -> Any | None:  # pragma: no cover - protocol
         ...
@@ -18,49 +25,230 @@ class OriginStore(Protocol):
         ...
 
 
+class BatchOriginStore(OriginStore, Protocol):
+    """
+    Origin stores that can answer many keys in one round trip.  Keys that do
+    not exist are left out of the returned mappings.
+    """
+
+    def fetch_values(self, keys: Iterable[str]) -> Dict[str, Any]:  # pragma: no cover - protocol
+        ...
+
+    def fetch_hashes(self, keys: Iterable[str]) -> Dict[str, str]:  # pragma: no cover - protocol
+        ...
+
+
+def fetch_values(store: OriginStore, keys: Iterable[str]) -> Dict[str, Any]:
+    """Fetch several values, using ``store.fetch_values`` when available."""
+    batch = getattr(store, "fetch_values", None)
+    if callable(batch):
+        return batch(keys)
+    values = {}
+    for key in keys:
+        value = store.fetch_value(key)
+        if value is not None:
+            values[key] = value
+    return values
+
+
+def fetch_hashes(store: OriginStore, keys: Iterable[str]) -> Dict[str, str]:
+    """Fetch several hashes, using ``store.fetch_hashes`` when available."""
+    batch = getattr(store, "fetch_hashes", None)
+    if callable(batch):
+        return batch(keys)
+    hashes = {}
+    for key in keys:
+        digest = store.fetch_hash(key)
+        if digest is not None:
+            hashes[key] = digest
+    return hashes
+
+
 class DictionaryOriginStore:
     """
-    Simple in-memory origin store useful for demos and tests.
+    Simple in-memory origin store useful for demos and tests.  Every
+    :meth:`update` is announced on :attr:`change_feed`.
     """
 
     def __init__(self, seed: Optional[Dict[str, Any]] = None):
         self._data: Dict[str, Any] = seed.copy() if seed else {}
+        self._hashes: Dict[str, str] = {}
         self._lock = threading.RLock()
+        self.change_feed = InMemoryChangeFeed()
 
     def update(self, key: str, value: Any) -> None:
         with self._lock:
             self._data[key] = value
+            self._hashes.pop(key, None)
+            self.change_feed.publish([key])
 
     def fetch_value(self, key: str) -> Any | None:
         with self._lock:
             return self._data.get(key)
 
     def fetch_hash(self, key: str) -> str | None:
-        value = self.fetch_value(key)
-        return compute_hash(value) if value is not None else None
+        with self._lock:
+            digest = self._hashes.get(key)
+            if digest is not None and is_current_digest(digest):
+                return digest
+            value = self._data.get(key)
+            if value is None:
+                return None
+            digest = self._hashes[key] = compute_hash(value)
+            return digest
+
+    def fetch_values(self, keys: Iterable[str]) -> Dict[str, Any]:
+        with self._lock:
+            return {
+                key: self._data[key]
+                for key in keys
+                if self._data.get(key) is not None
+            }
+
+    def fetch_hashes(self, keys: Iterable[str]) -> Dict[str, str]:
+        hashes = {}
+        for key in keys:
+            digest = self.fetch_hash(key)
+            if digest is not None:
+                hashes[key] = digest
+        return hashes
+
+
+class _JSONFileIndex(NamedTuple):
+    signature: Tuple[int, int, int] | None
+    algorithm: str
+    values: Dict[str, Any]
+    hashes: Dict[str, str]
+
+
+def _changed_keys(old: _JSONFileIndex, new: _JSONFileIndex) -> List[str]:
+    if old.algorithm == new.algorithm:
+        before, after = old.hashes, new.hashes
+    else:
+        before, after = old.values, new.values
+    return [
+        key
+        for key in before.keys() | after.keys()
+        if before.get(key) != after.get(key)
+    ]
+
+
+class _JSONFileChangeFeed:
+    # Reading the feed checks the file like a lookup does, so a cache that
+    # only polls the feed still notices edits.
+    def __init__(self, store: JSONFileOriginStore):
+        self._store = store
+
+    def latest_seq(self) -> int:
+        self._store._current()
+        return self._store._changes.latest_seq()
+
+    def changes_since(self, seq: int, limit: int = DEFAULT_BATCH_LIMIT) -> List[Change]:
+        self._store._current()
+        return self._store._changes.changes_since(seq, limit)
 
 
 class JSONFileOriginStore:
     """
     Origin backed by a JSON file, ideal for lightweight demos.
+
+    The parsed file is kept in memory together with a precomputed hash per
+    key, so lookups are dictionary reads.  At most every ``check_interval``
+    seconds a lookup compares the file's mtime, size and inode with the
+    loaded version; when they differ the file is re-parsed (in a background
+    thread when ``background_reload`` is set, serving the previous contents
+    meanwhile) and the new index is swapped in atomically.  Keys whose
+    contents differ between the two versions are announced on
+    :attr:`change_feed`.
     """
 
-    def __init__(self, path: str | Path):
+    def __init__(
+        self,
+        path: str | Path,
+        *,
+        check_interval: float = 0.0,
+        background_reload: bool = True,
+    ):
         self.path = Path(path)
         if not self.path.exists():
             self.path.write_text("{}", encoding="utf-8")
+        self.check_interval = check_interval
+        self.background_reload = background_reload
         self._lock = threading.RLock()
-
-    def _load(self) -> Dict[str, Any]:
-        with self._lock:
+        self._reload_lock = threading.Lock()
+        self._reload_thread: threading.Thread | None = None
+        self._next_check = 0.0
+        self._index = _JSONFileIndex(None, get_hash_algorithm(), {}, {})
+        self._changes = InMemoryChangeFeed()
+        self.change_feed = _JSONFileChangeFeed(self)
+        self.reload()
+
+    def reload(self) -> None:
+        """Re-parse the file now and swap in the new index."""
+        with self._reload_lock:
+            signature = self._signature()
+            algorithm = get_hash_algorithm()
             content = self.path.read_text(encoding="utf-8") or "{}"
-            return json.loads(content)
+            values = json.loads(content)
+            hashes = {
+                key: compute_hash(value)
+                for key, value in values.items()
+                if value is not None
+            }
+            previous = self._index
+            self._index = _JSONFileIndex(signature, algorithm, values, hashes)
+            if previous.signature is not None:
+                self._changes.publish(_changed_keys(previous, self._index))
+
+    def _signature(self) -> Tuple[int, int, int] | None:
+        try:
+            stat = self.path.stat()
+        except FileNotFoundError:
+            return None
+        return (stat.st_mtime_ns, stat.st_size, stat.st_ino)
+
+    def _current(self) -> _JSONFileIndex:
+        index = self._index
+        now = time.monotonic()
+        if now < self._next_check:
+            return index
+        self._next_check = now + self.check_interval
+        if index.algorithm != get_hash_algorithm():
+            self.reload()
+            return self._index
+        if self._signature() == index.signature:
+            return index
+        if not self.background_reload:
+            self.reload()
+            return self._index
+        with self._lock:
+            if self._reload_thread is None or not self._reload_thread.is_alive():
+                self._reload_thread = threading.Thread(
+                    target=self._reload_quietly,
+                    name="redsnano-json-origin",
+                    daemon=True,
+                )
+                self._reload_thread.start()
+        return index
+
+    def _reload_quietly(self) -> None:
+        try:
+            self.reload()
+        except (OSError, ValueError):
+            # Most likely a writer is midway through replacing the file; keep
+            # serving the previous index and retry on the next check.
+            pass
 
     def fetch_value(self, key: str) -> Any | None:
-        data = self._load()
-        return data.get(key)
+        return self._current().values.get(key)
 
     def fetch_hash(self, key: str) -> str | None:
-        value = self.fetch_value(key)
-        return compute_hash(value) if value is not None else None
+        return self._current().hashes.get(key)
+
+    def fetch_values(self, keys: Iterable[str]) -> Dict[str, Any]:
+        values = self._current().values
+        return {key: values[key] for key in keys if values.get(key) is not None}
 
+    def fetch_hashes(self, keys: Iterable[str]) -> Dict[str, str]:
+        hashes = self._current().hashes
+        return {key: hashes[key] for key in keys if key in hashes}
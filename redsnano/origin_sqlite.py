@@ -2,76 +2,440 @@ from __future__ import annotations
 
 import sqlite3
 import threading
+import time
+import weakref
+from contextlib import contextmanager
 from dataclasses import dataclass
 from pathlib import Path
-from typing import Any, Dict
+from typing import Any, Dict, Iterable, Iterator, List, Optional
 
-from .hashing import compute_hash
+from .changefeed import DEFAULT_BATCH_LIMIT, Change
+from .hashing import compute_hash, is_current_digest
+from .metrics import Metrics
 from .origin import OriginStore
 
 
+# Stay well below SQLite's limit on bound parameters per statement.
+_MAX_BATCH_PARAMS = 500
+
+_UPSERT_SQL = """
+    INSERT INTO users(username, email, content_hash)
+    VALUES(:username, :email, :content_hash)
+    ON CONFLICT(username) DO UPDATE SET
+        email=excluded.email,
+        content_hash=excluded.content_hash
+"""
+
+
+class _ThreadAnchor:
+    # Held only by a thread's local storage, so it is collected, and its
+    # finalizer closes the thread's connection, when the thread ends.
+    __slots__ = ("__weakref__",)
+
+
+class SQLiteConnectionPool:
+    """
+    One long-lived connection per thread, opened in WAL mode so readers do
+    not block each other or the writer, and closed when its thread ends.
+    Python's sqlite3 keeps up to ``cached_statements`` prepared statements
+    per connection, so repeated queries skip parsing as well as connection
+    setup.
+    """
+
+    PRAGMAS = (
+        "PRAGMA synchronous=NORMAL",
+        "PRAGMA busy_timeout=5000",
+        "PRAGMA cache_size=-8000",
+        "PRAGMA temp_store=MEMORY",
+        "PRAGMA mmap_size=67108864",
+    )
+
+    def __init__(self, db_path: str | Path, *, cached_statements: int = 256):
+        self.db_path = Path(db_path)
+        self.cached_statements = cached_statements
+        self._local = threading.local()
+        self._lock = threading.Lock()
+        self._connections: List[sqlite3.Connection] = []
+        self._closed = False
+
+    def connection(self) -> sqlite3.Connection:
+        """
+        Return the calling thread's connection.  Use it as a context manager
+        to commit (or roll back) a transaction; it is never closed by that.
+        """
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            conn = self._open()
+            anchor = _ThreadAnchor()
+            weakref.finalize(anchor, self._release, conn)
+            self._local.conn = conn
+            self._local.anchor = anchor
+        return conn
+
+    def __len__(self) -> int:
+        """Number of open connections."""
+        with self._lock:
+            return len(self._connections)
+
+    def close(self) -> None:
+        with self._lock:
+            self._closed = True
+            connections, self._connections = self._connections, []
+        for conn in connections:
+            conn.close()
+
+    def _open(self) -> sqlite3.Connection:
+        with self._lock:
+            if self._closed:
+                raise sqlite3.ProgrammingError("Connection pool is closed")
+        conn = sqlite3.connect(
+            self.db_path,
+            check_same_thread=False,
+            cached_statements=self.cached_statements,
+        )
+        conn.execute("PRAGMA journal_mode=WAL")
+        for pragma in self.PRAGMAS:
+            conn.execute(pragma)
+        with self._lock:
+            self._connections.append(conn)
+        return conn
+
+    def _release(self, conn: sqlite3.Connection) -> None:
+        with self._lock:
+            if conn in self._connections:
+                self._connections.remove(conn)
+        conn.close()
+
+
 def _dict_from_row(row) -> Dict[str, Any] | None:
     if not row:
         return None
     return {"username": row[0], "email": row[1]}
 
 
+def _current_hash(row) -> str:
+    # Rows written outside SQLiteUserRepository since the store was opened
+    # have their hash cleared by the change-tracking trigger, and rows hashed
+    # with another algorithm are stale.  Both are hashed here without being
+    # written back, so lookups stay read-only; the next open backfills them.
+    username, email, stored = row
+    if stored is not None and is_current_digest(stored):
+        return stored
+    return compute_hash({"username": username, "email": email})
+
+
+class SQLiteChangeFeed:
+    """
+    Change feed over the ``users_changelog`` table, which triggers on
+    ``users`` fill for every insert, payload update and delete, whoever the
+    writer is.  The table keeps at most the store's ``max_changes`` entries,
+    trimmed as they are written, and entries older than ``retention``
+    seconds are trimmed while reading; readers that fall that far behind see
+    a sequence gap.
+    """
+
+    def __init__(self, pool: SQLiteConnectionPool, *, retention: float = 3600.0):
+        self.pool = pool
+        self.retention = retention
+        self._next_trim = 0.0
+
+    def latest_seq(self) -> int:
+        with self.pool.connection() as conn:
+            row = conn.execute(
+                "SELECT seq FROM sqlite_sequence WHERE name='users_changelog'"
+            ).fetchone()
+        return row[0] if row else 0
+
+    def changes_since(self, seq: int, limit: int = DEFAULT_BATCH_LIMIT) -> List[Change]:
+        self._maybe_trim()
+        with self.pool.connection() as conn:
+            rows = conn.execute(
+                "SELECT seq, username, changed_at FROM users_changelog "
+                "WHERE seq > ? ORDER BY seq LIMIT ?",
+                (seq, limit),
+            ).fetchall()
+        return [Change(*row) for row in rows]
+
+    def trim(self, older_than: float) -> int:
+        """Delete changes recorded before the ``older_than`` timestamp."""
+        with self.pool.connection() as conn:
+            cursor = conn.execute(
+                "DELETE FROM users_changelog WHERE changed_at < ?", (older_than,)
+            )
+        return cursor.rowcount
+
+    def _maybe_trim(self) -> None:
+        now = time.time()
+        if now < self._next_trim:
+            return
+        self._next_trim = now + min(60.0, self.retention / 10)
+        self.trim(now - self.retention)
+
+
 class SQLiteUserOriginStore(OriginStore):
-    """Origin store backed by a SQLite table named ``users``."""
+    """
+    Origin store backed by a SQLite table named ``users``.
+
+    Each row carries its precomputed ``content_hash`` and a ``version`` that
+    a trigger bumps on every change, so ``fetch_hash`` is a covering-index
+    lookup instead of a full row fetch plus re-hash.  Queries run on
+    per-thread pooled connections and are not serialized by a store lock.
+    Changed usernames are published on :attr:`change_feed`.  Once a cache
+    attaches its :class:`~redsnano.metrics.Metrics`, query counts and
+    latencies are recorded as ``sqlite_queries`` / ``sqlite_query``.
+    The changelog behind the feed keeps the last ``max_changes`` entries
+    whether or not anything reads it.
+    """
 
-    def __init__(self, db_path: str | Path):
+    def __init__(
+        self,
+        db_path: str | Path,
+        *,
+        pool: Optional[SQLiteConnectionPool] = None,
+        max_changes: int = 100_000,
+    ):
         self.db_path = Path(db_path)
-        self._lock = threading.RLock()
+        self.db_path.parent.mkdir(parents=True, exist_ok=True)
+        self.pool = pool or SQLiteConnectionPool(self.db_path)
+        self.max_changes = max_changes
         self._ensure_schema()
+        self.change_feed = SQLiteChangeFeed(self.pool)
+        self.metrics: Optional[Metrics] = None
+
+    def attach_metrics(self, metrics: Metrics) -> None:
+        self.metrics = metrics
+
+    @contextmanager
+    def _query(self) -> Iterator[sqlite3.Connection]:
+        started = time.perf_counter()
+        with self.pool.connection() as conn:
+            yield conn
+        if self.metrics is not None:
+            self.metrics.incr("sqlite_queries")
+            self.metrics.observe("sqlite_query", time.perf_counter() - started)
+
+    def close(self) -> None:
+        self.pool.close()
 
     def fetch_value(self, key: str):
-        with self._lock, sqlite3.connect(self.db_path) as conn:
+        with self._query() as conn:
             row = conn.execute(
                 "SELECT username, email FROM users WHERE username=?", (key,)
             ).fetchone()
         return _dict_from_row(row)
 
     def fetch_hash(self, key: str):
-        value = self.fetch_value(key)
-        return compute_hash(value) if value else None
+        with self._query() as conn:
+            row = conn.execute(
+                "SELECT username, email, content_hash FROM users WHERE username=?",
+                (key,),
+            ).fetchone()
+            return _current_hash(row) if row else None
+
+    def fetch_version(self, key: str) -> int | None:
+        with self._query() as conn:
+            row = conn.execute(
+                "SELECT version FROM users WHERE username=?", (key,)
+            ).fetchone()
+        return row[0] if row else None
+
+    def fetch_values(self, keys: Iterable[str]) -> Dict[str, Dict[str, Any]]:
+        keys = list(dict.fromkeys(keys))
+        values: Dict[str, Dict[str, Any]] = {}
+        with self._query() as conn:
+            for start in range(0, len(keys), _MAX_BATCH_PARAMS):
+                chunk = keys[start : start + _MAX_BATCH_PARAMS]
+                placeholders = ",".join("?" * len(chunk))
+                rows = conn.execute(
+                    "SELECT username, email FROM users "
+                    f"WHERE username IN ({placeholders})",
+                    chunk,
+                ).fetchall()
+                for row in rows:
+                    values[row[0]] = _dict_from_row(row)
+        return values
+
+    def fetch_hashes(self, keys: Iterable[str]) -> Dict[str, str]:
+        keys = list(dict.fromkeys(keys))
+        hashes: Dict[str, str] = {}
+        with self._query() as conn:
+            for start in range(0, len(keys), _MAX_BATCH_PARAMS):
+                chunk = keys[start : start + _MAX_BATCH_PARAMS]
+                placeholders = ",".join("?" * len(chunk))
+                rows = conn.execute(
+                    "SELECT username, email, content_hash FROM users "
+                    f"WHERE username IN ({placeholders})",
+                    chunk,
+                ).fetchall()
+                for row in rows:
+                    hashes[row[0]] = _current_hash(row)
+        return hashes
 
     def _ensure_schema(self) -> None:
-        self.db_path.parent.mkdir(parents=True, exist_ok=True)
-        with sqlite3.connect(self.db_path) as conn:
+        with self.pool.connection() as conn:
             conn.execute(
                 """
                 CREATE TABLE IF NOT EXISTS users (
                     id INTEGER PRIMARY KEY AUTOINCREMENT,
                     username TEXT UNIQUE,
-                    email TEXT NOT NULL
+                    email TEXT NOT NULL,
+                    content_hash TEXT,
+                    version INTEGER NOT NULL DEFAULT 1
+                )
+                """
+            )
+            columns = {row[1] for row in conn.execute("PRAGMA table_info(users)")}
+            if "content_hash" not in columns:
+                conn.execute("ALTER TABLE users ADD COLUMN content_hash TEXT")
+            if "version" not in columns:
+                conn.execute(
+                    "ALTER TABLE users ADD COLUMN version INTEGER NOT NULL DEFAULT 1"
                 )
+            conn.execute(
+                """
+                CREATE INDEX IF NOT EXISTS users_username_hash
+                ON users(username, content_hash)
+                """
+            )
+            # Any change to the payload bumps the version; writers that do not
+            # supply a new content_hash get it cleared so it is recomputed.
+            conn.execute(
+                """
+                CREATE TRIGGER IF NOT EXISTS users_track_changes
+                AFTER UPDATE OF username, email ON users
+                WHEN NEW.username IS NOT OLD.username OR NEW.email IS NOT OLD.email
+                BEGIN
+                    UPDATE users SET
+                        version = OLD.version + 1,
+                        content_hash = CASE
+                            WHEN NEW.content_hash IS OLD.content_hash THEN NULL
+                            ELSE NEW.content_hash
+                        END
+                    WHERE id = NEW.id;
+                END
                 """
             )
-            conn.commit()
+            self._ensure_changelog(conn, self.max_changes)
+            self._backfill_hashes(conn)
+
+    @staticmethod
+    def _backfill_hashes(conn: sqlite3.Connection) -> None:
+        # Hash rows that lack a current digest once, here, rather than
+        # taking the write lock from the read path.
+        conn.create_function(
+            "is_current_digest", 1, is_current_digest, deterministic=True
+        )
+        rows = conn.execute(
+            "SELECT username, email FROM users WHERE username IS NOT NULL "
+            "AND (content_hash IS NULL OR NOT is_current_digest(content_hash))"
+        ).fetchall()
+        if rows:
+            conn.executemany(
+                "UPDATE users SET content_hash=? WHERE username=?",
+                [
+                    (compute_hash({"username": username, "email": email}), username)
+                    for username, email in rows
+                ],
+            )
+
+    @staticmethod
+    def _ensure_changelog(conn: sqlite3.Connection, max_changes: int) -> None:
+        conn.execute(
+            """
+            CREATE TABLE IF NOT EXISTS users_changelog (
+                seq INTEGER PRIMARY KEY AUTOINCREMENT,
+                username TEXT NOT NULL,
+                changed_at REAL NOT NULL
+                    DEFAULT ((julianday('now') - 2440587.5) * 86400.0)
+            )
+            """
+        )
+        conn.execute(
+            """
+            CREATE INDEX IF NOT EXISTS users_changelog_changed_at
+            ON users_changelog(changed_at)
+            """
+        )
+        conn.execute(
+            """
+            CREATE TRIGGER IF NOT EXISTS users_log_insert
+            AFTER INSERT ON users WHEN NEW.username IS NOT NULL
+            BEGIN
+                INSERT INTO users_changelog(username) VALUES (NEW.username);
+            END
+            """
+        )
+        conn.execute(
+            """
+            CREATE TRIGGER IF NOT EXISTS users_log_update
+            AFTER UPDATE OF username, email ON users
+            WHEN NEW.username IS NOT OLD.username OR NEW.email IS NOT OLD.email
+            BEGIN
+                INSERT INTO users_changelog(username)
+                SELECT OLD.username WHERE OLD.username IS NOT NULL;
+                INSERT INTO users_changelog(username)
+                SELECT NEW.username
+                WHERE NEW.username IS NOT NULL AND NEW.username IS NOT OLD.username;
+            END
+            """
+        )
+        conn.execute(
+            """
+            CREATE TRIGGER IF NOT EXISTS users_log_delete
+            AFTER DELETE ON users WHEN OLD.username IS NOT NULL
+            BEGIN
+                INSERT INTO users_changelog(username) VALUES (OLD.username);
+            END
+            """
+        )
+        # Trimmed on write so the log stays bounded without a reader.  The
+        # cap is baked into the trigger, which is only replaced when opened
+        # with a different one, so opening an up-to-date database writes
+        # nothing.
+        trigger = f"""users_changelog_cap
+            AFTER INSERT ON users_changelog
+            BEGIN
+                DELETE FROM users_changelog WHERE seq <= NEW.seq - {int(max_changes)};
+            END"""
+        row = conn.execute(
+            "SELECT sql FROM sqlite_master "
+            "WHERE type='trigger' AND name='users_changelog_cap'"
+        ).fetchone()
+        if row is not None and row[0] != f"CREATE TRIGGER {trigger}":
+            conn.execute("DROP TRIGGER users_changelog_cap")
+        conn.execute(f"CREATE TRIGGER IF NOT EXISTS {trigger}")
 
 
 @dataclass
 class SQLiteUserRepository:
-    """Simple repository used by the FastAPI layer to mutate data."""
+    """
+    Simple repository used by the FastAPI layer to mutate data.  Pass the
+    origin ``store`` the cache reads from to share its connection pool.
+    """
 
     db_path: Path
+    store: Optional[SQLiteUserOriginStore] = None
 
     def __post_init__(self):
-        self.store = SQLiteUserOriginStore(self.db_path)
+        if self.store is None:
+            self.store = SQLiteUserOriginStore(self.db_path)
 
     def upsert_user(self, username: str, email: str) -> Dict[str, Any]:
-        payload = {"username": username, "email": email}
-        with sqlite3.connect(self.db_path) as conn:
-            conn.execute(
-                """
-                INSERT INTO users(username, email)
-                VALUES(?, ?)
-                ON CONFLICT(username) DO UPDATE SET email=excluded.email
-                """,
-                (username, email),
+        return self.upsert_users([{"username": username, "email": email}])[0]
+
+    def upsert_users(self, users: Iterable[Dict[str, str]]) -> List[Dict[str, Any]]:
+        payloads = [
+            {"username": user["username"], "email": user["email"]} for user in users
+        ]
+        with self.store.pool.connection() as conn:
+            conn.executemany(
+                _UPSERT_SQL,
+                [
+                    {**payload, "content_hash": compute_hash(payload)}
+                    for payload in payloads
+                ],
             )
-            conn.commit()
-        return payload
+        return payloads
 
     def get_user(self, username: str) -> Dict[str, Any] | None:
         return self.store.fetch_value(username)
@@ -1,10 +1,46 @@
 from __future__ import annotations
 
 import json
+import logging
+import math
+import mmap
+import os
+import struct
+import threading
+import zlib
 from pathlib import Path
-from typing import Dict
+from typing import Callable, Dict, Iterator, Optional, Protocol, Tuple
 
 from .cache_types import CacheEntrySerialized
+from .hashing import canonical_json, json_default
+
+logger = logging.getLogger(__name__)
+
+FSYNC_ALWAYS = "always"
+FSYNC_EVERYSEC = "everysec"
+FSYNC_NO = "no"
+FSYNC_POLICIES = (FSYNC_ALWAYS, FSYNC_EVERYSEC, FSYNC_NO)
+
+SnapshotSource = Callable[[], Dict[str, CacheEntrySerialized]]
+
+
+class Persistence(Protocol):
+    """
+    Interface that cache persistence backends must implement.
+
+    Backends may additionally provide ``record_set(key, entry)`` and
+    ``record_delete(key)``; the cache then reports each mutation instead of
+    calling ``save`` with the full contents.  ``attach(source)`` hands the
+    backend a callable returning a consistent snapshot of the cache,
+    ``iter_load()`` streams entries at startup instead of materialising the
+    whole mapping, and ``close()`` releases files and background threads.
+    """
+
+    def load(self) -> Dict[str, CacheEntrySerialized]:  # pragma: no cover - protocol
+        ...
+
+    def save(self, data: Dict[str, CacheEntrySerialized]) -> None:  # pragma: no cover - protocol
+        ...
 
 
 class JSONPersistence:
@@ -22,5 +58,397 @@ class JSONPersistence:
         return json.loads(content) if content else {}
 
     def save(self, data: Dict[str, CacheEntrySerialized]) -> None:
-        self.path.write_text(json.dumps(data, indent=2), encoding="utf-8")
+        text = json.dumps(data, indent=2, default=json_default)
+        self.path.write_text(text, encoding="utf-8")
+
+
+class AppendOnlyPersistence:
+    """
+    Append-only log of cache mutations.
+
+    Every ``set``/``delete`` appends one compact JSON line, so the cost of a
+    write does not depend on how many keys are cached.  The log is replayed
+    on ``load`` and rewritten in the background once it has grown by
+    ``rewrite_percentage`` percent since the last rewrite (and is at least
+    ``rewrite_min_size`` bytes), mirroring Redis' ``auto-aof-rewrite``.
+
+    ``fsync`` controls durability: ``"always"`` syncs after every record,
+    ``"everysec"`` syncs from a background thread once per second and
+    ``"no"`` leaves flushing to the operating system.
+    """
+
+    def __init__(
+        self,
+        path: str | Path,
+        *,
+        fsync: str = FSYNC_EVERYSEC,
+        rewrite_min_size: int = 1 << 20,
+        rewrite_percentage: int = 100,
+    ):
+        if fsync not in FSYNC_POLICIES:
+            raise ValueError(
+                f"Unknown fsync policy {fsync!r}; expected one of {FSYNC_POLICIES}"
+            )
+        self.path = Path(path)
+        self.fsync = fsync
+        self.rewrite_min_size = rewrite_min_size
+        self.rewrite_percentage = rewrite_percentage
+        self._lock = threading.Lock()
+        self._file = None
+        self._size = 0
+        self._base_size = 0
+        self._dirty = False
+        self._source: Optional[SnapshotSource] = None
+        self._rewrite_buffer: list[bytes] | None = None
+        self._rewrite_thread: threading.Thread | None = None
+        self._stop = threading.Event()
+        self._fsync_thread: threading.Thread | None = None
+        if fsync == FSYNC_EVERYSEC:
+            self._fsync_thread = threading.Thread(
+                target=self._fsync_loop, name="redsnano-aof-fsync", daemon=True
+            )
+            self._fsync_thread.start()
+
+    def attach(self, source: SnapshotSource) -> None:
+        self._source = source
+
+    def load(self) -> Dict[str, CacheEntrySerialized]:
+        data: Dict[str, CacheEntrySerialized] = {}
+        if not self.path.exists():
+            return data
+        valid_size = 0
+        with self.path.open("rb") as fh:
+            for line in fh:
+                if not line.endswith(b"\n"):
+                    break
+                try:
+                    op, key, *rest = json.loads(line)
+                except ValueError:
+                    break
+                if op == "set":
+                    data[key] = rest[0]
+                elif op == "del":
+                    data.pop(key, None)
+                valid_size += len(line)
+        with self._lock:
+            if valid_size != self.path.stat().st_size:
+                # Drop a torn record left behind by a crash mid-append so new
+                # records are not written after garbage.
+                os.truncate(self.path, valid_size)
+            self._size = self._base_size = valid_size
+        return data
+
+    def save(self, data: Dict[str, CacheEntrySerialized]) -> None:
+        tmp_path = self._write_rewrite_file(data)
+        with self._lock:
+            self._swap_in(tmp_path, [])
+
+    def record_set(self, key: str, entry: CacheEntrySerialized) -> None:
+        self._append(self._encode("set", key, entry))
+
+    def record_delete(self, key: str) -> None:
+        self._append(self._encode("del", key))
+
+    def rewrite_in_background(self) -> bool:
+        """Start compacting the log from a fresh snapshot; False if not possible."""
+        with self._lock:
+            if self._source is None or self._rewrite_buffer is not None:
+                return False
+            self._rewrite_buffer = []
+            self._rewrite_thread = threading.Thread(
+                target=self._rewrite, name="redsnano-aof-rewrite", daemon=True
+            )
+            self._rewrite_thread.start()
+            return True
+
+    def close(self) -> None:
+        self._stop.set()
+        if self._fsync_thread is not None:
+            self._fsync_thread.join()
+        rewrite_thread = self._rewrite_thread
+        if rewrite_thread is not None:
+            rewrite_thread.join()
+        with self._lock:
+            if self._file is not None:
+                if self.fsync != FSYNC_NO:
+                    os.fsync(self._file.fileno())
+                self._file.close()
+                self._file = None
+
+    @staticmethod
+    def _encode(op: str, key: str, *payload) -> bytes:
+        record = json.dumps(
+            [op, key, *payload], separators=(",", ":"), default=json_default
+        )
+        return (record + "\n").encode("utf-8")
+
+    def _append(self, record: bytes) -> None:
+        with self._lock:
+            if self._file is None:
+                self._file = self.path.open("ab", buffering=0)
+            self._file.write(record)
+            self._size += len(record)
+            if self._rewrite_buffer is not None:
+                self._rewrite_buffer.append(record)
+            if self.fsync == FSYNC_ALWAYS:
+                os.fsync(self._file.fileno())
+            else:
+                self._dirty = True
+            should_rewrite = self._should_rewrite()
+        if should_rewrite:
+            self.rewrite_in_background()
+
+    def _should_rewrite(self) -> bool:
+        if self._source is None or self._rewrite_buffer is not None:
+            return False
+        if self._size < self.rewrite_min_size:
+            return False
+        return self._size >= self._base_size * (1 + self.rewrite_percentage / 100)
+
+    def _rewrite(self) -> None:
+        try:
+            assert self._source is not None
+            tmp_path = self._write_rewrite_file(self._source())
+            with self._lock:
+                self._swap_in(tmp_path, self._rewrite_buffer or [])
+        finally:
+            with self._lock:
+                self._rewrite_buffer = None
+
+    def _write_rewrite_file(self, data: Dict[str, CacheEntrySerialized]) -> Path:
+        tmp_path = self.path.with_name(self.path.name + ".rewrite")
+        with tmp_path.open("wb") as fh:
+            for key, entry in data.items():
+                fh.write(self._encode("set", key, entry))
+            fh.flush()
+            os.fsync(fh.fileno())
+        return tmp_path
+
+    def _swap_in(self, tmp_path: Path, pending: list[bytes]) -> None:
+        # Records appended while the rewrite was running are replayed on top
+        # of the snapshot; set/delete are last-writer-wins per key, so
+        # records already reflected in the snapshot are harmless.
+        if pending:
+            with tmp_path.open("ab") as fh:
+                fh.writelines(pending)
+                fh.flush()
+                os.fsync(fh.fileno())
+        if self._file is not None:
+            self._file.close()
+            self._file = None
+        os.replace(tmp_path, self.path)
+        self._size = self._base_size = self.path.stat().st_size
+        self._dirty = False
+
+    def _fsync_loop(self) -> None:
+        while not self._stop.wait(1.0):
+            with self._lock:
+                if not self._dirty or self._file is None:
+                    continue
+                fd = os.dup(self._file.fileno())
+                self._dirty = False
+            try:
+                os.fsync(fd)
+            finally:
+                os.close(fd)
+
+
+class SnapshotPersistence:
+    """
+    Compact binary snapshots written periodically from a background thread.
+
+    Mutations only bump a change counter; every ``interval`` seconds, if at
+    least ``min_changes`` mutations happened (like Redis' ``save`` rules), a
+    consistent view of the cache is written to a temporary file and swapped
+    in atomically.  Records are length-prefixed, digests are stored as raw
+    bytes and values of at least ``compress_threshold`` bytes are
+    zlib-compressed when ``compress`` is enabled.  Values are stored in the
+    canonical JSON form hashes are computed over (sets as sorted lists,
+    dates as ISO strings); keys whose values have none are left out.
+    Loading memory-maps the file and yields entries one at a time.
+    """
+
+    MAGIC = b"RSNP"
+    VERSION = 1
+    _FILE_HEADER = struct.Struct("<4sB")
+    # key length, value length, extras length, expire_at, digest length, flags
+    _RECORD_HEADER = struct.Struct("<IIIdBB")
+    _FLAG_COMPRESSED = 0x01
+    _FLAG_HEX_DIGEST = 0x02
+    _END_OF_FILE = 0xFFFFFFFF
+    _BASE_FIELDS = ("value", "hash", "expire_at")
+
+    def __init__(
+        self,
+        path: str | Path,
+        *,
+        interval: float = 60.0,
+        min_changes: int = 1,
+        compress: bool = False,
+        compress_threshold: int = 256,
+    ):
+        self.path = Path(path)
+        self.interval = interval
+        self.min_changes = min_changes
+        self.compress = compress
+        self.compress_threshold = compress_threshold
+        self._lock = threading.Lock()
+        self._save_lock = threading.Lock()
+        self._changes = 0
+        self._source: Optional[SnapshotSource] = None
+        self._stop = threading.Event()
+        self._thread: threading.Thread | None = None
+
+    def attach(self, source: SnapshotSource) -> None:
+        self._source = source
+        if self._thread is None and self.interval > 0:
+            self._thread = threading.Thread(
+                target=self._snapshot_loop, name="redsnano-snapshot", daemon=True
+            )
+            self._thread.start()
+
+    def load(self) -> Dict[str, CacheEntrySerialized]:
+        return dict(self.iter_load())
+
+    def iter_load(self) -> Iterator[Tuple[str, CacheEntrySerialized]]:
+        if not self.path.exists() or self.path.stat().st_size == 0:
+            return
+        with self.path.open("rb") as fh, mmap.mmap(
+            fh.fileno(), 0, access=mmap.ACCESS_READ
+        ) as mapped:
+            view = memoryview(mapped)
+            try:
+                yield from self._iter_records(view)
+            finally:
+                view.release()
+
+    def save(self, data: Dict[str, CacheEntrySerialized]) -> None:
+        with self._save_lock:
+            tmp_path = self.path.with_name(self.path.name + ".tmp")
+            with tmp_path.open("wb") as fh:
+                fh.write(self._FILE_HEADER.pack(self.MAGIC, self.VERSION))
+                for key, entry in data.items():
+                    record = self._encode_record(key, entry)
+                    if record is None:
+                        logger.warning("Not snapshotting %r: no JSON form", key)
+                        continue
+                    fh.write(record)
+                fh.write(struct.pack("<I", self._END_OF_FILE))
+                fh.flush()
+                os.fsync(fh.fileno())
+            os.replace(tmp_path, self.path)
+
+    def record_set(self, key: str, entry: CacheEntrySerialized) -> None:
+        with self._lock:
+            self._changes += 1
+
+    def record_delete(self, key: str) -> None:
+        with self._lock:
+            self._changes += 1
+
+    def snapshot(self) -> bool:
+        """Write a snapshot of the attached cache now; False if none is attached."""
+        if self._source is None:
+            return False
+        with self._lock:
+            changes, self._changes = self._changes, 0
+        try:
+            self.save(self._source())
+        except BaseException:
+            with self._lock:
+                self._changes += changes
+            raise
+        return True
+
+    def close(self) -> None:
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join()
+            self._thread = None
+        if self._changes:
+            self.snapshot()
+
+    def _snapshot_loop(self) -> None:
+        while not self._stop.wait(self.interval):
+            if self._changes < self.min_changes:
+                continue
+            try:
+                self.snapshot()
+            except Exception:  # noqa: BLE001 - retried on the next interval
+                logger.exception("Snapshot to %s failed", self.path)
+
+    def _encode_record(self, key: str, entry: CacheEntrySerialized) -> bytes | None:
+        flags = 0
+        key_bytes = key.encode("utf-8")
+        value = canonical_json(entry["value"])
+        if value is None:
+            return None
+        if self.compress and len(value) >= self.compress_threshold:
+            value = zlib.compress(value)
+            flags |= self._FLAG_COMPRESSED
+        digest_text = entry["hash"]
+        try:
+            digest = bytes.fromhex(digest_text)
+        except ValueError:
+            digest = b""
+        if digest and digest.hex() == digest_text and len(digest) < 256:
+            flags |= self._FLAG_HEX_DIGEST
+        else:
+            digest = digest_text.encode("utf-8")
+        extras = {
+            name: field
+            for name, field in entry.items()
+            if name not in self._BASE_FIELDS
+        }
+        extras_bytes = (
+            json.dumps(extras, separators=(",", ":")).encode("utf-8") if extras else b""
+        )
+        expire_at = entry.get("expire_at")
+        header = self._RECORD_HEADER.pack(
+            len(key_bytes),
+            len(value),
+            len(extras_bytes),
+            math.nan if expire_at is None else expire_at,
+            len(digest),
+            flags,
+        )
+        return b"".join((header, key_bytes, digest, value, extras_bytes))
 
+    def _iter_records(
+        self, view: memoryview
+    ) -> Iterator[Tuple[str, CacheEntrySerialized]]:
+        magic, version = self._FILE_HEADER.unpack_from(view, 0)
+        if magic != self.MAGIC or version != self.VERSION:
+            raise ValueError(
+                f"{self.path} is not a redsnano snapshot (version {self.VERSION})"
+            )
+        offset = self._FILE_HEADER.size
+        header_size = self._RECORD_HEADER.size
+        while offset + header_size <= len(view):
+            key_len, value_len, extras_len, expire_at, digest_len, flags = (
+                self._RECORD_HEADER.unpack_from(view, offset)
+            )
+            offset += header_size
+            key = str(view[offset : offset + key_len], "utf-8")
+            offset += key_len
+            digest = view[offset : offset + digest_len]
+            offset += digest_len
+            value = view[offset : offset + value_len]
+            offset += value_len
+            if flags & self._FLAG_COMPRESSED:
+                value = zlib.decompress(value)
+            entry: CacheEntrySerialized = {
+                "value": json.loads(bytes(value)),
+                "hash": (
+                    digest.hex()
+                    if flags & self._FLAG_HEX_DIGEST
+                    else str(digest, "utf-8")
+                ),
+                "expire_at": None if math.isnan(expire_at) else expire_at,
+            }
+            if extras_len:
+                entry.update(json.loads(bytes(view[offset : offset + extras_len])))
+                offset += extras_len
+            yield key, entry
+        if struct.unpack_from("<I", view, offset)[0] != self._END_OF_FILE:
+            raise ValueError(f"Snapshot {self.path} is truncated")
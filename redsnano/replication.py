@@ -0,0 +1,233 @@
+from __future__ import annotations
+
+import http.client
+import itertools
+import threading
+import time
+import uuid
+from collections import deque
+from typing import TYPE_CHECKING, Any, Deque, Dict, Iterable, List, Optional, Tuple
+from urllib.parse import urlencode
+
+from .cache_types import CacheEntrySerialized
+from .client import ClientError, HTTPClient
+
+if TYPE_CHECKING:  # pragma: no cover - import cycle at runtime
+    from .cache import MiniRedis
+
+OP_SET = "set"
+OP_DELETE = "del"
+
+# Mutations kept by the leader for followers catching up by offset.
+DEFAULT_BACKLOG = 100_000
+
+# Mutations sent to a follower per log request.
+DEFAULT_BATCH_LIMIT = 1000
+
+# (op, key, entry) as streamed to followers; ``entry`` is None for deletes.
+Mutation = Tuple[str, str, Optional[CacheEntrySerialized]]
+
+
+class ReplicationLog:
+    """
+    The leader's mutation stream.  Every set (including TTL changes) and
+    delete (including expiry and eviction) gets the next offset; the last
+    ``backlog`` of them are kept so followers can catch up incrementally.
+    ``replid`` changes with every process, so a follower can tell that a
+    restarted leader's offsets mean something else.
+    """
+
+    def __init__(self, backlog: int = DEFAULT_BACKLOG):
+        self.replid = uuid.uuid4().hex
+        self.backlog = backlog
+        self._ops: Deque[Tuple[int, str, str, Optional[CacheEntrySerialized]]] = deque(
+            maxlen=backlog
+        )
+        self._offset = 0
+        self._changed = threading.Condition()
+        self._followers: Dict[str, Tuple[int, float]] = {}
+
+    @property
+    def offset(self) -> int:
+        return self._offset
+
+    def record_sets(self, entries: Iterable[Tuple[str, CacheEntrySerialized]]) -> None:
+        self._extend((OP_SET, key, entry) for key, entry in entries)
+
+    def record_deletes(self, keys: Iterable[str]) -> None:
+        self._extend((OP_DELETE, key, None) for key in keys)
+
+    def since(
+        self, offset: int, limit: int = DEFAULT_BATCH_LIMIT
+    ) -> List[Tuple[int, str, str, Optional[CacheEntrySerialized]]] | None:
+        """
+        Mutations after ``offset`` (at most ``limit``), or None when they are
+        no longer in the backlog and the follower needs a full resync.
+        """
+        with self._changed:
+            if offset > self._offset:
+                return None
+            first = self._ops[0][0] if self._ops else self._offset + 1
+            if offset + 1 < first:
+                return None
+            start = offset + 1 - first
+            return list(itertools.islice(self._ops, start, start + limit))
+
+    def wait(self, offset: int, timeout: float) -> bool:
+        """Block until the log moves past ``offset``; False on timeout."""
+        with self._changed:
+            return self._changed.wait_for(lambda: self._offset > offset, timeout)
+
+    def acknowledge(self, follower: str, offset: int) -> None:
+        """Record how far ``follower`` has read, for :meth:`status`."""
+        with self._changed:
+            self._followers[follower] = (offset, time.time())
+
+    def status(self) -> Dict[str, Any]:
+        with self._changed:
+            followers = {
+                name: {"offset": offset, "lag": self._offset - offset, "seen_at": seen}
+                for name, (offset, seen) in self._followers.items()
+            }
+            return {
+                "role": "leader",
+                "replid": self.replid,
+                "offset": self._offset,
+                "backlog": len(self._ops),
+                "followers": followers,
+            }
+
+    def _extend(self, mutations: Iterable[Mutation]) -> None:
+        with self._changed:
+            for op, key, entry in mutations:
+                self._offset += 1
+                self._ops.append((self._offset, op, key, entry))
+            self._changed.notify_all()
+
+
+class Follower:
+    """
+    Keeps ``cache`` a replica of the leader serving HTTP at ``host:port``.
+
+    The follower starts with a full resync (the leader's snapshot replaces
+    the local contents), then long-polls the leader's log for mutations
+    after its offset, waiting up to ``poll_timeout`` seconds per request.
+    When the leader restarted or the offset fell out of its backlog, it
+    resyncs again; when the leader is unreachable it retries every
+    ``retry_interval`` seconds and keeps serving what it has.
+
+    Expiry times are absolute, so leader and follower clocks should agree.
+    ``forward_writes`` lets an HTTP front end pass writes on to the leader
+    instead of rejecting them.
+    """
+
+    def __init__(
+        self,
+        cache: "MiniRedis",
+        host: str,
+        port: int,
+        *,
+        forward_writes: bool = False,
+        poll_timeout: float = 1.0,
+        retry_interval: float = 1.0,
+        batch_limit: int = DEFAULT_BATCH_LIMIT,
+        name: Optional[str] = None,
+    ):
+        self.cache = cache
+        self.forward_writes = forward_writes
+        self.poll_timeout = poll_timeout
+        self.retry_interval = retry_interval
+        self.batch_limit = batch_limit
+        self.name = name or uuid.uuid4().hex[:12]
+        self.leader = HTTPClient(host, port, timeout=poll_timeout + 5, retries=0)
+        self.leader_address = f"{host}:{port}"
+        self.replid: str | None = None
+        self.offset = 0
+        self.leader_offset = 0
+        self.full_resyncs = 0
+        self.link_up = False
+        self._caught_up_at: float | None = None
+        self._closing = threading.Event()
+        self._thread: threading.Thread | None = None
+
+    def start(self) -> None:
+        self._thread = threading.Thread(
+            target=self._run, name="redsnano-follower", daemon=True
+        )
+        self._thread.start()
+
+    def sync_once(self, wait: float = 0) -> int:
+        """
+        Fetch and apply one batch from the leader (after a full resync when
+        needed), waiting up to ``wait`` seconds for new mutations.  Returns
+        the number of mutations applied.
+        """
+        if self.replid is None:
+            return self.full_resync()
+        query = urlencode(
+            {
+                "replid": self.replid,
+                "offset": self.offset,
+                "limit": self.batch_limit,
+                "wait": wait,
+                "follower": self.name,
+            }
+        )
+        status, body = self.leader._request("GET", f"/replication/log?{query}")
+        if status == 409:
+            return self.full_resync()
+        self.leader._check(status, body)
+        mutations = [
+            (key, entry if op == OP_SET else None) for _, op, key, entry in body["ops"]
+        ]
+        self.cache._apply_replicated(mutations)
+        self._advance(body["offset"], body["leader_offset"])
+        return len(mutations)
+
+    def full_resync(self) -> int:
+        """Replace the local contents with the leader's snapshot."""
+        status, body = self.leader._request("GET", "/replication/snapshot")
+        self.leader._check(status, body)
+        self.cache._load_replica(body["entries"])
+        self.replid = body["replid"]
+        self.full_resyncs += 1
+        self._advance(body["offset"], body["offset"])
+        return len(body["entries"])
+
+    def status(self) -> Dict[str, Any]:
+        lag_seconds = None
+        if self._caught_up_at is not None:
+            current = self.link_up and self.offset >= self.leader_offset
+            lag_seconds = 0.0 if current else time.time() - self._caught_up_at
+        return {
+            "role": "follower",
+            "leader": self.leader_address,
+            "link": "up" if self.link_up else "down",
+            "replid": self.replid,
+            "offset": self.offset,
+            "leader_offset": self.leader_offset,
+            "lag": max(0, self.leader_offset - self.offset),
+            "lag_seconds": lag_seconds,
+            "full_resyncs": self.full_resyncs,
+        }
+
+    def close(self) -> None:
+        self._closing.set()
+        if self._thread is not None:
+            self._thread.join()
+        self.leader.close()
+
+    def _advance(self, offset: int, leader_offset: int) -> None:
+        self.offset = offset
+        self.leader_offset = leader_offset
+        self.link_up = True
+        if offset >= leader_offset:
+            self._caught_up_at = time.time()
+
+    def _run(self) -> None:
+        while not self._closing.is_set():
+            try:
+                self.sync_once(self.poll_timeout)
+            except (OSError, ClientError, http.client.HTTPException, ValueError):
+                self.link_up = False
+                self._closing.wait(self.retry_interval)
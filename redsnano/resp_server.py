@@ -0,0 +1,448 @@
+from __future__ import annotations
+
+import asyncio
+import fnmatch
+import itertools
+import json
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import suppress
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+from .cache import MiniRedis
+
+# Same limits Redis applies to a single request.
+MAX_BULK_LENGTH = 512 * 1024 * 1024
+MAX_MULTIBULK_LENGTH = 1024 * 1024
+MAX_INLINE_LENGTH = 64 * 1024
+READ_CHUNK = 64 * 1024
+
+# Advertised in HELLO; clients use it to decide which features to expect.
+SERVER_VERSION = "7.0.0"
+
+
+class ProtocolError(Exception):
+    """The client sent bytes that are not a valid RESP request."""
+
+
+class CommandError(Exception):
+    """Sent back to the client as a RESP error reply."""
+
+
+class SimpleString(str):
+    """A reply encoded as a RESP simple string (``+OK``) rather than bulk."""
+
+
+OK = SimpleString("OK")
+PONG = SimpleString("PONG")
+
+
+def parse_commands(
+    buffer: bytes | bytearray,
+) -> Tuple[List[List[bytes]], int, Optional[str]]:
+    """
+    Parse the complete commands at the start of ``buffer``.
+
+    Returns the commands, the number of bytes they used, and a protocol
+    error message if parsing stopped on malformed input.  A trailing partial
+    command is left in place for the next read.
+    """
+    commands: List[List[bytes]] = []
+    pos = 0
+    try:
+        while pos < len(buffer):
+            if buffer[pos] == ord("*"):
+                parsed = _parse_multibulk(buffer, pos)
+            else:
+                parsed = _parse_inline(buffer, pos)
+            if parsed is None:
+                break
+            command, pos = parsed
+            if command:
+                commands.append(command)
+    except ProtocolError as exc:
+        return commands, pos, str(exc)
+    return commands, pos, None
+
+
+def _read_line(buffer: bytes | bytearray, pos: int) -> Tuple[bytes, int] | None:
+    eol = buffer.find(b"\r\n", pos)
+    if eol < 0:
+        if len(buffer) - pos > MAX_INLINE_LENGTH:
+            raise ProtocolError("too big request line")
+        return None
+    return bytes(buffer[pos:eol]), eol + 2
+
+
+def _parse_length(text: bytes, what: str, limit: int) -> int:
+    try:
+        length = int(text)
+    except ValueError:
+        raise ProtocolError(f"invalid {what} length") from None
+    if length > limit:
+        raise ProtocolError(f"invalid {what} length")
+    return length
+
+
+def _parse_multibulk(
+    buffer: bytes | bytearray, pos: int
+) -> Tuple[List[bytes], int] | None:
+    line = _read_line(buffer, pos)
+    if line is None:
+        return None
+    header, pos = line
+    count = _parse_length(header[1:], "multibulk", MAX_MULTIBULK_LENGTH)
+    args: List[bytes] = []
+    for _ in range(count):
+        line = _read_line(buffer, pos)
+        if line is None:
+            return None
+        header, pos = line
+        if not header.startswith(b"$"):
+            got = header[:1].decode("latin-1")
+            raise ProtocolError(f"expected '$', got {got!r}")
+        length = _parse_length(header[1:], "bulk", MAX_BULK_LENGTH)
+        if length < 0:
+            raise ProtocolError("invalid bulk length")
+        if len(buffer) < pos + length + 2:
+            return None
+        args.append(bytes(buffer[pos : pos + length]))
+        pos += length + 2
+    return args, pos
+
+
+def _parse_inline(
+    buffer: bytes | bytearray, pos: int
+) -> Tuple[List[bytes], int] | None:
+    # Inline commands (as typed into telnet) may end with a bare newline.
+    eol = buffer.find(b"\n", pos)
+    if eol < 0:
+        if len(buffer) - pos > MAX_INLINE_LENGTH:
+            raise ProtocolError("too big inline request")
+        return None
+    return bytes(buffer[pos:eol]).split(), eol + 1
+
+
+def encode_reply(reply: Any, protocol: int = 2) -> bytes:
+    """Encode a command result for a client speaking RESP ``protocol``."""
+    if reply is None:
+        return b"_\r\n" if protocol == 3 else b"$-1\r\n"
+    if isinstance(reply, SimpleString):
+        return b"+" + reply.encode("utf-8") + b"\r\n"
+    if isinstance(reply, CommandError):
+        return b"-" + str(reply).encode("utf-8") + b"\r\n"
+    if isinstance(reply, bool):
+        return b":1\r\n" if reply else b":0\r\n"
+    if isinstance(reply, int):
+        return b":%d\r\n" % reply
+    if isinstance(reply, str):
+        reply = reply.encode("utf-8", "surrogateescape")
+    if isinstance(reply, (bytes, bytearray)):
+        return b"$%d\r\n%s\r\n" % (len(reply), reply)
+    if isinstance(reply, dict):
+        if protocol == 3:
+            head = b"%%%d\r\n" % len(reply)
+        else:
+            head = b"*%d\r\n" % (2 * len(reply))
+        return head + b"".join(
+            encode_reply(key, protocol) + encode_reply(value, protocol)
+            for key, value in reply.items()
+        )
+    if isinstance(reply, (list, tuple)):
+        return b"*%d\r\n" % len(reply) + b"".join(
+            encode_reply(item, protocol) for item in reply
+        )
+    raise TypeError(f"Cannot encode {type(reply).__name__} as RESP")
+
+
+def encode_value(value: Any) -> bytes:
+    """
+    Bytes returned for a cached value: strings and bytes as they are, other
+    values (typically origin records) as compact JSON.
+    """
+    if isinstance(value, str):
+        return value.encode("utf-8", "surrogateescape")
+    if isinstance(value, (bytes, bytearray)):
+        return bytes(value)
+    encoded = json.dumps(value, separators=(",", ":"), ensure_ascii=False)
+    return encoded.encode("utf-8")
+
+
+def decode_value(data: bytes) -> str:
+    # surrogateescape keeps arbitrary bytes round-tripping through a str.
+    return data.decode("utf-8", "surrogateescape")
+
+
+class _Connection:
+    __slots__ = ("id", "protocol", "name", "closing")
+
+    def __init__(self, conn_id: int) -> None:
+        self.id = conn_id
+        self.protocol = 2
+        self.name: bytes | None = None
+        self.closing = False
+
+
+def _text(arg: bytes) -> str:
+    return arg.decode("utf-8", "surrogateescape")
+
+
+def _integer(arg: bytes) -> int:
+    try:
+        return int(arg)
+    except ValueError:
+        raise CommandError("ERR value is not an integer or out of range") from None
+
+
+# Commands a read-only server refuses.
+_WRITE_COMMANDS = frozenset({b"set", b"del", b"expire"})
+
+
+class RESPServer:
+    """
+    asyncio TCP server speaking the Redis protocol (RESP2, and RESP3 after
+    ``HELLO 3``) in front of a :class:`MiniRedis`.
+
+    Each read may carry many pipelined commands; they run in order, as one
+    batch on a pool of ``workers`` threads (cache misses may block on the
+    origin), and their replies go back in a single write.  Supported
+    commands: GET, SET (with EX/PX), DEL, MGET, EXPIRE, TTL, KEYS, PING,
+    ECHO, HELLO, SELECT 0, QUIT and the CLIENT/COMMAND calls stock clients
+    make when connecting.  A ``read_only`` server (a replication follower)
+    refuses SET, DEL and EXPIRE with a ``READONLY`` error.
+    """
+
+    def __init__(
+        self,
+        cache: MiniRedis,
+        host: str = "127.0.0.1",
+        port: int = 6379,
+        *,
+        workers: int = 16,
+        read_only: bool = False,
+    ):
+        self.cache = cache
+        self.read_only = read_only
+        self.host = host
+        self.port = port
+        self._executor = ThreadPoolExecutor(
+            max_workers=workers, thread_name_prefix="redsnano-resp"
+        )
+        self._server: asyncio.AbstractServer | None = None
+        self._ids = itertools.count(1)
+        self._commands: Dict[bytes, Tuple[int, Callable[..., Any]]] = {
+            # name: (arity, handler); negative arity means "at least".
+            b"get": (2, self._get),
+            b"set": (-3, self._set),
+            b"del": (-2, self._del),
+            b"mget": (-2, self._mget),
+            b"expire": (3, self._expire),
+            b"ttl": (2, self._ttl),
+            b"keys": (2, self._keys),
+            b"ping": (-1, self._ping),
+            b"echo": (2, self._echo),
+            b"hello": (-1, self._hello),
+            b"select": (2, self._select),
+            b"client": (-2, self._client),
+            b"command": (-1, self._command),
+            b"quit": (1, self._quit),
+        }
+
+    async def start(self) -> None:
+        self._server = await asyncio.start_server(self._handle, self.host, self.port)
+
+    @property
+    def address(self) -> Tuple[str, int]:
+        """The bound ``(host, port)``; useful when started on port 0."""
+        if self._server is None:
+            raise RuntimeError("Server is not started")
+        return self._server.sockets[0].getsockname()[:2]
+
+    async def serve_forever(self) -> None:
+        if self._server is None:
+            await self.start()
+        assert self._server is not None
+        async with self._server:
+            await self._server.serve_forever()
+
+    async def close(self) -> None:
+        if self._server is not None:
+            self._server.close()
+            await self._server.wait_closed()
+        self._executor.shutdown(wait=True)
+
+    async def _handle(
+        self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter
+    ) -> None:
+        loop = asyncio.get_running_loop()
+        conn = _Connection(next(self._ids))
+        buffer = bytearray()
+        try:
+            while not conn.closing:
+                data = await reader.read(READ_CHUNK)
+                if not data:
+                    break
+                buffer += data
+                commands, used, error = parse_commands(buffer)
+                del buffer[:used]
+                if commands:
+                    replies = await loop.run_in_executor(
+                        self._executor, self._execute, conn, commands
+                    )
+                    writer.write(replies)
+                if error is not None:
+                    reply = CommandError(f"ERR Protocol error: {error}")
+                    writer.write(encode_reply(reply))
+                    conn.closing = True
+                await writer.drain()
+        except ConnectionError:
+            pass
+        finally:
+            writer.close()
+            with suppress(ConnectionError):
+                await writer.wait_closed()
+
+    def _execute(self, conn: _Connection, commands: List[List[bytes]]) -> bytes:
+        out = bytearray()
+        for args in commands:
+            try:
+                reply = self._dispatch(conn, args)
+            except CommandError as exc:
+                reply = exc
+            except Exception as exc:
+                # Origin failures and load timeouts fail this command only;
+                # the rest of the pipeline still gets its replies.
+                message = " ".join(str(exc).split()) or type(exc).__name__
+                reply = CommandError(f"ERR {message}")
+            out += encode_reply(reply, conn.protocol)
+            if conn.closing:
+                break
+        return bytes(out)
+
+    def _dispatch(self, conn: _Connection, args: List[bytes]) -> Any:
+        name = args[0].lower()
+        command = self._commands.get(name)
+        if command is None:
+            preview = " ".join(f"'{_text(arg)}'" for arg in args[1:4])
+            raise CommandError(
+                f"ERR unknown command '{_text(args[0])}', "
+                f"with args beginning with: {preview}"
+            )
+        arity, handler = command
+        if self.read_only and name in _WRITE_COMMANDS:
+            raise CommandError("READONLY You can't write against a read only replica.")
+        if (arity >= 0 and len(args) != arity) or len(args) < -arity:
+            raise CommandError(
+                f"ERR wrong number of arguments for '{_text(name)}' command"
+            )
+        return handler(conn, *args[1:])
+
+    def _get(self, conn: _Connection, key: bytes) -> Any:
+        value = self.cache.get(_text(key))
+        return None if value is None else encode_value(value)
+
+    def _set(
+        self, conn: _Connection, key: bytes, value: bytes, *options: bytes
+    ) -> Any:
+        ttl: float | None = None
+        options_iter = iter(options)
+        for option in options_iter:
+            unit = {b"ex": 1.0, b"px": 0.001}.get(option.lower())
+            amount = next(options_iter, None)
+            if unit is None or amount is None or ttl is not None:
+                raise CommandError("ERR syntax error")
+            if _integer(amount) <= 0:
+                raise CommandError("ERR invalid expire time in 'set' command")
+            ttl = _integer(amount) * unit
+        self.cache.set(_text(key), decode_value(value), ttl=ttl)
+        return OK
+
+    def _del(self, conn: _Connection, *keys: bytes) -> int:
+        return self.cache.mdelete(_text(key) for key in keys)
+
+    def _mget(self, conn: _Connection, *keys: bytes) -> List[Any]:
+        values = self.cache.mget(_text(key) for key in keys)
+        return [None if value is None else encode_value(value) for value in values]
+
+    def _expire(self, conn: _Connection, key: bytes, seconds: bytes) -> int:
+        return int(self.cache.expire(_text(key), _integer(seconds)))
+
+    def _ttl(self, conn: _Connection, key: bytes) -> int:
+        remaining = self.cache.ttl(_text(key))
+        return int(remaining) if remaining < 0 else int(remaining + 0.5)
+
+    def _keys(self, conn: _Connection, pattern: bytes) -> List[bytes]:
+        pattern_text = _text(pattern)
+        return [
+            key.encode("utf-8", "surrogateescape")
+            for key in self.cache.keys()
+            if fnmatch.fnmatchcase(key, pattern_text)
+        ]
+
+    def _ping(self, conn: _Connection, *message: bytes) -> Any:
+        if len(message) > 1:
+            raise CommandError("ERR wrong number of arguments for 'ping' command")
+        return message[0] if message else PONG
+
+    def _echo(self, conn: _Connection, message: bytes) -> bytes:
+        return message
+
+    def _hello(self, conn: _Connection, *args: bytes) -> Dict[str, Any]:
+        protocol = conn.protocol
+        if args:
+            protocol = _integer(args[0])
+            if protocol not in (2, 3):
+                raise CommandError("NOPROTO unsupported protocol version")
+        options = iter(args[1:])
+        for option in options:
+            option = option.lower()
+            if option == b"auth":
+                # There is no authentication; accept any credentials.
+                next(options, None)
+                next(options, None)
+            elif option == b"setname":
+                conn.name = next(options, None)
+            else:
+                raise CommandError(
+                    f"ERR Syntax error in HELLO option '{_text(option)}'"
+                )
+        conn.protocol = protocol
+        return {
+            "server": "redsnano",
+            "version": SERVER_VERSION,
+            "proto": protocol,
+            "id": conn.id,
+            "mode": "standalone",
+            "role": "replica" if self.read_only else "master",
+            "modules": [],
+        }
+
+    def _select(self, conn: _Connection, index: bytes) -> Any:
+        if _integer(index) != 0:
+            raise CommandError("ERR DB index is out of range")
+        return OK
+
+    def _client(self, conn: _Connection, subcommand: bytes, *args: bytes) -> Any:
+        subcommand = subcommand.lower()
+        if subcommand == b"setname" and len(args) == 1:
+            conn.name = args[0]
+            return OK
+        if subcommand == b"getname" and not args:
+            return conn.name
+        if subcommand == b"id" and not args:
+            return conn.id
+        if subcommand == b"setinfo" and len(args) == 2:
+            return OK
+        raise CommandError(
+            f"ERR unknown subcommand or wrong number of arguments for "
+            f"'{_text(subcommand)}'"
+        )
+
+    def _command(self, conn: _Connection, *args: bytes) -> Any:
+        # Clients only use COMMAND for hints; an empty listing is valid.
+        if args and args[0].lower() == b"count":
+            return len(self._commands)
+        return []
+
+    def _quit(self, conn: _Connection) -> Any:
+        conn.closing = True
+        return OK
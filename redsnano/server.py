@@ -1,80 +1,588 @@
 from __future__ import annotations
 
+import fnmatch
 import json
-from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
-from typing import Tuple
-from urllib.parse import parse_qs, urlparse
+import selectors
+import socket
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from http.server import BaseHTTPRequestHandler, HTTPServer
+from typing import Any, Dict, List, Optional, Set, Tuple
+from urllib.parse import parse_qs, unquote, urlparse
 
 from .cache import MiniRedis
+from .client import ClientError
+from .metrics import PROMETHEUS_CONTENT_TYPE, prometheus_text
+from .replication import DEFAULT_BATCH_LIMIT, Follower
+
+try:  # pragma: no cover - optional dependency
+    import orjson
+except ImportError:  # pragma: no cover - optional dependency
+    orjson = None
+
+# Keys per chunk when streaming ``GET /keys``.
+KEYS_CHUNK_SIZE = 1000
+
+# How long a worker waits for the next request on a keep-alive connection
+# before parking it, unless other connections are waiting for a worker.
+KEEP_ALIVE_LINGER = 0.002
+
+# Longest a follower's ``GET /replication/log`` waits for new mutations.
+MAX_REPLICATION_WAIT = 30.0
+
+
+class BadRequest(Exception):
+    """Answered with a 400 response carrying the message."""
+
+
+class ReadOnly(Exception):
+    """Answered with a 403 response: this server is a follower."""
+
+
+def _encode_json(payload: Any) -> bytes:
+    if orjson is not None:
+        try:
+            return orjson.dumps(payload, option=orjson.OPT_NON_STR_KEYS)
+        except TypeError:
+            pass  # e.g. integers wider than 64 bits; the stdlib handles them
+    return json.dumps(payload).encode("utf-8")
+
+
+def _sendall_vectored(sock: socket.socket, buffers: List[bytes]) -> None:
+    # sendall() for a list of buffers: one sendmsg() gathers them from where
+    # they are, without joining them first.
+    views = [memoryview(buffer) for buffer in buffers if buffer]
+    while views:
+        sent = sock.sendmsg(views)
+        while sent:
+            if sent >= len(views[0]):
+                sent -= len(views.pop(0))
+            else:
+                views[0] = views[0][sent:]
+                sent = 0
 
 
 class MiniRedisHTTPRequestHandler(BaseHTTPRequestHandler):
     cache: MiniRedis  # injected before serving
+    follower: Optional[Follower] = None
+
+    # Persistent connections (and pipelined requests on them).  ``timeout``
+    # bounds the wait for a request's bytes; on a MiniRedisHTTPServer idle
+    # connections are parked between requests instead of pinning a worker.
+    protocol_version = "HTTP/1.1"
+    timeout = 15.0
+    disable_nagle_algorithm = True
+
+    def handle(self):
+        if not callable(getattr(self.server, "park", None)):
+            super().handle()
+            return
+        # Serve the requests already received, then give the worker back;
+        # the server watches the idle connection and hands it to a worker
+        # again when more arrive.
+        self.close_connection = True
+        self.handle_one_request()
+        while not self.close_connection and self._next_request_ready():
+            self.handle_one_request()
+        self.parked = not self.close_connection
+
+    def _next_request_ready(self) -> bool:
+        # Pipelined requests may already sit in rfile's buffer, where the
+        # server's selector cannot see them; a client sending back to back
+        # is served without the round trip through the selector.
+        self.connection.settimeout(self.server.linger())
+        try:
+            return bool(self.rfile.peek(1))
+        except OSError:
+            return False
+        finally:
+            self.connection.settimeout(self.timeout)
 
     def _send_json(self, payload, status: int = 200):
-        body = json.dumps(payload).encode("utf-8")
+        body = _encode_json(payload)
         self.send_response(status)
         self.send_header("Content-Type", "application/json")
         self.send_header("Content-Length", str(len(body)))
         self.end_headers()
         self.wfile.write(body)
 
+    def _send_json_parts(self, parts: List[bytes]) -> None:
+        # A 200 JSON response whose body is ``parts`` back to back, written
+        # in a single call together with the headers.
+        self.send_response(200)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(sum(len(part) for part in parts)))
+        if not hasattr(self.connection, "sendmsg"):  # pragma: no cover - Windows
+            self.end_headers()
+            self.wfile.write(b"".join(parts))
+            return
+        self._headers_buffer.append(b"\r\n")
+        head = b"".join(self._headers_buffer)
+        self._headers_buffer = []
+        _sendall_vectored(self.connection, [head, *parts])
+
+    def _send_text(self, text: str, content_type: str) -> None:
+        body = text.encode("utf-8")
+        self.send_response(200)
+        self.send_header("Content-Type", content_type)
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def _send_chunk(self, data: bytes) -> None:
+        self.wfile.write(b"%x\r\n%s\r\n" % (len(data), data))
+
     def do_GET(self):
-        key = self._extract_key()
-        if not key:
-            self._send_json({"error": "Key not provided"}, status=400)
+        try:
+            path = urlparse(self.path).path
+            if path == "/keys":
+                self._stream_keys()
+                return
+            if path.startswith("/replication"):
+                self._replication(path)
+                return
+            if path == "/slowlog":
+                count = self._int_param("count", 10)
+                self._send_json(self.cache.slowlog.to_dict(count))
+                return
+            if path == "/stats":
+                self._send_json(self.cache.stats())
+                return
+            if path == "/metrics":
+                text = prometheus_text(self.cache.metrics, self.cache.info())
+                self._send_text(text, PROMETHEUS_CONTENT_TYPE)
+                return
+            key = self._extract_key()
+            if not key:
+                self._send_json({"error": "Key not provided"}, status=400)
+                return
+            # The value's stored JSON, spliced into the envelope as is.
+            value = self.cache.get_encoded(key, ttl=self._query_ttl())
+        except BadRequest as exc:
+            self._send_json({"error": str(exc)}, status=400)
             return
-        value = self.cache.get(key)
         if value is None:
             self._send_json({"error": "Key not found"}, status=404)
             return
-        self._send_json({"key": key, "value": value})
+        self._send_json_parts(
+            [b'{"key":', _encode_json(key), b',"value":', value, b"}"]
+        )
 
     def do_PUT(self):
         key = self._extract_key()
         if not key:
             self._send_json({"error": "Key not provided"}, status=400)
             return
-        content_length = int(self.headers.get("Content-Length", "0"))
-        data = json.loads(self.rfile.read(content_length) or "{}")
-        value = data.get("value")
-        ttl = data.get("ttl")
-        self.cache.set(key, value, ttl=ttl)
+        try:
+            data = self._read_json()
+            value = data.get("value")
+            ttl = self._ttl_field(data)
+            if ttl is None:
+                ttl = self._query_ttl()
+            self._writer().set(key, value, ttl)
+        except (BadRequest, ReadOnly, ClientError, OSError) as exc:
+            self._send_error(exc)
+            return
         self._send_json({"key": key, "value": value, "ttl": ttl})
 
     def do_DELETE(self):
+        if urlparse(self.path).path == "/slowlog":
+            self.cache.slowlog.reset()
+            self._send_json({"reset": True})
+            return
         key = self._extract_key()
         if not key:
             self._send_json({"error": "Key not provided"}, status=400)
             return
-        self.cache.delete(key)
+        try:
+            self._writer().delete(key)
+        except (ReadOnly, ClientError, OSError) as exc:
+            self._send_error(exc)
+            return
         self._send_json({"key": key, "deleted": True})
 
+    def do_POST(self):
+        path = urlparse(self.path).path
+        handler = {
+            "/mget": self._mget,
+            "/mset": self._mset,
+            "/mdelete": self._mdelete,
+            "/batch": self._batch,
+        }.get(path)
+        try:
+            # Read the body even for unknown paths so the connection stays
+            # usable for the next request.
+            data = self._read_json()
+            if handler is None:
+                self._send_json({"error": "Not found"}, status=404)
+                return
+            result = handler(data)
+        except (BadRequest, ReadOnly, ClientError, OSError) as exc:
+            self._send_error(exc)
+            return
+        self._send_json(result)
+
+    def _mget(self, data: dict) -> dict:
+        keys = self._keys_field(data, "keys")
+        return self._lookup(keys, self._query_ttl())
+
+    def _mset(self, data: dict) -> dict:
+        items = data.get("items")
+        if not isinstance(items, dict):
+            raise BadRequest("items must be an object")
+        ttl = self._ttl_field(data)
+        self._writer().mset(items, ttl)
+        return {"keys": list(items), "ttl": ttl}
+
+    def _mdelete(self, data: dict) -> dict:
+        return {"deleted": self._writer().mdelete(self._keys_field(data, "keys"))}
+
+    def _batch(self, data: dict) -> dict:
+        # Applied in order: deletes, then writes, then reads.
+        result: dict = {}
+        if "delete" in data:
+            keys = self._keys_field(data, "delete")
+            result["deleted"] = self._writer().mdelete(keys)
+        if "set" in data:
+            items = {"items": data["set"], "ttl": data.get("ttl")}
+            result["set"] = self._mset(items)["keys"]
+        if "get" in data:
+            keys = self._keys_field(data, "get")
+            result.update(self._lookup(keys, self._ttl_field(data)))
+        return result
+
+    def _lookup(self, keys: list, ttl: Optional[float]) -> dict:
+        found, missing = {}, []
+        for key, value in zip(keys, self.cache.mget(keys, ttl=ttl)):
+            if value is None:
+                missing.append(key)
+            else:
+                found[key] = value
+        return {"values": found, "missing": missing}
+
+    def _stream_keys(self) -> None:
+        # Chunked so a large keyspace never has to be encoded in one body.
+        pattern = self._query_param("pattern")
+        keys = self.cache.keys()
+        if pattern is not None:
+            keys = [key for key in keys if fnmatch.fnmatchcase(key, pattern)]
+        self.send_response(200)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Transfer-Encoding", "chunked")
+        self.end_headers()
+        self._send_chunk(b'{"keys":[')
+        for start in range(0, len(keys), KEYS_CHUNK_SIZE):
+            chunk = _encode_json(keys[start : start + KEYS_CHUNK_SIZE])[1:-1]
+            if start:
+                chunk = b"," + chunk
+            self._send_chunk(chunk)
+        self._send_chunk(b'],"count":%d}' % len(keys))
+        self.wfile.write(b"0\r\n\r\n")
+
+    def _replication(self, path: str) -> None:
+        log = self.cache.replication
+        if path == "/replication":
+            if self.follower is not None:
+                self._send_json(self.follower.status())
+            elif log is not None:
+                self._send_json(log.status())
+            else:
+                self._send_json({"role": "standalone"})
+            return
+        if log is None or path not in ("/replication/snapshot", "/replication/log"):
+            self._send_json({"error": "Not found"}, status=404)
+            return
+        if path == "/replication/snapshot":
+            # The offset is read first: mutations racing with the snapshot are
+            # replayed on top of it, and sets/deletes are idempotent.
+            offset = log.offset
+            snapshot = {"entries": self.cache._snapshot()}
+            self._send_json({"replid": log.replid, "offset": offset, **snapshot})
+            return
+
+        offset = self._int_param("offset", 0)
+        limit = self._int_param("limit", DEFAULT_BATCH_LIMIT)
+        wait = min(self._float_param("wait") or 0, MAX_REPLICATION_WAIT)
+        ops = None
+        if self._query_param("replid") == log.replid:
+            ops = log.since(offset, limit)
+            if ops == [] and wait > 0 and log.wait(offset, wait):
+                ops = log.since(offset, limit)
+        if ops is None:
+            self._send_json({"error": "Full resync required"}, status=409)
+            return
+        follower = self._query_param("follower")
+        if follower:
+            log.acknowledge(f"{follower}@{self.client_address[0]}", offset)
+        self._send_json(
+            {
+                "ops": ops,
+                "offset": ops[-1][0] if ops else offset,
+                "leader_offset": log.offset,
+            }
+        )
+
+    def _writer(self) -> Any:
+        # Writes apply locally, except on a follower, which forwards them to
+        # its leader (the change comes back through replication) or refuses.
+        follower = self.follower
+        if follower is None:
+            return self.cache
+        if follower.forward_writes:
+            return follower.leader
+        raise ReadOnly(
+            f"This server is a read-only follower; write to {follower.leader_address}"
+        )
+
+    def _send_error(self, exc: Exception) -> None:
+        if isinstance(exc, BadRequest):
+            self._send_json({"error": str(exc)}, status=400)
+        elif isinstance(exc, ReadOnly):
+            self._send_json({"error": str(exc)}, status=403)
+        else:
+            self._send_json({"error": f"Leader unavailable: {exc}"}, status=502)
+
     def log_message(self, format, *args):  # pragma: no cover - noisy in tests
         return
 
+    def _content_length(self) -> int:
+        try:
+            return int(self.headers.get("Content-Length", "0"))
+        except ValueError:
+            raise BadRequest("Invalid Content-Length") from None
+
+    def _read_json(self) -> dict:
+        body = self.rfile.read(self._content_length())
+        try:
+            data = json.loads(body or "{}")
+        except ValueError:
+            raise BadRequest("Body must be JSON") from None
+        if not isinstance(data, dict):
+            raise BadRequest("Body must be a JSON object")
+        return data
+
+    @staticmethod
+    def _keys_field(data: dict, field: str) -> list:
+        keys = data.get(field)
+        if not isinstance(keys, list) or not all(isinstance(k, str) for k in keys):
+            raise BadRequest(f"{field} must be a list of strings")
+        return keys
+
+    @staticmethod
+    def _ttl_field(data: dict) -> float | None:
+        ttl = data.get("ttl")
+        if ttl is None:
+            return None
+        if isinstance(ttl, bool) or not isinstance(ttl, (int, float)) or not ttl >= 0:
+            raise BadRequest("ttl must be a non-negative number or null")
+        return ttl
+
+    def _query_param(self, name: str) -> str | None:
+        values = parse_qs(urlparse(self.path).query or "").get(name)
+        return values[0] if values else None
+
+    def _int_param(self, name: str, default: int) -> int:
+        value = self._query_param(name)
+        if value is None:
+            return default
+        try:
+            return int(value)
+        except ValueError:
+            raise BadRequest(f"{name} must be an integer") from None
+
+    def _float_param(self, name: str) -> float | None:
+        value = self._query_param(name)
+        if value is None:
+            return None
+        try:
+            return float(value)
+        except ValueError:
+            raise BadRequest(f"{name} must be a number") from None
+
+    def _query_ttl(self) -> float | None:
+        # The ttl applies to this request only (keys it loads from the origin).
+        ttl = self._float_param("ttl")
+        if ttl is not None and not ttl >= 0:
+            raise BadRequest("ttl must be a non-negative number")
+        return ttl
+
     def _extract_key(self) -> str | None:
         parsed = urlparse(self.path)
         if not parsed.path.startswith("/cache/"):
             return None
-        key = parsed.path[len("/cache/") :]
-        query = parse_qs(parsed.query or "")
-        ttl = query.get("ttl")
-        if ttl:
-            try:
-                ttl_value = float(ttl[0])
-                self.cache.default_ttl = ttl_value
-            except ValueError:
-                pass
+        key = unquote(parsed.path[len("/cache/") :])
         return key or None
 
 
-class MiniRedisHTTPServer(ThreadingHTTPServer):
-    def __init__(self, server_address: Tuple[str, int], cache: MiniRedis):
+class MiniRedisHTTPServer(HTTPServer):
+    """
+    HTTP/1.1 front end for a :class:`MiniRedis`.
+
+    Connections are served by a fixed pool of ``workers`` threads; up to
+    ``max_pending`` more may be open, waiting for a free worker or idle, and
+    any beyond that are answered with ``503 Service Unavailable``.  Idle
+    keep-alive connections do not hold a worker: they are watched by one
+    selector thread, handed back to the pool when a request arrives and
+    closed after ``idle_timeout`` seconds.
+
+    When the cache has a replication log, followers read it from
+    ``/replication/snapshot`` and ``/replication/log``.  Given a
+    ``follower``, the server is a read-only replica: writes are answered
+    with ``403``, or passed to the leader when the follower forwards them.
+    ``GET /replication`` reports the role, offsets and lag.
+    """
+
+    def __init__(
+        self,
+        server_address: Tuple[str, int],
+        cache: MiniRedis,
+        *,
+        workers: int = 32,
+        max_pending: int = 128,
+        idle_timeout: float = 15.0,
+        follower: Optional[Follower] = None,
+    ):
         handler = type(
             "HandlerWithCache",
             (MiniRedisHTTPRequestHandler,),
-            {"cache": cache},
+            {"cache": cache, "timeout": idle_timeout, "follower": follower},
         )
         super().__init__(server_address, handler)
+        self.workers = workers
+        self.idle_timeout = idle_timeout
+        self._executor = ThreadPoolExecutor(
+            max_workers=workers, thread_name_prefix="redsnano-http"
+        )
+        self._slots = threading.BoundedSemaphore(workers + max_pending)
+        self._connections_lock = threading.Lock()
+        self._connections: Set[socket.socket] = set()
+        self._waiting = 0  # connections submitted but not yet on a worker
+        # Connections parked by workers, registered by the idle thread.
+        self._parked: List[Tuple[socket.socket, Any]] = []
+        self._closing = False
+        self._wakeup, self._wakeup_writer = socket.socketpair()
+        self._wakeup_writer.setblocking(False)
+        self._idle_thread = threading.Thread(
+            target=self._watch_idle, name="redsnano-http-idle", daemon=True
+        )
+        self._idle_thread.start()
+
+    def process_request(self, request, client_address):
+        if not self._slots.acquire(blocking=False):
+            self._reject(request)
+            return
+        self._submit(request, client_address)
+
+    def park(self, request, client_address) -> None:
+        """Watch an idle keep-alive connection until its next request."""
+        with self._connections_lock:
+            if not self._closing:
+                self._parked.append((request, client_address))
+                self._wake()
+                return
+        self._close(request)
+
+    def linger(self) -> float:
+        """Seconds a worker may wait for the next request before parking."""
+        return 0.0 if self._waiting else KEEP_ALIVE_LINGER
+
+    def server_close(self):
+        super().server_close()
+        with self._connections_lock:
+            self._closing = True
+            self._wake()
+        self._idle_thread.join()
+        # Wake workers blocked reading a request that is slow to arrive.
+        with self._connections_lock:
+            connections = list(self._connections)
+        for connection in connections:
+            try:
+                connection.shutdown(socket.SHUT_RDWR)
+            except OSError:
+                pass
+        self._executor.shutdown(wait=True)
+        self._wakeup.close()
+        self._wakeup_writer.close()
+
+    def _submit(self, request, client_address) -> None:
+        with self._connections_lock:
+            self._waiting += 1
+        self._executor.submit(self._process, request, client_address)
+
+    def _process(self, request, client_address) -> None:
+        with self._connections_lock:
+            self._waiting -= 1
+            self._connections.add(request)
+        parked = False
+        try:
+            handler = self.RequestHandlerClass(request, client_address, self)
+            parked = getattr(handler, "parked", False)
+        except Exception:  # noqa: BLE001 - report and keep serving
+            self.handle_error(request, client_address)
+        finally:
+            with self._connections_lock:
+                self._connections.discard(request)
+            if parked:
+                self.park(request, client_address)
+            else:
+                self._close(request)
+
+    def _close(self, request) -> None:
+        self.shutdown_request(request)
+        self._slots.release()
+
+    def _wake(self) -> None:
+        try:
+            self._wakeup_writer.send(b"\0")
+        except OSError:
+            pass  # already full: the idle thread is awake anyway
+
+    def _watch_idle(self) -> None:
+        # Deadlines grow in insertion order, so the oldest idle connection
+        # is always first in ``idle``.
+        idle: Dict[socket.socket, float] = {}
+        with selectors.DefaultSelector() as selector:
+            selector.register(self._wakeup, selectors.EVENT_READ)
+            while True:
+                timeout = None
+                if idle:
+                    timeout = max(0.0, next(iter(idle.values())) - time.monotonic())
+                for key, _ in selector.select(timeout):
+                    if key.fileobj is self._wakeup:
+                        self._wakeup.recv(4096)
+                        continue
+                    selector.unregister(key.fileobj)
+                    del idle[key.fileobj]
+                    self._submit(key.fileobj, key.data)
+                with self._connections_lock:
+                    parked, self._parked = self._parked, []
+                    closing = self._closing
+                if closing:
+                    break
+                deadline = time.monotonic() + self.idle_timeout
+                for request, client_address in parked:
+                    selector.register(request, selectors.EVENT_READ, client_address)
+                    idle[request] = deadline
+                now = time.monotonic()
+                while idle:
+                    request, deadline = next(iter(idle.items()))
+                    if deadline > now:
+                        break
+                    del idle[request]
+                    selector.unregister(request)
+                    self._close(request)
+        for request, _ in parked:
+            self._close(request)
+        for request in idle:
+            self._close(request)
 
+    def _reject(self, request) -> None:
+        try:
+            request.sendall(
+                b"HTTP/1.1 503 Service Unavailable\r\n"
+                b"Content-Length: 0\r\nConnection: close\r\n\r\n"
+            )
+        except OSError:
+            pass
+        self.shutdown_request(request)
@@ -0,0 +1,106 @@
+from __future__ import annotations
+
+import threading
+from typing import Callable, Dict, List, Optional
+
+from .cache_types import CacheEntry
+from .eviction import EvictionPolicy
+from .expiry import ExpiryIndex
+
+
+class Shard:
+    """
+    One independently locked slice of the cache keyspace: its entries, size
+    accounting, eviction bookkeeping and expiry heap.  ``max_entries`` and
+    ``max_memory_bytes`` are this shard's share of the cache-wide limits.
+    Callers hold :attr:`lock` around every method.
+    """
+
+    def __init__(
+        self,
+        eviction: EvictionPolicy | None = None,
+        *,
+        max_entries: Optional[int] = None,
+        max_memory_bytes: Optional[int] = None,
+    ):
+        self.lock = threading.RLock()
+        self.store: Dict[str, CacheEntry] = {}
+        self.eviction = eviction
+        self.expiry = ExpiryIndex()
+        self.max_entries = max_entries
+        self.max_memory_bytes = max_memory_bytes
+        self.used_memory = 0
+        self.evicted_keys = 0
+        self.expired_keys = 0
+        # Receives evicted entries (for a warm tier); None just drops them.
+        self.demote: Optional[Callable[[str, CacheEntry], None]] = None
+
+    def get(self, key: str, *, touch: bool = False) -> CacheEntry | None:
+        """Return the entry for ``key``; ``touch`` counts it as an access."""
+        entry = self.store.get(key)
+        if touch and entry is not None and self.eviction is not None:
+            self.eviction.record_access(key)
+        return entry
+
+    def insert(self, key: str, entry: CacheEntry) -> None:
+        previous = self.store.get(key)
+        if previous is not None:
+            self.used_memory -= previous.size
+        self.store[key] = entry
+        self.used_memory += entry.size
+        if self.eviction is not None:
+            self.eviction.record_insert(key, entry)
+        if entry.expire_at is not None:
+            if self.expiry.needs_rebuild(len(self.store)):
+                self.expiry.rebuild(
+                    (live_key, live.expire_at)
+                    for live_key, live in self.store.items()
+                    if live.expire_at is not None
+                )
+            else:
+                self.expiry.add(key, entry.expire_at)
+
+    def remove(self, key: str) -> CacheEntry | None:
+        entry = self.store.pop(key, None)
+        if entry is not None:
+            self.used_memory -= entry.size
+            if self.eviction is not None:
+                self.eviction.record_remove(key)
+        return entry
+
+    def over_limit(self) -> bool:
+        if self.max_entries is not None and len(self.store) > self.max_entries:
+            return True
+        return (
+            self.max_memory_bytes is not None
+            and self.used_memory > self.max_memory_bytes
+        )
+
+    def evict(self) -> List[str]:
+        """Drop keys chosen by the eviction policy until within limits."""
+        if self.eviction is None:
+            return []
+        victims = []
+        while self.over_limit():
+            victim = self.eviction.choose_victim()
+            entry = None if victim is None else self.remove(victim)
+            if victim is None or entry is None:
+                break
+            if self.demote is not None:
+                self.demote(victim, entry)
+            victims.append(victim)
+        self.evicted_keys += len(victims)
+        return victims
+
+    def expire_due(self, now: float, limit: int) -> List[str]:
+        """Remove up to ``limit`` keys whose expiry time has passed."""
+        removed = []
+        for expire_at, key in self.expiry.pop_due(now, limit):
+            entry = self.store.get(key)
+            # Skip pairs left behind by keys that were overwritten or deleted.
+            if entry is None or entry.expire_at != expire_at:
+                continue
+            self.remove(key)
+            removed.append(key)
+        self.expired_keys += len(removed)
+        return removed
@@ -0,0 +1,166 @@
+from __future__ import annotations
+
+import itertools
+import time
+from collections import deque
+from contextvars import ContextVar
+from dataclasses import asdict, dataclass
+from typing import Any, Deque, Dict, Iterable, List, Optional, Protocol
+
+# Entries kept by default, as in Redis' ``slowlog-max-len``.
+DEFAULT_SLOWLOG_MAX_LEN = 128
+
+# Like Redis, slow log entries keep at most this many arguments, each cut to
+# this many characters, so one huge MGET cannot pin megabytes of keys.
+SLOWLOG_MAX_ARGS = 32
+SLOWLOG_MAX_ARG_LENGTH = 128
+
+# Phase name under which tracers see a whole operation.
+PHASE_TOTAL = "total"
+
+
+class Tracer(Protocol):
+    """
+    Receives the start and end of every operation (as phase ``"total"``) and
+    of the phases inside it: ``"lock"`` (waiting for a contended shard lock),
+    ``"hash"``, ``"origin_fetch"``, ``"origin_fetch_hash"``, ``"persist"``,
+    ``"warm_fetch"`` and ``"warm_store"``.
+    Callbacks run inline on the calling thread, so keep them cheap.
+    """
+
+    def on_start(self, operation: str, phase: str) -> None:  # pragma: no cover - protocol
+        ...
+
+    def on_end(self, operation: str, phase: str, seconds: float) -> None:  # pragma: no cover - protocol
+        ...
+
+
+@dataclass
+class SlowLogEntry:
+    id: int
+    started_at: float
+    duration_us: int
+    command: str
+    args: List[str]
+    # Microseconds spent in each phase (summed when a phase repeats).
+    phases: Dict[str, int]
+
+    def to_dict(self) -> Dict[str, Any]:
+        return asdict(self)
+
+
+class SlowLog:
+    """
+    Ring buffer of the last ``max_len`` operations that took at least
+    ``threshold`` seconds, newest first.  A ``threshold`` of None disables
+    it; it can be changed at any time.
+    """
+
+    def __init__(
+        self, threshold: Optional[float] = None, max_len: int = DEFAULT_SLOWLOG_MAX_LEN
+    ):
+        self.threshold = threshold
+        self.max_len = max_len
+        self._entries: Deque[SlowLogEntry] = deque(maxlen=max_len)
+        self._ids = itertools.count()
+
+    def get(self, count: Optional[int] = 10) -> List[SlowLogEntry]:
+        """The ``count`` most recent entries (all of them for None or -1)."""
+        entries = list(self._entries)
+        entries.reverse()
+        return entries if count is None or count < 0 else entries[:count]
+
+    def reset(self) -> None:
+        self._entries.clear()
+
+    def to_dict(self, count: Optional[int] = 10) -> Dict[str, Any]:
+        """JSON-ready view served by the HTTP front ends."""
+        return {
+            "threshold": self.threshold,
+            "max_len": self.max_len,
+            "len": len(self._entries),
+            "entries": [entry.to_dict() for entry in self.get(count)],
+        }
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def add(
+        self,
+        command: str,
+        args: str | Iterable[Any],
+        started_at: float,
+        seconds: float,
+        phases: Dict[str, float],
+    ) -> None:
+        if isinstance(args, str):
+            args = (args,)
+        args = [
+            str(arg)[:SLOWLOG_MAX_ARG_LENGTH]
+            for arg in itertools.islice(args, SLOWLOG_MAX_ARGS)
+        ]
+        self._entries.append(
+            SlowLogEntry(
+                id=next(self._ids),
+                started_at=started_at,
+                duration_us=int(seconds * 1e6),
+                command=command,
+                args=args,
+                phases={name: int(spent * 1e6) for name, spent in phases.items()},
+            )
+        )
+
+
+class OperationTrace:
+    """Phase timings of one operation in flight; see :data:`current_trace`."""
+
+    __slots__ = (
+        "operation",
+        "args",
+        "tracer",
+        "started_at",
+        "phases",
+        "done",
+        "token",
+    )
+
+    def __init__(self, operation: str, args: Any, tracer: Optional[Tracer]):
+        self.operation = operation
+        self.args = args
+        self.tracer = tracer
+        self.started_at = time.time()
+        self.phases: Dict[str, float] = {}
+        self.done = False
+        self.token: Any = None  # restores current_trace when the operation ends
+        if tracer is not None:
+            tracer.on_start(operation, PHASE_TOTAL)
+
+    def start(self, phase: str) -> None:
+        if self.tracer is not None and not self.done:
+            self.tracer.on_start(self.operation, phase)
+
+    def end(self, phase: str, seconds: float) -> None:
+        # Work the operation handed off (e.g. a background validation) may
+        # finish after it; that time is not the operation's.
+        if self.done:
+            return
+        self.phases[phase] = self.phases.get(phase, 0.0) + seconds
+        if self.tracer is not None:
+            self.tracer.on_end(self.operation, phase, seconds)
+
+    def finish(self, seconds: float, slowlog: SlowLog) -> None:
+        self.done = True
+        if self.tracer is not None:
+            self.tracer.on_end(self.operation, PHASE_TOTAL, seconds)
+        threshold = slowlog.threshold
+        if threshold is not None and seconds >= threshold:
+            slowlog.add(
+                self.operation, self.args, self.started_at, seconds, self.phases
+            )
+
+
+# The operation being traced on this thread or asyncio task, if any.  Phase
+# timers look it up; with tracing off it stays None and they skip all work.
+current_trace: ContextVar[Optional[OperationTrace]] = ContextVar(
+    "redsnano_trace", default=None
+)
@@ -0,0 +1,128 @@
+from __future__ import annotations
+
+import threading
+from collections import deque
+from typing import Callable, Deque, Dict, List
+
+OVERFLOW_DROP = "drop"
+OVERFLOW_INLINE = "inline"
+OVERFLOW_POLICIES = (OVERFLOW_DROP, OVERFLOW_INLINE)
+
+
+class ValidationScheduler:
+    """
+    Fixed pool of worker threads running background validations.
+
+    Work is queued per key: submitting a key that is already waiting replaces
+    its task instead of queueing a second origin round trip.  When
+    ``max_queue`` keys are waiting, ``overflow`` decides what happens to new
+    ones: ``"drop"`` discards them (the cached value is still served) and
+    ``"inline"`` runs the validation in the calling thread.
+    """
+
+    def __init__(
+        self,
+        *,
+        workers: int = 4,
+        max_queue: int = 1024,
+        overflow: str = OVERFLOW_DROP,
+    ):
+        if overflow not in OVERFLOW_POLICIES:
+            raise ValueError(
+                f"Unknown overflow policy {overflow!r}; "
+                f"expected one of {OVERFLOW_POLICIES}"
+            )
+        self.workers = workers
+        self.max_queue = max_queue
+        self.overflow = overflow
+        self._cond = threading.Condition()
+        self._queue: Deque[str] = deque()
+        self._pending: Dict[str, Callable[[], None]] = {}
+        self._threads: List[threading.Thread] = []
+        self._closed = False
+        self._submitted = 0
+        self._coalesced = 0
+        self._dropped = 0
+        self._inline = 0
+        self._completed = 0
+        self._errors = 0
+
+    def submit(self, key: str, task: Callable[[], None]) -> bool:
+        """Queue ``task`` for ``key``; returns False if it was dropped."""
+        with self._cond:
+            if self._closed:
+                return False
+            self._submitted += 1
+            if key in self._pending:
+                self._pending[key] = task
+                self._coalesced += 1
+                return True
+            if len(self._queue) >= self.max_queue:
+                if self.overflow == OVERFLOW_DROP:
+                    self._dropped += 1
+                    return False
+                self._inline += 1
+            else:
+                self._pending[key] = task
+                self._queue.append(key)
+                if len(self._threads) < self.workers:
+                    self._start_worker()
+                self._cond.notify()
+                return True
+        self._run(task)
+        return True
+
+    def stats(self) -> Dict[str, int]:
+        with self._cond:
+            return {
+                "queue_depth": len(self._queue),
+                "workers": len(self._threads),
+                "submitted": self._submitted,
+                "coalesced": self._coalesced,
+                "dropped": self._dropped,
+                "inline": self._inline,
+                "completed": self._completed,
+                "errors": self._errors,
+            }
+
+    def close(self, *, wait: bool = True) -> None:
+        """Stop the workers; with ``wait`` they first drain queued validations."""
+        with self._cond:
+            self._closed = True
+            if not wait:
+                self._queue.clear()
+                self._pending.clear()
+            self._cond.notify_all()
+            threads = list(self._threads)
+        for thread in threads:
+            thread.join()
+
+    def _start_worker(self) -> None:
+        thread = threading.Thread(
+            target=self._worker,
+            name=f"redsnano-validate-{len(self._threads)}",
+            daemon=True,
+        )
+        self._threads.append(thread)
+        thread.start()
+
+    def _worker(self) -> None:
+        while True:
+            with self._cond:
+                while not self._queue and not self._closed:
+                    self._cond.wait()
+                if not self._queue:
+                    return
+                key = self._queue.popleft()
+                task = self._pending.pop(key)
+            self._run(task)
+
+    def _run(self, task: Callable[[], None]) -> None:
+        try:
+            task()
+        except Exception:  # noqa: BLE001 - a failed validation must not kill the worker
+            with self._cond:
+                self._errors += 1
+        else:
+            with self._cond:
+                self._completed += 1
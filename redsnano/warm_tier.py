@@ -0,0 +1,150 @@
+from __future__ import annotations
+
+import time
+import zlib
+from pathlib import Path
+from typing import Dict, Iterable, Protocol, Tuple
+
+from .cache_types import COMPRESSION_LEVEL, CacheEntry
+from .hashing import decode_canonical
+from .origin_sqlite import SQLiteConnectionPool
+
+# Stay well below SQLite's limit on bound parameters per statement.
+_MAX_BATCH_PARAMS = 500
+
+_UPSERT_SQL = """
+    INSERT OR REPLACE INTO warm_entries(
+        key, value, compressed, hash, expire_at, revalidate_after, fetch_cost
+    ) VALUES (?, ?, ?, ?, ?, ?, ?)
+"""
+
+
+class WarmTier(Protocol):
+    """
+    Second, larger cache level behind :class:`~redsnano.cache.MiniRedis`'
+    in-memory store: entries evicted from memory are written here, and
+    keys missing from memory are looked up here before the origin.
+    Entries read back are validated against the origin before being
+    trusted, so a tier may hold stale or extra copies.
+    """
+
+    def get_many(self, keys: Iterable[str]) -> Dict[str, CacheEntry]:  # pragma: no cover - protocol
+        ...
+
+    def put_many(self, entries: Iterable[Tuple[str, CacheEntry]]) -> int:  # pragma: no cover - protocol
+        ...
+
+    def delete_many(self, keys: Iterable[str]) -> None:  # pragma: no cover - protocol
+        ...
+
+
+class SQLiteWarmTier:
+    """
+    Warm tier in an SQLite file, one row per key in a ``WITHOUT ROWID``
+    table so lookups are a single B-tree search.  Values are stored as
+    their canonical JSON, zlib-compressed from ``compress_threshold`` bytes
+    when that is smaller, and come back as JSON decodes them (tuples as
+    lists), as with the persistence backends; values without a JSON form
+    are not kept.  Expired rows are never returned and are purged at most
+    every ``purge_interval`` seconds while entries are written.  The file
+    outlives the process: a restarted cache finds its warm entries again.
+    """
+
+    def __init__(
+        self,
+        path: str | Path,
+        *,
+        compress_threshold: int = 512,
+        purge_interval: float = 60.0,
+    ):
+        self.path = Path(path)
+        self.compress_threshold = compress_threshold
+        self.purge_interval = purge_interval
+        self._pool = SQLiteConnectionPool(self.path)
+        self._purged_at = time.time()
+        with self._pool.connection() as conn:
+            conn.execute(
+                """
+                CREATE TABLE IF NOT EXISTS warm_entries (
+                    key TEXT PRIMARY KEY,
+                    value BLOB NOT NULL,
+                    compressed INTEGER NOT NULL,
+                    hash TEXT NOT NULL,
+                    expire_at REAL,
+                    revalidate_after REAL,
+                    fetch_cost REAL
+                ) WITHOUT ROWID
+                """
+            )
+
+    def get_many(self, keys: Iterable[str]) -> Dict[str, CacheEntry]:
+        keys = list(keys)
+        now = time.time()
+        conn = self._pool.connection()
+        found: Dict[str, CacheEntry] = {}
+        for start in range(0, len(keys), _MAX_BATCH_PARAMS):
+            chunk = keys[start : start + _MAX_BATCH_PARAMS]
+            placeholders = ",".join("?" * len(chunk))
+            rows = conn.execute(
+                "SELECT key, value, compressed, hash, expire_at, revalidate_after,"
+                f" fetch_cost FROM warm_entries WHERE key IN ({placeholders})"
+                " AND (expire_at IS NULL OR expire_at > ?)",
+                (*chunk, now),
+            )
+            for key, value, compressed, digest, expire_at, window, cost in rows:
+                if compressed:
+                    value = zlib.decompress(value)
+                # validated_at stays None: the cache validates it before use.
+                found[key] = CacheEntry(
+                    decode_canonical(value),
+                    digest,
+                    expire_at,
+                    revalidate_after=window,
+                    fetch_cost=cost,
+                )
+        return found
+
+    def put_many(self, entries: Iterable[Tuple[str, CacheEntry]]) -> int:
+        """Store ``entries``, replacing older copies; returns how many were kept."""
+        rows = [row for key, entry in entries if (row := self._row(key, entry))]
+        with self._pool.connection() as conn:
+            conn.executemany(_UPSERT_SQL, rows)
+            if time.time() - self._purged_at >= self.purge_interval:
+                self._purged_at = time.time()
+                conn.execute(
+                    "DELETE FROM warm_entries WHERE expire_at <= ?", (self._purged_at,)
+                )
+        return len(rows)
+
+    def delete_many(self, keys: Iterable[str]) -> None:
+        with self._pool.connection() as conn:
+            conn.executemany(
+                "DELETE FROM warm_entries WHERE key = ?", ((key,) for key in keys)
+            )
+
+    def __len__(self) -> int:
+        conn = self._pool.connection()
+        return conn.execute("SELECT COUNT(*) FROM warm_entries").fetchone()[0]
+
+    def close(self) -> None:
+        self._pool.close()
+
+    def _row(self, key: str, entry: CacheEntry) -> Tuple | None:
+        try:
+            value = entry.json_bytes()
+        except TypeError:
+            return None
+        compressed = 0
+        if len(value) >= self.compress_threshold:
+            packed = zlib.compress(value, COMPRESSION_LEVEL)
+            if len(packed) < len(value):
+                value, compressed = packed, 1
+        return (
+            key,
+            value,
+            compressed,
+            entry.hash,
+            entry.expire_at,
+            entry.revalidate_after,
+            entry.fetch_cost,
+        )
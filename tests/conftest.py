@@ -1,9 +1,66 @@
 from __future__ import annotations
 
+import json
+import socket
+import subprocess
 import sys
+import time
 from pathlib import Path
 
+import pytest
+
 PROJECT_ROOT = Path(__file__).resolve().parents[1]
 if str(PROJECT_ROOT) not in sys.path:
     sys.path.insert(0, str(PROJECT_ROOT))
 
+
+def _free_port() -> int:
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+
+@pytest.fixture
+def server_process(tmp_path):
+    """
+    Start ``redsnano.cli`` entry points as separate processes; returns a
+    function ``(name, entry_point, origin, *args) -> port``.  All processes
+    are stopped at teardown.
+    """
+    processes = []
+
+    def start(name, entry_point="run_server", origin=None, *args):
+        origin_path = tmp_path / f"{name}-origin.json"
+        origin_path.write_text(json.dumps(origin or {}), encoding="utf-8")
+        port = _free_port()
+        process = subprocess.Popen(
+            [
+                sys.executable,
+                "-c",
+                f"from redsnano.cli import {entry_point}; {entry_point}()",
+                "--host=127.0.0.1",
+                f"--port={port}",
+                f"--origin-json={origin_path}",
+                f"--cache-file={tmp_path / name}-cache.json",
+                "--workers=4",
+                *args,
+            ],
+            cwd=PROJECT_ROOT,
+            stdout=subprocess.DEVNULL,
+        )
+        processes.append(process)
+        deadline = time.time() + 15
+        while True:
+            try:
+                socket.create_connection(("127.0.0.1", port), timeout=1).close()
+                return port
+            except OSError:
+                if process.poll() is not None or time.time() > deadline:
+                    raise RuntimeError(f"{entry_point} for {name} did not start")
+                time.sleep(0.05)
+
+    yield start
+    for process in processes:
+        process.terminate()
+    for process in processes:
+        process.wait(timeout=10)
@@ -0,0 +1,122 @@
+from __future__ import annotations
+
+import asyncio
+import time
+
+import pytest
+
+from redsnano.aio import (
+    AsyncDictionaryOriginStore,
+    AsyncMiniRedis,
+    AsyncSQLiteUserOriginStore,
+)
+from redsnano.origin_sqlite import SQLiteUserRepository
+from redsnano.persistence import JSONPersistence
+
+
+class SlowOrigin(AsyncDictionaryOriginStore):
+    def __init__(self, seed):
+        super().__init__(seed)
+        self.value_calls = 0
+
+    async def fetch_value(self, key):
+        self.value_calls += 1
+        await asyncio.sleep(0.01)
+        return await super().fetch_value(key)
+
+
+def build_cache(tmp_path, origin, **options):
+    return AsyncMiniRedis(
+        origin, persistence=JSONPersistence(tmp_path / "cache.json"), **options
+    )
+
+
+def test_concurrent_misses_share_one_fetch(tmp_path):
+    async def scenario():
+        origin = SlowOrigin({"user:1": {"name": "Alice"}})
+        cache = build_cache(tmp_path, origin)
+        values = await asyncio.gather(*(cache.get("user:1") for _ in range(10)))
+        assert values == [{"name": "Alice"}] * 10
+        assert origin.value_calls == 1
+        assert cache.info()["loads_coalesced"] == 9
+        await cache.close()
+
+    asyncio.run(scenario())
+
+
+def test_background_validation_refreshes_entry(tmp_path):
+    async def scenario():
+        origin = AsyncDictionaryOriginStore({"user:1": {"name": "Alice"}})
+        cache = build_cache(tmp_path, origin)
+        assert await cache.get("user:1") == {"name": "Alice"}
+
+        origin.update("user:1", {"name": "Bob"})
+        assert await cache.get("user:1") == {"name": "Alice"}  # served, then checked
+        await asyncio.gather(*cache._validations.values())
+        assert await cache.get("user:1") == {"name": "Bob"}
+        await cache.close()
+
+    asyncio.run(scenario())
+
+
+def test_mget_and_writes_go_through_the_core_cache(tmp_path):
+    async def scenario():
+        origin = AsyncDictionaryOriginStore({"user:1": 1, "user:2": 2})
+        cache = build_cache(tmp_path, origin, validate_async=False)
+        await cache.set("local", "x", ttl=30)
+        assert await cache.mget(["user:1", "local", "nope"]) == [1, "x", None]
+        assert sorted(cache.keys()) == ["local", "user:1"]
+        assert await cache.mdelete(["user:1", "local"]) == 2
+
+        with pytest.raises(RuntimeError):
+            cache.cache.get("user:2")  # the core never reads the origin itself
+        await cache.close()
+
+    asyncio.run(scenario())
+
+
+def test_sqlite_origin_runs_off_the_event_loop(tmp_path):
+    async def scenario():
+        origin = AsyncSQLiteUserOriginStore(tmp_path / "users.db", workers=2)
+        repo = SQLiteUserRepository(tmp_path / "users.db", store=origin.store)
+        await origin.call(repo.upsert_user, "alice", "a@example.com")
+
+        cache = build_cache(tmp_path, origin, validate_async=False)
+        user = {"username": "alice", "email": "a@example.com"}
+        assert await cache.get("alice") == user
+        assert await cache.mget(["alice", "bob"]) == [user, None]
+        await cache.close()
+        origin.close()
+
+    asyncio.run(scenario())
+
+
+class SlowPersistence(JSONPersistence):
+    def save(self, data):
+        time.sleep(0.2)
+        super().save(data)
+
+
+def test_persistence_writes_do_not_block_the_event_loop(tmp_path):
+    async def scenario():
+        origin = AsyncDictionaryOriginStore({"user:1": {"name": "Alice"}})
+        cache = AsyncMiniRedis(
+            origin, persistence=SlowPersistence(tmp_path / "cache.json")
+        )
+        ticks = 0
+
+        async def ticker():
+            nonlocal ticks
+            while True:
+                await asyncio.sleep(0.01)
+                ticks += 1
+
+        task = asyncio.get_running_loop().create_task(ticker())
+        await cache.set("greeting", "hi")
+        await cache.get("user:1")  # a miss stores, and saves, too
+        task.cancel()
+        assert ticks >= 10
+        assert await cache.get("greeting") == "hi"
+        await cache.close()
+
+    asyncio.run(scenario())
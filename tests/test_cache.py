@@ -42,3 +42,48 @@ def test_hash_mismatch_triggers_refresh(tmp_path):
     cache.get("user:1")  # triggers validation
     assert cache.get("user:1") == {"name": "Bob"}
 
+
+class CountingOrigin(DictionaryOriginStore):
+    def __init__(self, seed):
+        super().__init__(seed)
+        self.batch_calls = 0
+
+    def fetch_values(self, keys):
+        self.batch_calls += 1
+        return super().fetch_values(keys)
+
+    def fetch_hashes(self, keys):
+        self.batch_calls += 1
+        return super().fetch_hashes(keys)
+
+
+def test_mget_batches_misses(tmp_path):
+    origin = CountingOrigin({"user:1": {"name": "Alice"}, "user:2": {"name": "Bob"}})
+    cache = MiniRedis(
+        origin, persistence=JSONPersistence(tmp_path / "cache.json"), validate_async=False
+    )
+    cache.set("user:3", {"name": "Carol"})
+
+    values = cache.mget(["user:1", "user:2", "user:3", "user:4"])
+
+    assert values == [{"name": "Alice"}, {"name": "Bob"}, {"name": "Carol"}, None]
+    # One batch validates the cached hit, one loads both misses.
+    assert origin.batch_calls == 2
+    assert set(cache.keys()) == {"user:1", "user:2", "user:3"}
+
+
+def test_mget_refreshes_stale_entries(tmp_path):
+    cache = build_cache(tmp_path, {"user:1": {"name": "Alice"}})
+    cache.mget(["user:1"])
+    cache.origin_store.update("user:1", {"name": "Bob"})  # type: ignore[attr-defined]
+
+    assert cache.mget(["user:1"]) == [{"name": "Bob"}]
+
+
+def test_mset_and_mdelete(tmp_path):
+    cache = build_cache(tmp_path, {})
+    cache.mset({"a": 1, "b": 2, "c": 3}, ttl=60)
+    assert sorted(JSONPersistence(tmp_path / "cache.json").load()) == ["a", "b", "c"]
+
+    assert cache.mdelete(["a", "b", "missing"]) == 2
+    assert cache.keys() == ["c"]
@@ -0,0 +1,108 @@
+from __future__ import annotations
+
+import copy
+import datetime
+
+import pytest
+
+from redsnano.cache import MiniRedis
+from redsnano.cache_types import CacheEntry
+from redsnano.hashing import canonical_bytes, compute_hash, pack_digest, unpack_digest
+from redsnano.origin import DictionaryOriginStore
+from redsnano.persistence import JSONPersistence
+
+
+@pytest.mark.parametrize(
+    "digest", ["ab" * 32, "b2:" + "cd" * 16, "x64:00ff", "not-hex", "ABCD"]
+)
+def test_digests_round_trip_through_their_packed_form(digest):
+    packed = pack_digest(digest)
+    assert unpack_digest(packed) == digest
+    if digest == "ab" * 32:
+        assert packed == b"\x00" + bytes.fromhex(digest)
+
+
+def test_entries_are_slotted_and_pack_json_values():
+    value = {"name": "Alice", "bio": "lorem ipsum " * 50}
+    entry = CacheEntry(value=value, hash=compute_hash(value), expire_at=5.0)
+    assert not hasattr(entry, "__dict__")
+    before = copy.copy(entry)
+
+    stored = entry.pack(canonical_bytes(value))
+    assert entry.compressed and len(stored) < len(canonical_bytes(value))
+    assert entry.value == value and entry.value is not value
+    assert entry == before
+    assert entry.to_serialized()["hash"] == compute_hash(value)
+
+    small = CacheEntry(value=[1], hash=compute_hash([1]))
+    assert small.pack(b"[1]") == b"[1]" and small.packed and not small.compressed
+
+
+def test_values_without_a_json_round_trip_stay_objects():
+    for value in [(1, 2), {"when": datetime.date(2024, 1, 1)}, {3, 4}]:
+        entry = CacheEntry(value=value, hash=compute_hash(value))
+        assert entry.pack(canonical_bytes(value)) is None
+        assert entry.value is value
+
+
+def test_cache_packs_values_over_the_threshold(tmp_path):
+    large = {"name": "Alice", "bio": "x" * 2000}
+    origin = DictionaryOriginStore({"user:1": large})
+    cache = MiniRedis(
+        origin,
+        persistence=JSONPersistence(tmp_path / "cache.json"),
+        validate_async=False,
+        compress_threshold=64,
+        max_memory_bytes=1 << 20,
+        shards=1,
+    )
+    cache.set("small", 1)
+    assert cache.get("user:1") == large  # loaded, packed, validated on the hit
+    assert cache.get("user:1") == large
+
+    assert cache._peek("user:1").compressed
+    assert not cache._peek("small").packed
+    assert cache._peek("user:1").size < 2000
+    cache.close()
+
+    reopened = MiniRedis(
+        origin,
+        persistence=JSONPersistence(tmp_path / "cache.json"),
+        compress_threshold=64,
+    )
+    assert reopened._peek("user:1").compressed
+    assert reopened._peek("user:1").value == large
+    reopened.close()
+
+
+def test_json_bytes_come_from_what_the_entry_holds():
+    value = {"name": "Zoë", "tags": ["a"] * 40}
+    encoded = canonical_bytes(value)
+    entry = CacheEntry(value=value, hash=compute_hash(value))
+    assert entry.json_bytes() == encoded  # encoded on demand
+
+    entry.keep_encoded(encoded)
+    assert entry.json_bytes() is encoded
+    entry.pack(encoded)
+    assert entry.compressed and entry.json_bytes() == encoded
+
+    odd = CacheEntry(value=object(), hash="h")
+    with pytest.raises(TypeError):
+        odd.json_bytes()
+
+
+def test_cache_keeps_encoded_values(tmp_path):
+    origin = DictionaryOriginStore({"user:1": {"name": "Alice"}})
+    cache = MiniRedis(
+        origin,
+        persistence=JSONPersistence(tmp_path / "cache.json"),
+        validate_async=False,
+        keep_encoded=True,
+    )
+    cache.set("pair", (1, "a"))
+    assert cache.get_encoded("user:1") == b'{"name":"Alice"}'
+    assert cache._peek("user:1")._encoded == b'{"name":"Alice"}'
+    assert cache.get_encoded("pair") == b'[1,"a"]'
+    assert cache.get("pair") == (1, "a")  # the object is still what get() returns
+    assert cache.get_encoded("missing") is None
+    cache.close()
@@ -0,0 +1,152 @@
+from __future__ import annotations
+
+import sqlite3
+
+from redsnano.cache import MiniRedis
+from redsnano.changefeed import InMemoryChangeFeed
+from redsnano.origin import DictionaryOriginStore
+from redsnano.origin_sqlite import SQLiteUserOriginStore, SQLiteUserRepository
+from redsnano.persistence import JSONPersistence
+
+
+class CountingOrigin(DictionaryOriginStore):
+    def __init__(self, seed):
+        super().__init__(seed)
+        self.hash_calls = 0
+
+    def fetch_hash(self, key):
+        self.hash_calls += 1
+        return super().fetch_hash(key)
+
+
+def build_cache(tmp_path, origin, **kwargs):
+    return MiniRedis(
+        origin,
+        persistence=JSONPersistence(tmp_path / "cache.json"),
+        validate_async=False,
+        change_feed=origin.change_feed,
+        change_feed_interval=60,
+        **kwargs,
+    )
+
+
+def test_in_memory_feed_reads_by_sequence():
+    feed = InMemoryChangeFeed(max_changes=3)
+    feed.publish(["a", "b"])
+    assert [change.key for change in feed.changes_since(0)] == ["a", "b"]
+    assert [change.key for change in feed.changes_since(1)] == ["b"]
+
+    feed.publish(["c", "d"])
+    assert feed.latest_seq() == 4
+    # "a" was trimmed: the first change returned is not seq 1.
+    assert [change.seq for change in feed.changes_since(0)] == [2, 3, 4]
+    assert feed.changes_since(4) == []
+    assert feed.wait_for_changes(3, timeout=0)
+
+
+def test_hits_skip_origin_and_changes_invalidate(tmp_path):
+    origin = CountingOrigin({"user:1": {"name": "Alice"}, "user:2": {"name": "Bob"}})
+    cache = build_cache(tmp_path, origin)
+    try:
+        cache.get("user:1")
+        cache.get("user:2")
+        for _ in range(5):
+            assert cache.get("user:1") == {"name": "Alice"}
+        assert origin.hash_calls == 0
+
+        origin.update("user:1", {"name": "Alicia"})
+        cache.sync_changes()
+
+        assert set(cache.keys()) == {"user:2"}
+        assert cache.get("user:1") == {"name": "Alicia"}
+        info = cache.info()
+        assert info["change_feed_seq"] == 1
+        assert info["change_feed_invalidations"] == 1
+        assert 0 <= info["change_feed_lag"] < 60
+    finally:
+        cache.close()
+
+
+def test_stale_feed_falls_back_to_validation(tmp_path):
+    origin = CountingOrigin({"user:1": {"name": "Alice"}})
+    cache = build_cache(tmp_path, origin, max_feed_lag=0)
+    try:
+        cache.get("user:1")
+        cache._feed_synced_at -= 1  # simulate a feed that stopped updating
+        assert cache.get("user:1") == {"name": "Alice"}
+        assert origin.hash_calls == 1
+    finally:
+        cache.close()
+
+
+def test_trimmed_changes_drop_every_key(tmp_path):
+    origin = DictionaryOriginStore({"user:1": 1, "user:2": 2})
+    origin.change_feed = InMemoryChangeFeed(max_changes=1)
+    cache = build_cache(tmp_path, origin)
+    try:
+        cache.mget(["user:1", "user:2"])
+        origin.update("user:3", 3)
+        origin.update("user:3", 4)
+
+        cache.sync_changes()
+
+        assert cache.keys() == []
+        assert cache.info()["change_feed_resets"] == 1
+    finally:
+        cache.close()
+
+
+def test_sqlite_changelog_records_every_writer(tmp_path):
+    db_path = tmp_path / "users.db"
+    store = SQLiteUserOriginStore(db_path)
+    repo = SQLiteUserRepository(db_path, store=store)
+    feed = store.change_feed
+
+    repo.upsert_user("alice", "a@example.com")
+    repo.upsert_user("alice", "a@example.com")  # unchanged: not logged
+    with sqlite3.connect(db_path) as conn:
+        conn.execute("UPDATE users SET email='b@example.com' WHERE username='alice'")
+        conn.execute("DELETE FROM users WHERE username='alice'")
+
+    changes = feed.changes_since(0)
+    assert [(change.seq, change.key) for change in changes] == [
+        (1, "alice"),
+        (2, "alice"),
+        (3, "alice"),
+    ]
+    assert feed.latest_seq() == 3
+    assert feed.trim(changes[-1].changed_at + 1) == 3
+    assert feed.changes_since(0) == []
+    assert feed.latest_seq() == 3
+    store.close()
+
+
+def test_sqlite_changelog_stays_bounded_without_a_reader(tmp_path):
+    db_path = tmp_path / "users.db"
+    store = SQLiteUserOriginStore(db_path, max_changes=100)
+    repo = SQLiteUserRepository(db_path, store=store)
+    for i in range(500):
+        repo.upsert_user(f"user{i % 50}", f"{i}@example.com")
+
+    with sqlite3.connect(db_path) as conn:
+        (rows,) = conn.execute("SELECT COUNT(*) FROM users_changelog").fetchone()
+    assert rows == 100
+    feed = store.change_feed
+    assert feed.latest_seq() == 500
+    assert [change.seq for change in feed.changes_since(0, limit=2)] == [401, 402]
+    store.close()
+
+
+def test_reopening_the_sqlite_store_writes_nothing(tmp_path):
+    db_path = tmp_path / "users.db"
+    SQLiteUserOriginStore(db_path, max_changes=100).close()
+    before = db_path.read_bytes()
+    SQLiteUserOriginStore(db_path, max_changes=100).close()
+    assert db_path.read_bytes() == before
+
+    store = SQLiteUserOriginStore(db_path, max_changes=2)  # a new cap applies
+    repo = SQLiteUserRepository(db_path, store=store)
+    for i in range(5):
+        repo.upsert_user("alice", f"{i}@example.com")
+    assert [change.seq for change in store.change_feed.changes_since(0)] == [4, 5]
+    store.close()
@@ -0,0 +1,84 @@
+from __future__ import annotations
+
+import socket
+
+import pytest
+
+from redsnano.client import HashRing, HTTPClient, RESPClient, ShardedClient
+
+ORIGIN = {"user:1": {"name": "Alice"}, "user:2": {"name": "Bob"}}
+
+
+@pytest.fixture
+def http_servers(server_process):
+    return [server_process(f"node{n}", "run_server", ORIGIN) for n in range(3)]
+
+
+@pytest.fixture
+def resp_server(server_process):
+    return server_process("resp", "run_resp_server", ORIGIN)
+
+
+def test_http_client_reuses_connections_and_batches(http_servers):
+    with HTTPClient("127.0.0.1", http_servers[0], pool_size=2) as client:
+        assert client.get("user:1") == {"name": "Alice"}
+        client.set("greeting", {"text": "hi"}, ttl=30)
+        assert client.mget(["greeting", "nope"]) == [{"text": "hi"}, None]
+        result = client.batch(delete=["greeting"], get=["user:2", "greeting"])
+        assert result == {
+            "deleted": 1,
+            "values": {"user:2": {"name": "Bob"}},
+            "missing": ["greeting"],
+        }
+        assert sorted(client.keys("user:*")) == ["user:1", "user:2"]
+        assert len(client._pool._idle) == 1  # one keep-alive connection served all
+
+
+def test_http_client_retries_on_a_fresh_connection(http_servers):
+    with HTTPClient("127.0.0.1", http_servers[0]) as client:
+        assert client.get("user:1") == {"name": "Alice"}
+        client._pool._idle[0].sock.shutdown(socket.SHUT_RDWR)  # connection lost
+        assert client.get("user:2") == {"name": "Bob"}
+
+
+def test_resp_client_pipelines_commands(resp_server):
+    with RESPClient("127.0.0.1", resp_server) as client:
+        assert client.ping()
+        with client.pipeline() as pipe:
+            pipe.set("a", "1").set("b", {"n": 2}, ttl=30).get("user:1")
+            replies = pipe.execute()
+        assert replies == ["OK", "OK", b'{"name":"Alice"}']
+        assert client.mget(["a", "b", "nope"]) == ["1", '{"n":2}', None]
+        assert 0 < client.ttl("b") <= 30
+        assert client.mdelete(["a", "b"]) == 2
+
+
+def test_sharded_client_spreads_keys_over_servers(http_servers):
+    addresses = [f"127.0.0.1:{port}" for port in http_servers]
+    with ShardedClient(addresses, timeout=5) as client:
+        items = {f"item:{i}": i for i in range(60)}
+        client.mset(items)
+        assert client.mget(list(items)) == list(items.values())
+
+        per_node = {
+            node: len(node_client.keys("item:*"))
+            for node, node_client in client.clients.items()
+        }
+        assert sum(per_node.values()) == 60
+        assert all(per_node.values())
+        for key in ("item:0", "item:7"):
+            assert key in client.client_for(key).keys("item:*")
+        assert client.mdelete(items) == 60
+
+
+def test_hash_ring_moves_few_keys_when_a_node_joins():
+    keys = [f"key:{i}" for i in range(2000)]
+    ring = HashRing(["a", "b", "c"])
+    before = {key: ring.node_for(key) for key in keys}
+    ring.add("d")
+    moved = [key for key in keys if ring.node_for(key) != before[key]]
+
+    assert all(ring.node_for(key) == "d" for key in moved)
+    assert 0.15 < len(moved) / len(keys) < 0.35
+    ring.remove("d")
+    assert {key: ring.node_for(key) for key in keys} == before
@@ -0,0 +1,81 @@
+from __future__ import annotations
+
+from pathlib import Path
+
+import pytest
+
+from redsnano.cache import MiniRedis
+from redsnano.eviction import LFUPolicy, make_eviction_policy
+from redsnano.origin import DictionaryOriginStore
+from redsnano.persistence import JSONPersistence
+
+
+def build_cache(tmp_path: Path, **options) -> MiniRedis:
+    persistence = JSONPersistence(tmp_path / "cache.json")
+    return MiniRedis(
+        DictionaryOriginStore(), persistence=persistence, validate_async=False, **options
+    )
+
+
+def test_lru_evicts_least_recently_used(tmp_path):
+    cache = build_cache(tmp_path, max_entries=2)
+    cache.set("a", 1)
+    cache.set("b", 2)
+    cache.get("a")
+    cache.set("c", 3)
+
+    assert sorted(cache.keys()) == ["a", "c"]
+    assert cache.info()["evicted_keys"] == 1
+    assert sorted(JSONPersistence(tmp_path / "cache.json").load()) == ["a", "c"]
+
+
+def test_memory_limit_is_enforced(tmp_path):
+    cache = build_cache(tmp_path, max_memory_bytes=1_000)
+    for i in range(20):
+        cache.set(f"user:{i}", {"name": "x" * 50})
+
+    info = cache.info()
+    assert 0 < info["used_memory"] <= 1_000
+    assert info["keys"] + info["evicted_keys"] == 20
+
+
+def test_volatile_ttl_evicts_soonest_expiry_first(tmp_path):
+    cache = build_cache(tmp_path, max_entries=2, eviction_policy="volatile-ttl")
+    cache.set("permanent", 1)
+    cache.set("long", 2, ttl=600)
+    cache.set("short", 3, ttl=60)
+
+    assert sorted(cache.keys()) == ["long", "permanent"]
+
+
+def test_lfu_keeps_frequently_read_keys(tmp_path):
+    policy = LFUPolicy(samples=10, seed=7)
+    cache = build_cache(tmp_path, max_entries=5, eviction_policy=policy)
+    cache.set("hot", 0)
+    for _ in range(50):
+        cache.get("hot")
+    for i in range(20):
+        cache.set(f"cold:{i}", i)
+
+    assert "hot" in cache.keys()
+    assert len(cache.keys()) == 5
+
+
+def test_unknown_policy_is_rejected():
+    with pytest.raises(ValueError):
+        make_eviction_policy("fifo")
+
+
+def test_default_shards_keep_size_limits_exact(tmp_path):
+    cache = build_cache(tmp_path, max_memory_bytes=2000)
+    cache.mset({f"k{i}": "x" * 100 for i in range(50)})
+    assert 0 < cache.info()["keys"] < 50
+    assert cache.info()["used_memory"] <= 2000
+    cache.set("big", "x" * 1500)  # more than a sixteenth of the limit
+    assert cache.get("big") == "x" * 1500
+    cache.close()
+
+    cache = build_cache(tmp_path, max_entries=10)
+    cache.mset({f"k{i}": i for i in range(100)})
+    assert sorted(cache.keys()) == sorted(f"k{i}" for i in range(90, 100))
+    cache.close()
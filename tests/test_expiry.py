@@ -0,0 +1,70 @@
+from __future__ import annotations
+
+import time
+from pathlib import Path
+
+from redsnano.cache import MiniRedis
+from redsnano.origin import DictionaryOriginStore
+from redsnano.persistence import JSONPersistence
+
+
+class CountingPersistence(JSONPersistence):
+    def __init__(self, path: Path):
+        super().__init__(path)
+        self.saves = 0
+
+    def save(self, data):
+        self.saves += 1
+        super().save(data)
+
+
+def build_cache(tmp_path: Path, **options) -> MiniRedis:
+    persistence = CountingPersistence(tmp_path / "cache.json")
+    return MiniRedis(
+        DictionaryOriginStore(), persistence=persistence, validate_async=False, **options
+    )
+
+
+def test_unread_keys_are_reclaimed_in_background(tmp_path):
+    cache = build_cache(tmp_path, expiry_hz=100)
+    cache.set("session:1", {"token": "abc"}, ttl=0.05)
+    cache.set("permanent", {"token": "xyz"})
+
+    deadline = time.time() + 2
+    while cache.info()["keys"] > 1 and time.time() < deadline:
+        time.sleep(0.01)
+    cache.close()
+
+    assert cache.info()["expired_keys"] == 1
+    assert list(JSONPersistence(tmp_path / "cache.json").load()) == ["permanent"]
+
+
+def test_keys_skip_expired_entries(tmp_path):
+    cache = build_cache(tmp_path, active_expiry=False)
+    cache.set("short", 1, ttl=0.01)
+    cache.set("long", 2, ttl=60)
+    time.sleep(0.02)
+
+    assert cache.keys() == ["long"]
+
+
+def test_expire_cycle_batches_persistence(tmp_path):
+    cache = build_cache(tmp_path, active_expiry=False)
+    for i in range(100):
+        cache.set(f"key:{i}", i, ttl=0.01)
+    time.sleep(0.02)
+    saves_before = cache.persistence.saves  # type: ignore[attr-defined]
+
+    assert cache.expire_cycle() == 100
+    assert cache.persistence.saves == saves_before + 1  # type: ignore[attr-defined]
+    assert cache.info()["keys"] == 0
+
+
+def test_overwritten_key_is_not_expired_early(tmp_path):
+    cache = build_cache(tmp_path, active_expiry=False)
+    cache.set("key", 1, ttl=0.01)
+    cache.set("key", 2, ttl=60)
+    time.sleep(0.02)
+
+    assert cache.expire_cycle() == 0
+    assert cache.get("key") == 2
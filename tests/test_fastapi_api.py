@@ -2,16 +2,18 @@ from __future__ import annotations
 
 from pathlib import Path
 
+import pytest
 from fastapi.testclient import TestClient
 
 from redsnano.fastapi_app import create_app
 from redsnano.origin_sqlite import SQLiteUserRepository
+from redsnano.persistence import AppendOnlyPersistence
 
 
-def build_client(tmp_path: Path) -> TestClient:
+def build_client(tmp_path: Path, **options) -> TestClient:
     db_path = tmp_path / "users.db"
     cache_path = tmp_path / "cache.json"
-    app = create_app(db_path=db_path, cache_path=cache_path, default_ttl=1)
+    app = create_app(db_path=db_path, cache_path=cache_path, default_ttl=1, **options)
     return TestClient(app)
 
 
@@ -27,9 +29,22 @@ def test_register_and_fetch_user(tmp_path):
     assert resp.json()["email"] == "alice@mail.com"
 
 
-def test_cache_serves_before_db(tmp_path):
+def test_persistence_backend_can_be_chosen(tmp_path):
+    aof_path = tmp_path / "cache.aof"
+    client = build_client(
+        tmp_path, persistence=AppendOnlyPersistence(aof_path, fsync="no")
+    )
+    client.post("/users", json={"username": "alice", "email": "alice@mail.com"})
+    client.app.state.cache.close()
+
+    assert b'"alice"' in aof_path.read_bytes()
+    assert not (tmp_path / "cache.json").exists()
+
+
+@pytest.mark.parametrize("async_mode", [False, True])
+def test_cache_serves_before_db(tmp_path, async_mode):
     db_path = tmp_path / "users.db"
-    client = build_client(tmp_path)
+    client = build_client(tmp_path, async_mode=async_mode, keep_encoded=True)
     repo = SQLiteUserRepository(db_path)
 
     client.post("/users", json={"username": "bob", "email": "bob@mail.com"})
@@ -37,5 +52,54 @@ def test_cache_serves_before_db(tmp_path):
     repo.upsert_user("bob", "new@mail.com")
     resp = client.get("/users/bob")
     assert resp.status_code == 200
+    assert resp.headers["content-type"] == "application/json"
     assert resp.json()["email"] == "new@mail.com"
 
+
+@pytest.mark.parametrize("async_mode", [False, True])
+def test_batch_register_and_fetch(tmp_path, async_mode):
+    client = build_client(tmp_path, async_mode=async_mode)
+
+    resp = client.post(
+        "/users/batch",
+        json={
+            "users": [
+                {"username": "carol", "email": "carol@mail.com"},
+                {"username": "dave", "email": "dave@mail.com"},
+            ]
+        },
+    )
+    assert resp.status_code == 201
+
+    resp = client.post("/users/mget", json={"usernames": ["carol", "dave", "erin"]})
+    assert resp.status_code == 200
+    body = resp.json()
+    assert [user["username"] for user in body["users"]] == ["carol", "dave"]
+    assert body["missing"] == ["erin"]
+
+
+@pytest.mark.parametrize("async_mode", [False, True])
+def test_stats_and_metrics_endpoints(tmp_path, async_mode):
+    client = build_client(tmp_path, async_mode=async_mode)
+    client.post("/users", json={"username": "frank", "email": "frank@mail.com"})
+    client.get("/users/frank")
+    client.get("/users/nobody")
+
+    stats = client.get("/stats").json()
+    assert stats["counters"]["keyspace_misses"] == 1
+    assert stats["latency"]["get"]["count"] == 2
+
+    resp = client.get("/metrics")
+    assert resp.headers["content-type"].startswith("text/plain")
+    assert "redsnano_sqlite_queries_total" in resp.text
+
+
+def test_slowlog_endpoints(tmp_path):
+    client = build_client(tmp_path)
+    client.app.state.cache.slowlog.threshold = 0
+    client.post("/users", json={"username": "gina", "email": "gina@mail.com"})
+
+    entries = client.get("/slowlog", params={"count": 1}).json()["entries"]
+    assert [entry["command"] for entry in entries] == ["set"]
+    assert client.delete("/slowlog").json() == {"reset": True}
+    assert client.get("/slowlog").json()["len"] == 0
@@ -0,0 +1,99 @@
+from __future__ import annotations
+
+import datetime
+import json
+import sqlite3
+
+import pytest
+
+from redsnano import hashing
+from redsnano.hashing import (
+    canonical_bytes,
+    compute_hash,
+    get_hash_algorithm,
+    is_current_digest,
+    set_hash_algorithm,
+)
+from redsnano.origin import DictionaryOriginStore
+from redsnano.origin_sqlite import SQLiteUserOriginStore, SQLiteUserRepository
+
+
+@pytest.fixture(autouse=True)
+def reset_algorithm():
+    yield
+    set_hash_algorithm("sha256")
+
+
+def test_canonical_bytes_are_sorted_compact_json():
+    value = {"b": 1, "a": ["é", 2.5], "c": None}
+    assert canonical_bytes(value) == json.dumps(
+        value, sort_keys=True, separators=(",", ":"), ensure_ascii=False
+    ).encode("utf-8")
+    assert canonical_bytes({"a": 1, "b": 2}) == canonical_bytes({"b": 2, "a": 1})
+
+
+@pytest.mark.parametrize(
+    "value",
+    [
+        {"big": 1e16, "small": 1e-07, "huge": -1.5e300, "tiny": 0.000015},
+        [1.0000000000000001e23, 2.5, 10**30, "1e16 0.00001 \"e-5"],
+        {"nan": float("nan"), "inf": [float("inf")], "ok": 1.5},
+    ],
+)
+def test_canonical_bytes_do_not_depend_on_orjson(monkeypatch, value):
+    with_orjson = canonical_bytes(value)
+    monkeypatch.setattr(hashing, "orjson", None)
+    assert canonical_bytes(value) == with_orjson
+
+
+def test_canonical_floats_use_the_stdlib_form():
+    assert canonical_bytes([1e16, 1e-07, 1.5e300, "1e16"]) == (
+        b'[1e+16,1e-07,1.5e+300,"1e16"]'
+    )
+
+
+def test_common_non_json_types_hash_stably():
+    value = {"tags": {"x", "y"}, "at": datetime.date(2024, 1, 2), "raw": b"\x00"}
+    assert canonical_bytes(value) == b'{"at":"2024-01-02","raw":"AA==","tags":["x","y"]}'
+
+
+def test_algorithm_selection_prefixes_digests():
+    sha = compute_hash({"name": "Alice"})
+    set_hash_algorithm("blake2b")
+
+    digest = compute_hash({"name": "Alice"})
+    assert get_hash_algorithm() == "blake2b"
+    assert digest.startswith("b2:") and len(digest) == 3 + 32
+    assert is_current_digest(digest) and not is_current_digest(sha)
+
+    with pytest.raises(ValueError):
+        set_hash_algorithm("md5")
+
+
+def test_dictionary_store_caches_digests_until_update():
+    store = DictionaryOriginStore({"user:1": {"name": "Alice"}})
+    first = store.fetch_hash("user:1")
+    assert store.fetch_hash("user:1") is first
+
+    store.update("user:1", {"name": "Bob"})
+    assert store.fetch_hash("user:1") == compute_hash({"name": "Bob"})
+
+    set_hash_algorithm("blake2b")
+    assert store.fetch_hash("user:1") == compute_hash({"name": "Bob"})
+
+
+def test_sqlite_rehashes_rows_stored_with_another_algorithm(tmp_path):
+    db_path = tmp_path / "users.db"
+    store = SQLiteUserOriginStore(db_path)
+    SQLiteUserRepository(db_path, store=store).upsert_user("alice", "a@example.com")
+
+    set_hash_algorithm("blake2b")
+    expected = compute_hash({"username": "alice", "email": "a@example.com"})
+    assert store.fetch_hash("alice") == expected
+
+    store.close()
+
+    SQLiteUserOriginStore(db_path).close()  # stored digests are redone on open
+    with sqlite3.connect(db_path) as conn:
+        (stored,) = conn.execute("SELECT content_hash FROM users").fetchone()
+    assert stored == expected
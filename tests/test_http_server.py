@@ -0,0 +1,186 @@
+from __future__ import annotations
+
+import http.client
+import json
+import socket
+import threading
+import time
+
+import pytest
+
+from redsnano.cache import MiniRedis
+from redsnano.origin import DictionaryOriginStore
+from redsnano.persistence import JSONPersistence
+from redsnano.server import KEYS_CHUNK_SIZE, MiniRedisHTTPServer
+
+
+@pytest.fixture
+def http_server(tmp_path):
+    origin = DictionaryOriginStore({"user:1": {"name": "Alice"}})
+    cache = MiniRedis(
+        origin,
+        persistence=JSONPersistence(tmp_path / "cache.json"),
+        default_ttl=60,
+        validate_async=False,
+    )
+    server = MiniRedisHTTPServer(("127.0.0.1", 0), cache, workers=2)
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    yield server
+    server.shutdown()
+    server.server_close()
+    thread.join()
+    cache.close()
+
+
+def request(conn, method, path, body=None):
+    payload = json.dumps(body) if body is not None else None
+    conn.request(method, path, body=payload)
+    response = conn.getresponse()
+    return response.status, json.loads(response.read())
+
+
+def test_requests_share_a_keep_alive_connection(http_server):
+    conn = http.client.HTTPConnection(*http_server.server_address, timeout=5)
+    status, body = request(conn, "GET", "/cache/user:1")
+    assert (status, body["value"]) == (200, {"name": "Alice"})
+    sock = conn.sock
+
+    status, _ = request(conn, "PUT", "/cache/greeting", {"value": "hi", "ttl": 5})
+    status, body = request(conn, "POST", "/nowhere", {"keys": []})
+    assert status == 404
+    status, body = request(conn, "POST", "/mget", {"keys": ["greeting", "nope"]})
+
+    assert body == {"values": {"greeting": "hi"}, "missing": ["nope"]}
+    assert conn.sock is sock  # no reconnect happened
+    conn.close()
+
+
+def test_idle_keep_alive_connections_do_not_hold_workers(http_server):
+    address = http_server.server_address
+    idle = [http.client.HTTPConnection(*address, timeout=5) for _ in range(2)]
+    for conn in idle:
+        assert request(conn, "GET", "/cache/user:1")[0] == 200
+
+    # Both workers would still be waiting on the idle connections.
+    started = time.monotonic()
+    conn = http.client.HTTPConnection(*address, timeout=5)
+    assert request(conn, "GET", "/cache/user:1")[0] == 200
+    assert time.monotonic() - started < 1
+    for reused in idle:  # parked connections come back to a worker
+        assert request(reused, "GET", "/stats")[0] == 200
+
+    with socket.create_connection(address, timeout=5) as sock:
+        sock.sendall(b"GET /cache/user:1 HTTP/1.1\r\nHost: x\r\n\r\n" * 2)
+        received = b""
+        while received.count(b"HTTP/1.1 200") < 2:
+            received += sock.recv(65536)
+    for conn in [*idle, conn]:
+        conn.close()
+
+
+def test_get_splices_the_stored_json_into_the_response(http_server):
+    cache = http_server.RequestHandlerClass.cache
+    cache.keep_encoded = True
+    large = {"bio": "é" * 500_000}  # more than one socket send
+    cache.set("big", large)
+    conn = http.client.HTTPConnection(*http_server.server_address, timeout=5)
+
+    conn.request("GET", "/cache/big")
+    response = conn.getresponse()
+    raw = response.read()
+    assert int(response.getheader("Content-Length")) == len(raw)
+    assert json.loads(raw) == {"key": "big", "value": large}
+
+    status, body = request(conn, "GET", "/cache/user:1")  # same connection
+    assert (status, body) == (200, {"key": "user:1", "value": {"name": "Alice"}})
+    conn.close()
+
+
+def test_ttl_query_parameter_is_scoped_to_the_request(http_server):
+    conn = http.client.HTTPConnection(*http_server.server_address, timeout=5)
+    status, _ = request(conn, "GET", "/cache/user:1?ttl=5")
+    assert status == 200
+
+    cache = http_server.RequestHandlerClass.cache
+    assert cache.default_ttl == 60
+    assert 0 < cache.ttl("user:1") <= 5
+    status, body = request(conn, "GET", "/cache/user:1?ttl=soon")
+    assert (status, body) == (400, {"error": "ttl must be a number"})
+    conn.close()
+
+
+def test_batch_endpoint_and_streamed_key_listing(http_server):
+    conn = http.client.HTTPConnection(*http_server.server_address, timeout=5)
+    items = {f"item:{i}": i for i in range(KEYS_CHUNK_SIZE + 5)}
+    status, body = request(
+        conn, "POST", "/batch", {"set": items, "get": ["item:3", "user:1", "nope"]}
+    )
+    assert status == 200
+    assert body["values"] == {"item:3": 3, "user:1": {"name": "Alice"}}
+    assert body["missing"] == ["nope"]
+
+    conn.request("GET", "/keys?pattern=item:*")
+    response = conn.getresponse()
+    assert response.getheader("Transfer-Encoding") == "chunked"
+    listing = json.loads(response.read())
+    assert listing["count"] == len(items)
+    assert sorted(listing["keys"]) == sorted(items)
+    conn.close()
+
+
+@pytest.mark.parametrize(
+    "method, path, body",
+    [
+        ("PUT", "/cache/k", {"value": 1, "ttl": "abc"}),
+        ("PUT", "/cache/k", {"value": 1, "ttl": -1}),
+        ("PUT", "/cache/k?ttl=-1", {"value": 1}),
+        ("POST", "/mget", {"keys": [["a"]]}),
+        ("POST", "/mget", {"keys": "a"}),
+        ("POST", "/mdelete", {"keys": [1]}),
+        ("POST", "/mset", {"items": {"a": 1}, "ttl": "abc"}),
+        ("POST", "/mset", {"items": {"a": 1}, "ttl": -1}),
+        ("POST", "/batch", {"get": ["a", None]}),
+        ("POST", "/batch", {"get": ["a"], "ttl": True}),
+    ],
+)
+def test_malformed_bodies_are_rejected(http_server, method, path, body):
+    conn = http.client.HTTPConnection(*http_server.server_address, timeout=5)
+    status, _ = request(conn, method, path, body)
+    assert status == 400
+    status, _ = request(conn, "GET", "/cache/user:1")  # connection still usable
+    assert status == 200
+    conn.close()
+    assert "k" not in http_server.RequestHandlerClass.cache.keys()
+
+
+def test_stats_and_prometheus_metrics(http_server):
+    conn = http.client.HTTPConnection(*http_server.server_address, timeout=5)
+    request(conn, "GET", "/cache/user:1")
+    request(conn, "GET", "/cache/user:1")
+    status, stats = request(conn, "GET", "/stats")
+    assert status == 200
+    assert stats["counters"]["keyspace_hits"] == 1
+    assert stats["latency"]["get"]["count"] == 2
+
+    conn.request("GET", "/metrics")
+    response = conn.getresponse()
+    assert response.getheader("Content-Type").startswith("text/plain; version=0.0.4")
+    assert "redsnano_keyspace_misses_total 1" in response.read().decode()
+    conn.close()
+
+
+def test_slowlog_endpoint(http_server):
+    cache = http_server.RequestHandlerClass.cache
+    cache.slowlog.threshold = 0
+    conn = http.client.HTTPConnection(*http_server.server_address, timeout=5)
+    request(conn, "GET", "/cache/user:1")
+
+    status, body = request(conn, "GET", "/slowlog?count=5")
+    assert status == 200
+    assert body["entries"][0]["command"] == "get"
+    assert "origin_fetch" in body["entries"][0]["phases"]
+
+    status, _ = request(conn, "DELETE", "/slowlog")
+    assert status == 200 and len(cache.slowlog) == 0
+    conn.close()
@@ -0,0 +1,79 @@
+from __future__ import annotations
+
+import threading
+
+from redsnano.cache import MiniRedis
+from redsnano.metrics import (
+    Histogram,
+    Metrics,
+    bucket_index,
+    bucket_value,
+    prometheus_text,
+)
+from redsnano.origin import DictionaryOriginStore
+from redsnano.persistence import JSONPersistence
+
+
+def test_histogram_quantiles_stay_within_bucket_error():
+    histogram = Histogram()
+    for micros in range(1, 10_001):
+        histogram.record(micros)
+    assert histogram.count == 10_000
+    assert histogram.max == 10_000
+    for q, expected in ((0.5, 5000), (0.99, 9900), (0.999, 9990)):
+        assert abs(histogram.quantile(q) - expected) <= expected * 0.07
+    for value in (0, 31, 32, 1000, 123_456):
+        assert abs(bucket_value(bucket_index(value)) - value) <= value * 0.07
+
+
+def test_metrics_merge_threads_including_finished_ones():
+    metrics = Metrics()
+
+    def work():
+        for _ in range(100):
+            metrics.incr("ops")
+            metrics.observe("op", 0.001)
+
+    threads = [threading.Thread(target=work) for _ in range(4)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    metrics.incr("ops")
+
+    snapshot = metrics.snapshot()
+    assert snapshot["counters"] == {"ops": 401}
+    assert snapshot["latency"]["op"]["count"] == 400
+    assert snapshot["latency"]["op"]["p50_us"] == 1000
+
+
+def test_cache_counts_hits_misses_and_validations(tmp_path):
+    origin = DictionaryOriginStore({"user:1": {"name": "Alice"}})
+    cache = MiniRedis(
+        origin,
+        persistence=JSONPersistence(tmp_path / "cache.json"),
+        validate_async=False,
+    )
+    cache.get("user:1")
+    origin.update("user:1", {"name": "Bob"})
+    assert cache.get("user:1") == {"name": "Bob"}
+    cache.get("nope")
+    cache.set("local", 1)
+
+    stats = cache.stats()
+    counters = stats["counters"]
+    assert counters["keyspace_hits"] == 1
+    assert counters["keyspace_misses"] == 2
+    assert counters["validations"] == 1
+    assert counters["hash_mismatches"] == 1
+    assert counters["origin_fetches"] == 3
+    assert stats["latency"]["get"]["count"] == 3
+    assert stats["latency"]["set"]["count"] == 1
+    assert stats["info"]["keys"] == 2
+
+    text = prometheus_text(cache.metrics, cache.info())
+    assert "redsnano_keyspace_hits_total 1" in text
+    assert 'redsnano_get_seconds{quantile="0.99"}' in text
+    assert "redsnano_get_seconds_count 3" in text
+    assert "# TYPE redsnano_keys gauge" in text
+    cache.close()
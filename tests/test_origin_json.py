@@ -0,0 +1,61 @@
+from __future__ import annotations
+
+import json
+import time
+
+from redsnano.hashing import compute_hash
+from redsnano.origin import JSONFileOriginStore
+
+
+def write_origin(path, data) -> None:
+    tmp = path.with_suffix(".tmp")
+    tmp.write_text(json.dumps(data), encoding="utf-8")
+    tmp.replace(path)
+
+
+def test_lookups_use_precomputed_index(tmp_path):
+    path = tmp_path / "origin.json"
+    write_origin(path, {"user:1": {"name": "Alice"}})
+    store = JSONFileOriginStore(path)
+
+    assert store.fetch_value("user:1") == {"name": "Alice"}
+    assert store.fetch_hash("user:1") == compute_hash({"name": "Alice"})
+    assert store.fetch_hash("missing") is None
+    assert store.fetch_hashes(["user:1", "missing"]) == {
+        "user:1": compute_hash({"name": "Alice"})
+    }
+
+
+def test_file_changes_are_picked_up(tmp_path):
+    path = tmp_path / "origin.json"
+    write_origin(path, {"user:1": {"name": "Alice"}})
+    store = JSONFileOriginStore(path, background_reload=False)
+    store.fetch_value("user:1")
+
+    write_origin(path, {"user:1": {"name": "Bob"}})
+    assert store.fetch_value("user:1") == {"name": "Bob"}
+
+
+def test_background_reload_swaps_index(tmp_path):
+    path = tmp_path / "origin.json"
+    write_origin(path, {"user:1": {"name": "Alice"}})
+    store = JSONFileOriginStore(path)
+
+    write_origin(path, {"user:1": {"name": "Bob"}})
+    deadline = time.time() + 2
+    while store.fetch_value("user:1") != {"name": "Bob"} and time.time() < deadline:
+        time.sleep(0.01)
+
+    assert store.fetch_hash("user:1") == compute_hash({"name": "Bob"})
+
+
+def test_unparseable_file_keeps_previous_index(tmp_path):
+    path = tmp_path / "origin.json"
+    write_origin(path, {"user:1": {"name": "Alice"}})
+    store = JSONFileOriginStore(path)
+
+    path.write_text('{"user:1": ', encoding="utf-8")
+    store.fetch_value("user:1")
+    store._reload_thread.join()  # type: ignore[union-attr]
+
+    assert store.fetch_value("user:1") == {"name": "Alice"}
@@ -0,0 +1,91 @@
+from __future__ import annotations
+
+import gc
+import sqlite3
+import threading
+
+from redsnano.hashing import compute_hash
+from redsnano.origin_sqlite import SQLiteUserOriginStore, SQLiteUserRepository
+
+
+def stored_row(db_path, username):
+    with sqlite3.connect(db_path) as conn:
+        return conn.execute(
+            "SELECT content_hash, version FROM users WHERE username=?", (username,)
+        ).fetchone()
+
+
+def test_upsert_stores_content_hash(tmp_path):
+    db_path = tmp_path / "users.db"
+    repo = SQLiteUserRepository(db_path)
+    record = repo.upsert_user("alice", "alice@mail.com")
+
+    assert stored_row(db_path, "alice") == (compute_hash(record), 1)
+    assert repo.store.fetch_hash("alice") == compute_hash(record)
+
+    repo.upsert_user("alice", "alice@new.com")
+    assert stored_row(db_path, "alice")[1] == 2
+    assert repo.store.fetch_version("alice") == 2
+
+
+def test_external_writes_invalidate_stored_hash(tmp_path):
+    db_path = tmp_path / "users.db"
+    repo = SQLiteUserRepository(db_path)
+    repo.upsert_user("bob", "bob@mail.com")
+    with sqlite3.connect(db_path) as conn:
+        conn.execute("UPDATE users SET email='bob@other.com' WHERE username='bob'")
+
+    assert stored_row(db_path, "bob") == (None, 2)
+    expected = compute_hash({"username": "bob", "email": "bob@other.com"})
+    assert repo.store.fetch_hashes(["bob", "nobody"]) == {"bob": expected}
+    assert stored_row(db_path, "bob")[0] is None  # reads do not write
+    SQLiteUserOriginStore(db_path).close()  # backfilled on open
+    assert stored_row(db_path, "bob")[0] == expected
+
+
+def test_existing_tables_are_migrated(tmp_path):
+    db_path = tmp_path / "users.db"
+    with sqlite3.connect(db_path) as conn:
+        conn.execute(
+            "CREATE TABLE users (id INTEGER PRIMARY KEY AUTOINCREMENT, "
+            "username TEXT UNIQUE, email TEXT NOT NULL)"
+        )
+        conn.execute("INSERT INTO users(username, email) VALUES('carol', 'c@mail.com')")
+
+    store = SQLiteUserOriginStore(db_path)
+
+    assert store.fetch_hash("carol") == compute_hash(
+        {"username": "carol", "email": "c@mail.com"}
+    )
+    assert store.fetch_version("carol") == 1
+
+
+def test_threads_read_through_their_own_wal_connections(tmp_path):
+    db_path = tmp_path / "users.db"
+    repo = SQLiteUserRepository(db_path)
+    repo.upsert_users(
+        {"username": f"user{i}", "email": f"{i}@mail.com"} for i in range(20)
+    )
+    store = repo.store
+    connections = set()
+    results = []
+
+    def reader(index: int) -> None:
+        connections.add(store.pool.connection())
+        results.append(store.fetch_value(f"user{index}"))
+
+    threads = [threading.Thread(target=reader, args=(i,)) for i in range(8)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    assert len(connections) == 8
+    gc.collect()
+    assert len(store.pool) == 1  # the finished threads' connections are closed
+    assert sorted(user["username"] for user in results) == sorted(
+        f"user{i}" for i in range(8)
+    )
+    journal_mode = store.pool.connection().execute("PRAGMA journal_mode").fetchone()
+    assert journal_mode == ("wal",)
+    store.close()
@@ -0,0 +1,146 @@
+from __future__ import annotations
+
+import time
+from pathlib import Path
+
+import pytest
+
+from redsnano.cache import MiniRedis
+from redsnano.origin import DictionaryOriginStore
+from redsnano.persistence import AppendOnlyPersistence, SnapshotPersistence
+
+
+def build_cache(path: Path, **options) -> MiniRedis:
+    persistence = AppendOnlyPersistence(path, fsync="no", **options)
+    return MiniRedis(DictionaryOriginStore(), persistence=persistence, validate_async=False)
+
+
+def test_append_only_log_replays_on_startup(tmp_path):
+    path = tmp_path / "cache.aof"
+    cache = build_cache(path)
+    cache.set("user:1", {"name": "Alice"})
+    cache.set("user:2", {"name": "Bob"})
+    cache.set("user:1", {"name": "Alicia"})
+    cache.delete("user:2")
+    cache.close()
+
+    assert len(path.read_bytes().splitlines()) == 4
+
+    restored = build_cache(path)
+    assert restored.keys() == ["user:1"]
+    assert restored.get("user:1") == {"name": "Alicia"}
+    restored.close()
+
+
+def test_append_only_log_takes_values_without_plain_json(tmp_path):
+    path = tmp_path / "cache.aof"
+    cache = build_cache(path)
+    cache.set("tags", {"b", "a"})
+    with pytest.raises(TypeError):
+        cache.set("opaque", object())
+    assert cache.keys() == ["tags"]  # the failed set left nothing behind
+    cache.close()
+
+    assert build_cache(path).get("tags") == ["a", "b"]
+
+
+def test_torn_tail_record_is_discarded(tmp_path):
+    path = tmp_path / "cache.aof"
+    cache = build_cache(path)
+    cache.set("user:1", {"name": "Alice"})
+    cache.close()
+    with path.open("ab") as fh:
+        fh.write(b'["set","user:2",{"value"')
+
+    restored = build_cache(path)
+    assert restored.keys() == ["user:1"]
+    restored.set("user:3", {"name": "Carol"})
+    restored.close()
+
+    assert sorted(build_cache(path).keys()) == ["user:1", "user:3"]
+
+
+def test_log_is_compacted_in_background(tmp_path):
+    path = tmp_path / "cache.aof"
+    cache = build_cache(path, rewrite_min_size=512, rewrite_percentage=100)
+    for i in range(200):
+        cache.set("counter", {"value": i})
+    thread = cache.persistence._rewrite_thread  # type: ignore[attr-defined]
+    assert thread is not None
+    thread.join()
+    cache.set("counter", {"value": "final"})
+    cache.close()
+
+    assert len(path.read_bytes().splitlines()) < 200
+    assert build_cache(path).get("counter") == {"value": "final"}
+
+
+def test_binary_snapshot_roundtrip(tmp_path):
+    path = tmp_path / "cache.snap"
+    persistence = SnapshotPersistence(path, interval=0, compress=True, compress_threshold=16)
+    cache = MiniRedis(DictionaryOriginStore(), persistence=persistence, validate_async=False)
+    cache.set("user:1", {"name": "Alice", "bio": "x" * 100}, ttl=60)
+    cache.set("user:2", {"name": "Bob"})
+    cache.close()
+
+    restored = SnapshotPersistence(path).load()
+    assert set(restored) == {"user:1", "user:2"}
+    assert restored["user:1"]["value"] == {"name": "Alice", "bio": "x" * 100}
+    assert restored["user:1"]["expire_at"] is not None
+    assert restored["user:2"]["expire_at"] is None
+    assert restored["user:2"]["hash"] == cache._peek("user:2").hash
+
+
+def test_background_snapshot_runs_after_changes(tmp_path):
+    path = tmp_path / "cache.snap"
+    persistence = SnapshotPersistence(path, interval=0.01, min_changes=2)
+    cache = MiniRedis(DictionaryOriginStore(), persistence=persistence, validate_async=False)
+    cache.set("user:1", {"name": "Alice"})
+    cache.set("user:2", {"name": "Bob"})
+    deadline = time.time() + 2
+    while not path.exists() and time.time() < deadline:
+        time.sleep(0.01)
+    cache.close()
+
+    assert sorted(SnapshotPersistence(path).load()) == ["user:1", "user:2"]
+
+
+def test_snapshots_keep_running_past_values_without_plain_json(tmp_path, caplog):
+    path = tmp_path / "cache.snap"
+    persistence = SnapshotPersistence(path, interval=0.01)
+    cache = MiniRedis(DictionaryOriginStore(), persistence=persistence, validate_async=False)
+    cache.set("tags", {"b", "a"})
+    cache.set("opaque", object())
+    deadline = time.time() + 2
+    while not path.exists() and time.time() < deadline:
+        time.sleep(0.01)
+    assert persistence._thread.is_alive()
+    cache.close()
+
+    restored = SnapshotPersistence(path).load()
+    assert restored["tags"]["value"] == ["a", "b"]
+    assert "opaque" not in restored
+    assert "'opaque'" in caplog.text
+
+
+def test_failed_background_snapshot_is_retried(tmp_path, monkeypatch):
+    path = tmp_path / "cache.snap"
+    persistence = SnapshotPersistence(path, interval=0.01)
+    save = persistence.save
+    failures = []
+
+    def flaky_save(data):
+        if not failures:
+            failures.append(True)
+            raise OSError("disk full")
+        save(data)
+
+    monkeypatch.setattr(persistence, "save", flaky_save)
+    cache = MiniRedis(DictionaryOriginStore(), persistence=persistence, validate_async=False)
+    cache.set("user:1", {"name": "Alice"})
+    deadline = time.time() + 2
+    while not path.exists() and time.time() < deadline:
+        time.sleep(0.01)
+    cache.close()
+
+    assert failures and list(SnapshotPersistence(path).load()) == ["user:1"]
@@ -0,0 +1,122 @@
+from __future__ import annotations
+
+import threading
+import time
+
+import pytest
+
+from redsnano.cache import MiniRedis
+from redsnano.client import ClientError, HTTPClient, RESPClient
+from redsnano.origin import DictionaryOriginStore
+from redsnano.persistence import JSONPersistence
+from redsnano.replication import Follower, ReplicationLog
+from redsnano.server import MiniRedisHTTPServer
+
+
+def wait_until(predicate, timeout=10.0):
+    deadline = time.time() + timeout
+    while not predicate():
+        if time.time() > deadline:
+            raise AssertionError("condition not reached")
+        time.sleep(0.02)
+
+
+def test_log_keeps_a_bounded_backlog(tmp_path):
+    log = ReplicationLog(backlog=3)
+    cache = MiniRedis(
+        DictionaryOriginStore(),
+        persistence=JSONPersistence(tmp_path / "cache.json"),
+        replication=log,
+    )
+    cache.set("a", 1)
+    cache.expire("a", 30)
+    cache.mdelete(["a", "missing"])
+
+    ops = log.since(0)
+    assert [(offset, op, key) for offset, op, key, _ in ops] == [
+        (1, "set", "a"),
+        (2, "set", "a"),
+        (3, "del", "a"),
+    ]
+    assert ops[1][3]["expire_at"] is not None
+    cache.set("b", 2)
+    assert log.since(0) is None  # offset 1 left the backlog: full resync
+    assert [op[0] for op in log.since(1)] == [2, 3, 4]
+    cache.close()
+
+
+def test_follower_resyncs_when_it_falls_behind_the_backlog(tmp_path):
+    leader = MiniRedis(
+        DictionaryOriginStore(),
+        persistence=JSONPersistence(tmp_path / "leader.json"),
+        replication=ReplicationLog(backlog=2),
+    )
+    server = MiniRedisHTTPServer(("127.0.0.1", 0), leader, workers=2)
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    replica = MiniRedis(
+        DictionaryOriginStore(), persistence=JSONPersistence(tmp_path / "replica.json")
+    )
+    replica.set("stale", 0)
+    follower = Follower(replica, *server.server_address)
+
+    leader.set("a", 1)
+    assert follower.sync_once() == 1  # initial full resync
+    assert replica.keys() == ["a"]
+    leader.set("b", 2)
+    assert follower.sync_once() == 1
+    assert replica.mget(["b"]) == [2]
+
+    leader.mset({f"k{i}": i for i in range(5)})
+    follower.sync_once()
+    assert follower.full_resyncs == 2
+    assert sorted(replica.keys()) == sorted(leader.keys())
+    assert follower.status()["lag"] == 0
+
+    follower.close()
+    server.shutdown()
+    server.server_close()
+    leader.close()
+    replica.close()
+
+
+def test_processes_replicate_and_report_lag(server_process):
+    origin = {"user:1": {"name": "Alice"}}
+    # Each follower's long poll holds one of the leader's workers.
+    leader_port = server_process("leader", "run_server", origin, "--workers=8")
+    replica_of = f"--replica-of=127.0.0.1:{leader_port}"
+    follower_port = server_process("follower", "run_server", origin, replica_of)
+    forwarding_port = server_process(
+        "forwarding", "run_server", origin, replica_of, "--forward-writes"
+    )
+    resp_port = server_process("resp", "run_resp_server", origin, replica_of)
+
+    leader = HTTPClient("127.0.0.1", leader_port)
+    follower = HTTPClient("127.0.0.1", follower_port)
+    forwarding = HTTPClient("127.0.0.1", forwarding_port)
+    resp = RESPClient("127.0.0.1", resp_port)
+
+    leader.mset({"a": 1, "b": {"n": 2}}, ttl=60)
+    wait_until(lambda: follower.mget(["a", "b"]) == [1, {"n": 2}])
+    wait_until(lambda: resp.get("b") == '{"n":2}')
+    leader.delete("a")
+    wait_until(lambda: "a" not in follower.keys())
+
+    with pytest.raises(ClientError, match="403"):
+        follower.set("c", 3)
+    with pytest.raises(ClientError, match="READONLY"):
+        resp.set("c", "3")
+    forwarding.set("c", 3)
+    assert leader.get("c") == 3
+    wait_until(lambda: follower.get("c") == 3)
+
+    _, status = follower._request("GET", "/replication")
+    assert status["role"] == "follower"
+    assert status["link"] == "up"
+    wait_until(lambda: follower._request("GET", "/replication")[1]["lag"] == 0)
+    _, status = leader._request("GET", "/replication")
+    assert status["role"] == "leader"
+    assert len(status["followers"]) == 3
+
+    for client in (leader, follower, forwarding, resp):
+        client.close()
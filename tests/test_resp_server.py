@@ -0,0 +1,124 @@
+from __future__ import annotations
+
+import asyncio
+import socket
+import threading
+
+import pytest
+
+from redsnano.cache import MiniRedis
+from redsnano.origin import DictionaryOriginStore
+from redsnano.persistence import JSONPersistence
+from redsnano.resp_server import RESPServer, encode_reply, parse_commands
+
+
+@pytest.fixture
+def resp_server(tmp_path):
+    origin = DictionaryOriginStore({"user:1": {"name": "Alice"}})
+    cache = MiniRedis(
+        origin,
+        persistence=JSONPersistence(tmp_path / "cache.json"),
+        default_ttl=60,
+        validate_async=False,
+    )
+    server = RESPServer(cache, "127.0.0.1", 0, workers=2)
+    loop = asyncio.new_event_loop()
+    loop.run_until_complete(server.start())
+    thread = threading.Thread(target=loop.run_forever, daemon=True)
+    thread.start()
+    yield server
+    asyncio.run_coroutine_threadsafe(server.close(), loop).result(timeout=5)
+    loop.call_soon_threadsafe(loop.stop)
+    thread.join()
+    cache.close()
+
+
+def command(*args: str) -> bytes:
+    return encode_reply([arg.encode() for arg in args])
+
+
+def exchange(server: RESPServer, payload: bytes, size: int | None = None) -> bytes:
+    """Send ``payload``; read ``size`` bytes, or until the server hangs up."""
+    with socket.create_connection(server.address, timeout=5) as sock:
+        sock.sendall(payload)
+        received = b""
+        while size is None or len(received) < size:
+            chunk = sock.recv(65536)
+            if not chunk:
+                break
+            received += chunk
+    return received
+
+
+def test_parse_commands_keeps_partial_input():
+    data = command("SET", "a", "1") + b"PING\r\n" + command("GET", "a")[:-3]
+    commands, used, error = parse_commands(data)
+    assert commands == [[b"SET", b"a", b"1"], [b"PING"]]
+    assert error is None
+    assert data[used:] == command("GET", "a")[:-3]
+
+    _, _, error = parse_commands(b"*1\r\n:5\r\n")
+    assert error is not None
+
+
+def test_pipelined_commands_reply_in_order(resp_server):
+    payload = b"".join(
+        [
+            command("PING"),
+            command("SET", "greeting", "hello", "EX", "100"),
+            command("GET", "greeting"),
+            command("GET", "user:1"),
+            command("MGET", "greeting", "missing"),
+            command("TTL", "greeting"),
+            command("TTL", "user:1"),
+            command("EXPIRE", "user:1", "50"),
+            command("TTL", "missing"),
+            command("KEYS", "user:*"),
+            command("DEL", "greeting", "missing"),
+            command("GET", "greeting"),
+            command("NOPE"),
+        ]
+    )
+    expected = (
+        b"+PONG\r\n"
+        b"+OK\r\n"
+        b"$5\r\nhello\r\n"
+        b'$16\r\n{"name":"Alice"}\r\n'
+        b"*2\r\n$5\r\nhello\r\n$-1\r\n"
+        b":100\r\n"
+        b":60\r\n"
+        b":1\r\n"
+        b":-2\r\n"
+        b"*1\r\n$6\r\nuser:1\r\n"
+        b":1\r\n"
+        b"$-1\r\n"
+        b"-ERR unknown command 'NOPE', with args beginning with: \r\n"
+    )
+    assert exchange(resp_server, payload, len(expected)) == expected
+
+
+def test_failing_command_does_not_drop_the_pipeline(resp_server, monkeypatch):
+    def fetch_value(key):
+        raise RuntimeError("origin down\nretry later")
+
+    monkeypatch.setattr(resp_server.cache.origin_store, "fetch_value", fetch_value)
+    payload = command("PING") + command("GET", "x") + command("PING")
+    expected = b"+PONG\r\n-ERR origin down retry later\r\n+PONG\r\n"
+    assert exchange(resp_server, payload, len(expected)) == expected
+
+
+def test_hello_switches_to_resp3(resp_server):
+    payload = command("HELLO", "3") + command("GET", "missing") + b"QUIT\r\n"
+    received = exchange(resp_server, payload)
+    assert received.startswith(b"%7\r\n$6\r\nserver\r\n$8\r\nredsnano\r\n")
+    assert received.endswith(b"_\r\n+OK\r\n")
+
+
+def test_hello_reports_the_replica_role(resp_server):
+    assert b"$4\r\nrole\r\n$6\r\nmaster\r\n" in exchange(
+        resp_server, command("HELLO") + b"QUIT\r\n"
+    )
+    resp_server.read_only = True  # as when started with --replica-of
+    assert b"$4\r\nrole\r\n$7\r\nreplica\r\n" in exchange(
+        resp_server, command("HELLO") + b"QUIT\r\n"
+    )
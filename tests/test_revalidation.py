@@ -0,0 +1,58 @@
+from __future__ import annotations
+
+import time
+from pathlib import Path
+
+from redsnano.cache import MiniRedis
+from redsnano.origin import DictionaryOriginStore
+from redsnano.persistence import JSONPersistence
+
+
+class CountingOrigin(DictionaryOriginStore):
+    def __init__(self, seed):
+        super().__init__(seed)
+        self.hash_calls = 0
+
+    def fetch_hash(self, key):
+        self.hash_calls += 1
+        return super().fetch_hash(key)
+
+
+def build_cache(tmp_path: Path, origin: CountingOrigin, **options) -> MiniRedis:
+    persistence = JSONPersistence(tmp_path / "cache.json")
+    return MiniRedis(origin, persistence=persistence, validate_async=False, **options)
+
+
+def test_hits_inside_window_skip_the_origin(tmp_path):
+    origin = CountingOrigin({"user:1": {"name": "Alice"}})
+    cache = build_cache(tmp_path, origin, revalidate_after=60)
+    cache.get("user:1")
+    for _ in range(10):
+        assert cache.get("user:1") == {"name": "Alice"}
+
+    assert origin.hash_calls == 0
+
+
+def test_per_key_window_overrides_default(tmp_path):
+    origin = CountingOrigin({"user:1": {"name": "Alice"}})
+    cache = build_cache(tmp_path, origin, revalidate_after=60)
+    cache.set("user:1", {"name": "Alice"}, revalidate_after=0.01)
+    time.sleep(0.02)
+    origin.update("user:1", {"name": "Bob"})
+
+    assert cache.get("user:1") == {"name": "Bob"}
+    assert origin.hash_calls == 1
+
+
+def test_stale_hits_are_served_while_revalidating(tmp_path):
+    origin = CountingOrigin({"user:1": {"name": "Alice"}})
+    cache = build_cache(
+        tmp_path, origin, revalidate_after=0.01, stale_while_revalidate=60
+    )
+    cache.get("user:1")
+    time.sleep(0.02)
+    origin.update("user:1", {"name": "Bob"})
+
+    assert cache.get("user:1") == {"name": "Alice"}
+    cache.close()
+    assert cache.get("user:1") == {"name": "Bob"}
@@ -0,0 +1,69 @@
+from __future__ import annotations
+
+import threading
+import time
+
+import pytest
+
+from redsnano.cache import MiniRedis
+from redsnano.origin import DictionaryOriginStore
+from redsnano.persistence import AppendOnlyPersistence, JSONPersistence
+
+
+def test_keys_spread_over_shards_and_limits_are_split(tmp_path):
+    cache = MiniRedis(
+        DictionaryOriginStore(),
+        persistence=JSONPersistence(tmp_path / "cache.json"),
+        max_entries=40,
+        shards=4,
+    )
+    cache.mset({f"k{i}": i for i in range(200)})
+
+    assert [shard.max_entries for shard in cache._shards] == [10] * 4
+    assert all(len(shard.store) <= 10 for shard in cache._shards)
+    info = cache.info()
+    assert info["shards"] == 4
+    assert info["keys"] + info["evicted_keys"] == 200
+    assert cache.mget(["k199"]) == [199]
+    cache.close()
+
+
+def test_concurrent_writers_persist_every_key(tmp_path):
+    path = tmp_path / "cache.json"
+    cache = MiniRedis(DictionaryOriginStore(), persistence=JSONPersistence(path))
+
+    def writer(worker: int) -> None:
+        for i in range(50):
+            cache.set(f"w{worker}:{i}", i)
+
+    threads = [threading.Thread(target=writer, args=(n,)) for n in range(4)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    cache.close()
+
+    assert len(JSONPersistence(path).load()) == 200
+
+
+def test_expiry_runs_per_shard(tmp_path):
+    path = tmp_path / "cache.aof"
+    cache = MiniRedis(
+        DictionaryOriginStore(),
+        persistence=AppendOnlyPersistence(path),
+        active_expiry=False,
+        shards=8,
+    )
+    cache.mset({f"k{i}": i for i in range(100)}, ttl=0.01)
+    cache.set("keep", 1)
+    time.sleep(0.02)
+
+    assert cache.expire_cycle() == 100
+    assert cache.info()["expired_keys"] == 100
+    cache.close()
+    assert list(AppendOnlyPersistence(path).load()) == ["keep"]
+
+
+def test_rejects_zero_shards():
+    with pytest.raises(ValueError):
+        MiniRedis(DictionaryOriginStore(), shards=0)
@@ -0,0 +1,117 @@
+from __future__ import annotations
+
+import threading
+import time
+from pathlib import Path
+
+from redsnano.cache import MiniRedis
+from redsnano.origin import DictionaryOriginStore
+from redsnano.persistence import JSONPersistence
+
+
+class SlowOrigin(DictionaryOriginStore):
+    def __init__(self, seed, delay: float = 0.05):
+        super().__init__(seed)
+        self.delay = delay
+        self.value_calls = 0
+        self.error: Exception | None = None
+
+    def fetch_value(self, key):
+        self.value_calls += 1
+        time.sleep(self.delay)
+        if self.error is not None:
+            raise self.error
+        return super().fetch_value(key)
+
+
+def build_cache(tmp_path: Path, origin: SlowOrigin, **options) -> MiniRedis:
+    persistence = JSONPersistence(tmp_path / "cache.json")
+    return MiniRedis(origin, persistence=persistence, validate_async=False, **options)
+
+
+def run_concurrently(count: int, fn) -> list:
+    results: list = [None] * count
+    barrier = threading.Barrier(count)
+
+    def worker(index: int) -> None:
+        barrier.wait()
+        try:
+            results[index] = fn()
+        except Exception as exc:  # noqa: BLE001 - collected for assertions
+            results[index] = exc
+
+    threads = [threading.Thread(target=worker, args=(i,)) for i in range(count)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    return results
+
+
+def test_concurrent_misses_share_one_origin_fetch(tmp_path):
+    origin = SlowOrigin({"user:1": {"name": "Alice"}})
+    cache = build_cache(tmp_path, origin)
+
+    results = run_concurrently(20, lambda: cache.get("user:1"))
+
+    assert results == [{"name": "Alice"}] * 20
+    assert origin.value_calls == 1
+
+
+def test_origin_errors_reach_every_waiter(tmp_path):
+    origin = SlowOrigin({"user:1": {"name": "Alice"}})
+    origin.error = RuntimeError("database down")
+    cache = build_cache(tmp_path, origin)
+
+    results = run_concurrently(5, lambda: cache.get("user:1"))
+
+    assert all(isinstance(result, RuntimeError) for result in results)
+    assert origin.value_calls == 1
+
+
+def test_waiters_time_out(tmp_path):
+    origin = SlowOrigin({"user:1": {"name": "Alice"}}, delay=0.3)
+    cache = build_cache(tmp_path, origin, load_timeout=0.05)
+
+    results = run_concurrently(3, lambda: cache.get("user:1"))
+
+    assert sum(isinstance(result, TimeoutError) for result in results) == 2
+    assert {"name": "Alice"} in results
+
+
+def test_hot_keys_are_refreshed_before_expiry(tmp_path):
+    origin = SlowOrigin({"user:1": {"name": "Alice"}}, delay=0.01)
+    cache = build_cache(tmp_path, origin, default_ttl=60, early_refresh_beta=1e6)
+    cache.get("user:1")
+    origin.update("user:1", {"name": "Bob"})
+
+    assert cache.get("user:1") == {"name": "Bob"}
+    assert cache.info()["early_refreshes"] == 1
+
+
+def test_early_refreshes_are_counted_across_threads(tmp_path):
+    origin = SlowOrigin({"user:1": {"name": "Alice"}}, delay=0)
+    cache = build_cache(tmp_path, origin, default_ttl=60, early_refresh_beta=1e9)
+    cache.get("user:1")
+
+    def reader() -> None:
+        for _ in range(50):
+            cache.get("user:1")
+
+    threads = [threading.Thread(target=reader) for _ in range(4)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    assert cache.info()["early_refreshes"] == 200
+    assert cache.metrics.counters()["early_refreshes"] == 200
+
+
+def test_early_refresh_disabled_by_default(tmp_path):
+    origin = SlowOrigin({"user:1": {"name": "Alice"}}, delay=0)
+    cache = build_cache(tmp_path, origin, default_ttl=60)
+    cache.get("user:1")
+    cache.get("user:1")
+
+    assert cache.info()["early_refreshes"] == 0
@@ -0,0 +1,101 @@
+from __future__ import annotations
+
+import threading
+import time
+
+from redsnano.cache import MiniRedis
+from redsnano.origin import DictionaryOriginStore
+from redsnano.persistence import JSONPersistence
+from redsnano.tracing import SLOWLOG_MAX_ARGS, SlowLog
+
+
+class SlowOrigin(DictionaryOriginStore):
+    def fetch_value(self, key):
+        time.sleep(0.02)
+        return super().fetch_value(key)
+
+
+class RecordingTracer:
+    def __init__(self):
+        self.events = []
+
+    def on_start(self, operation, phase):
+        self.events.append(("start", operation, phase))
+
+    def on_end(self, operation, phase, seconds):
+        self.events.append(("end", operation, phase))
+
+
+def build_cache(tmp_path, origin, **options):
+    return MiniRedis(
+        origin,
+        persistence=JSONPersistence(tmp_path / "cache.json"),
+        validate_async=False,
+        revalidate_after=60,
+        shards=1,
+        **options,
+    )
+
+
+def test_slow_operations_are_logged_with_phases(tmp_path):
+    cache = build_cache(
+        tmp_path, SlowOrigin({"user:1": {"name": "Alice"}}), slowlog_threshold=0.01
+    )
+    cache.get("user:1")  # miss: slow origin fetch
+    cache.get("user:1")  # fresh hit: fast, not logged
+
+    assert len(cache.slowlog) == 1
+    (entry,) = cache.slowlog.get()
+    assert (entry.command, entry.args) == ("get", ["user:1"])
+    assert entry.duration_us >= 20_000
+    assert entry.phases["origin_fetch"] >= 20_000
+    assert {"hash", "persist"} <= set(entry.phases)
+
+    cache.mget(f"key:{i}" for i in range(100))
+    cache.slowlog.threshold = 0
+    cache.mget(f"key:{i}" for i in range(100))
+    newest = cache.slowlog.get(1)[0]
+    assert newest.command == "mget" and len(newest.args) == SLOWLOG_MAX_ARGS
+
+    cache.slowlog.reset()
+    assert cache.slowlog.get() == []
+    cache.close()
+
+
+def test_tracer_sees_operations_and_phases(tmp_path):
+    tracer = RecordingTracer()
+    cache = build_cache(tmp_path, DictionaryOriginStore({"user:1": 1}), tracer=tracer)
+    cache.get("user:1")
+
+    assert tracer.events[0] == ("start", "get", "total")
+    assert tracer.events[-1] == ("end", "get", "total")
+    assert ("start", "get", "origin_fetch") in tracer.events
+    assert ("end", "get", "hash") in tracer.events
+    assert len(cache.slowlog) == 0  # no threshold: the slow log stays off
+    cache.close()
+
+
+def test_contended_lock_wait_is_a_phase(tmp_path):
+    cache = build_cache(tmp_path, DictionaryOriginStore(), slowlog_threshold=0)
+    cache.set("k", "v")
+    shard = cache._shard("k")
+    shard.lock.acquire()
+    reader = threading.Thread(target=cache.get, args=("k",))
+    reader.start()
+    time.sleep(0.05)
+    shard.lock.release()
+    reader.join()
+
+    entry = cache.slowlog.get(1)[0]
+    assert entry.command == "get"
+    assert entry.phases["lock"] >= 40_000
+    cache.close()
+
+
+def test_slowlog_ring_buffer_keeps_the_newest_entries():
+    slowlog = SlowLog(threshold=0, max_len=3)
+    for n in range(5):
+        slowlog.add("get", [f"k{n}"], time.time(), 0.5, {})
+    assert [entry.args for entry in slowlog.get(None)] == [["k4"], ["k3"], ["k2"]]
+    report = slowlog.to_dict(count=1)
+    assert report["len"] == 3 and report["entries"][0]["duration_us"] == 500_000
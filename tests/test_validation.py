@@ -0,0 +1,81 @@
+from __future__ import annotations
+
+import threading
+from pathlib import Path
+
+from redsnano.cache import MiniRedis
+from redsnano.origin import DictionaryOriginStore
+from redsnano.persistence import JSONPersistence
+from redsnano.validation import ValidationScheduler
+
+
+class CountingOrigin(DictionaryOriginStore):
+    def __init__(self, seed):
+        super().__init__(seed)
+        self.hash_calls = 0
+        self.release = threading.Event()
+
+    def fetch_hash(self, key):
+        self.release.wait(5)
+        self.hash_calls += 1
+        return super().fetch_hash(key)
+
+
+def blocked_scheduler(**options) -> tuple[ValidationScheduler, threading.Event]:
+    release = threading.Event()
+    started = threading.Event()
+    scheduler = ValidationScheduler(workers=1, **options)
+
+    def block():
+        started.set()
+        release.wait(5)
+
+    scheduler.submit("busy", block)
+    started.wait(5)
+    return scheduler, release
+
+
+def test_hits_on_same_key_are_coalesced(tmp_path: Path):
+    origin = CountingOrigin({"user:1": {"name": "Alice"}})
+    cache = MiniRedis(
+        origin,
+        persistence=JSONPersistence(tmp_path / "cache.json"),
+        validation_workers=1,
+    )
+    cache.set("user:1", {"name": "Alice"})
+    cache.set("user:2", {"name": "Bob"})
+    for _ in range(50):
+        assert cache.get("user:1") == {"name": "Alice"}
+        cache.get("user:2")
+    origin.release.set()
+    cache.close()
+
+    # One validation in flight for user:1 plus at most one queued behind it.
+    assert origin.hash_calls <= 4
+    assert cache.info()["validations_coalesced"] >= 90
+
+
+def test_full_queue_drops_validations():
+    scheduler, release = blocked_scheduler(max_queue=2)
+    ran = []
+    assert scheduler.submit("a", lambda: ran.append("a"))
+    assert scheduler.submit("b", lambda: ran.append("b"))
+    assert not scheduler.submit("c", lambda: ran.append("c"))
+    assert scheduler.stats()["queue_depth"] == 2
+    release.set()
+    scheduler.close()
+
+    assert sorted(ran) == ["a", "b"]
+    assert scheduler.stats()["dropped"] == 1
+
+
+def test_full_queue_can_validate_inline():
+    scheduler, release = blocked_scheduler(max_queue=1, overflow="inline")
+    ran = []
+    scheduler.submit("a", lambda: ran.append("a"))
+    scheduler.submit("b", lambda: ran.append("b"))
+
+    assert ran == ["b"]
+    release.set()
+    scheduler.close()
+    assert scheduler.stats()["inline"] == 1
@@ -0,0 +1,99 @@
+from __future__ import annotations
+
+import time
+
+import pytest
+
+from redsnano.cache import MiniRedis
+from redsnano.cache_types import CacheEntry
+from redsnano.hashing import compute_hash
+from redsnano.origin import DictionaryOriginStore
+from redsnano.persistence import JSONPersistence
+from redsnano.warm_tier import SQLiteWarmTier
+
+
+@pytest.fixture
+def origin():
+    return DictionaryOriginStore(
+        {f"user:{i}": {"name": f"user {i}", "bio": "x" * 600} for i in range(4)}
+    )
+
+
+def tiered_cache(tmp_path, origin, **options) -> MiniRedis:
+    return MiniRedis(
+        origin,
+        persistence=JSONPersistence(tmp_path / "cache.json"),
+        validate_async=False,
+        max_entries=2,
+        shards=1,
+        warm_tier=SQLiteWarmTier(tmp_path / "warm.db"),
+        **options,
+    )
+
+
+def test_sqlite_warm_tier_round_trips_entries(tmp_path):
+    tier = SQLiteWarmTier(tmp_path / "warm.db", compress_threshold=16)
+    value = {"name": "Alice", "bio": "x" * 100}
+    entry = CacheEntry(value, compute_hash(value), time.time() + 60, fetch_cost=0.5)
+    expired = CacheEntry(1, compute_hash(1), time.time() - 1)
+    no_json = CacheEntry(object(), "h")
+    assert tier.put_many([("a", entry), ("b", expired), ("c", no_json)]) == 2
+
+    found = tier.get_many(["a", "b", "c"])
+    assert list(found) == ["a"]
+    assert found["a"].value == value and found["a"].hash == entry.hash
+    assert found["a"].fetch_cost == 0.5 and found["a"].validated_at is None
+
+    tier.delete_many(["a"])
+    assert tier.get_many(["a"]) == {}
+    tier.close()
+
+
+def test_evicted_entries_come_back_from_the_warm_tier(tmp_path, origin):
+    cache = tiered_cache(tmp_path, origin)
+    for i in range(4):
+        cache.get(f"user:{i}")
+    assert cache.info()["keys"] == 2
+    assert cache.metrics.counters()["warm_tier_demotions"] == 2
+
+    fetches = cache.metrics.counters()["origin_fetches"]
+    assert cache.get("user:0") == origin.fetch_value("user:0")
+    assert cache.mget(["user:1", "nobody"]) == [origin.fetch_value("user:1"), None]
+    counters = cache.metrics.counters()
+    assert counters["warm_tier_hits"] == 2
+    assert counters["origin_fetches"] == fetches + 1  # only "nobody"
+    assert counters["validations"] >= 2  # promoted entries were hash-checked
+    cache.close()
+
+
+def test_stale_or_removed_warm_copies_are_not_served(tmp_path, origin):
+    cache = tiered_cache(tmp_path, origin)
+    for i in range(4):
+        cache.get(f"user:{i}")  # user:0 and user:1 are now warm
+    origin.update("user:0", {"name": "renamed"})
+    assert cache.get("user:0") == {"name": "renamed"}  # hash mismatch: reloaded
+
+    cache.set("user:1", {"name": "local"}, ttl=60)  # evicts others to warm
+    cache.delete("user:1")
+    cache.set("user:2", {"name": "short"}, ttl=0.01)
+    time.sleep(0.02)
+    hits = cache.metrics.counters()["warm_tier_hits"]
+    assert cache.get("user:2") == origin.fetch_value("user:2")
+    assert cache.metrics.counters()["warm_tier_hits"] == hits  # from the origin
+    cache.close()
+    tier = SQLiteWarmTier(tmp_path / "warm.db")
+    assert "user:1" not in tier.get_many(["user:1"])
+    tier.close()
+
+
+def test_warm_tier_outlives_the_cache(tmp_path, origin):
+    cache = tiered_cache(tmp_path, origin)
+    for i in range(4):
+        cache.get(f"user:{i}")
+    cache.close()
+
+    reopened = tiered_cache(tmp_path, origin)
+    assert len(reopened.warm_tier) == 2
+    assert reopened.get("user:0") == origin.fetch_value("user:0")
+    assert reopened.metrics.counters().get("origin_fetches", 0) == 0
+    reopened.close()